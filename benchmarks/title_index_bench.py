@@ -0,0 +1,92 @@
+"""
+Benchmark: TitleIndex lookups vs. the linear normalize_text scan they replace,
+on 10k and 100k generated titles.
+
+    python benchmarks/title_index_bench.py
+"""
+
+import os
+import random
+import sys
+import time
+
+# The service modules import each other by bare name, as in python_integration/src
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "python_integration",
+        "src",
+    ),
+)
+
+from title_index import TitleIndex  # noqa: E402
+from utils.text import normalize_text  # noqa: E402
+
+
+def main():
+    words = [
+        "Reunião",
+        "Almoço",
+        "Dentista",
+        "Academia",
+        "Aula",
+        "Inglês",
+        "Cliente",
+        "Projeto",
+        "Médico",
+        "Café",
+        "Entrega",
+        "Revisão",
+        "Planejamento",
+        "Viagem",
+        "Aniversário",
+        "Consulta",
+        "Treino",
+        "Sprint",
+        "Pagamento",
+        "Jantar",
+    ]
+    random.seed(42)
+    for size in (10_000, 100_000):
+        titles = {
+            str(i): f"{random.choice(words)} {random.choice(words)} {i}"
+            for i in range(size)
+        }
+        index = TitleIndex()
+        started = time.perf_counter()
+        for event_id, title in titles.items():
+            index.add("bench", event_id, title)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        queries = ["dentista 1234", "reuniao cliente", "medico", "viagem 99"]
+        rounds = 20
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for query in queries:
+                term = normalize_text(query)
+                linear = {
+                    i for i, title in titles.items() if term in normalize_text(title)
+                }
+        linear_ms = (time.perf_counter() - started) * 1000 / (rounds * len(queries))
+
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for query in queries:
+                indexed = index.match("bench", query)
+        index_ms = (time.perf_counter() - started) * 1000 / (rounds * len(queries))
+        assert indexed == linear
+
+        started = time.perf_counter()
+        for query in ("dentsta", "reuniao clinte"):
+            index.suggest("bench", query)
+        suggest_ms = (time.perf_counter() - started) * 1000 / 2
+
+        print(
+            f"{size:>7} eventos: build {build_ms:.0f} ms | linear {linear_ms:.2f} ms/busca | "
+            f"índice {index_ms:.3f} ms/busca | fuzzy {suggest_ms:.2f} ms/busca"
+        )
+
+
+if __name__ == "__main__":
+    main()
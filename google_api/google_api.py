@@ -1,18 +1,379 @@
 import os
+import json
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
+from googleapiclient.errors import HttpError
+from google_auth_httplib2 import AuthorizedHttp
 import pytz
 import datetime
+import threading
+import time
+import sys
+import random
+import contextvars
+import httplib2
+
+# Get the path to the project's root directory
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Add the project's root directory to the system path
+sys.path.append(project_root)
+
+from python_integration.src.utils.text import normalize_text
+from python_integration.src.utils.rate_limit import TokenBucket
+
+# Google batch requests accept at most 50 calls each
+BATCH_SIZE = 50
+# Statuses worth retrying (rate limit and transient server errors); a 403
+# only when its reason is one of RATE_LIMIT_REASONS
+RETRYABLE_STATUSES = {403, 429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded"}
+
+# Partial response for event searches: only what the handlers read
+SEARCH_FIELDS = "id,etag,summary,start,end,recurringEventId"
+
+
+# User on whose behalf Calendar calls are made (e.g. the WhatsApp number);
+# set by the caller, read by RequestExecutor for per-user limits
+calendar_user = contextvars.ContextVar("calendar_user", default=None)
+
+
+def _http_status(error):
+    if isinstance(error, HttpError):
+        return error.resp.status
+    return None
+
+
+def _normalize_reason(reason):
+    # "rateLimitExceeded" (errors[].reason) and "RATE_LIMIT_EXCEEDED" (ErrorInfo)
+    return reason.replace('_', '').lower()
+
+
+def _error_reasons(error):
+    """
+    Normalized reasons of an API error, from both `error.errors[].reason` and
+    the ErrorInfo in `error.details[]`. googleapiclient keeps only one of the
+    two in `error_details` (`details` when present).
+    """
+    details = getattr(error, 'error_details', None)
+    details = list(details) if isinstance(details, list) else []
+    try:
+        body = json.loads(error.content.decode('utf-8'))['error']
+        details += body.get('errors', []) + body.get('details', [])
+    except (AttributeError, ValueError, KeyError, TypeError):
+        pass
+    return {
+        _normalize_reason(detail['reason'])
+        for detail in details
+        if isinstance(detail, dict) and isinstance(detail.get('reason'), str)
+    }
+
+
+def _is_retryable(error, server_errors=True):
+    status = _http_status(error)
+    if status is None:
+        # Network failure before any answer
+        return isinstance(error, (OSError, httplib2.HttpLib2Error))
+    if status == 403:
+        return not _error_reasons(error).isdisjoint(
+            _normalize_reason(reason) for reason in RATE_LIMIT_REASONS
+        )
+    if status == 429:
+        return True
+    return server_errors and status in RETRYABLE_STATUSES
+
+
+def _recurrence_rule(recurrence_details):
+    """
+    RRULE for the LLM's `recurrence_details` (rule, byweekday, until_date or count).
+    """
+    rrule_parts = [f"FREQ={recurrence_details['rule'].upper()}"]
+    if recurrence_details.get('byweekday'):
+        byweekday_str = ','.join(recurrence_details['byweekday'])
+        rrule_parts.append(f"BYDAY={byweekday_str}")
+    if recurrence_details.get('until_date'):
+        until_date_str = recurrence_details['until_date'].replace('-', '')
+        until_dt = datetime.datetime.strptime(until_date_str, "%Y%m%d").replace(
+            hour=23, minute=59, second=59, tzinfo=pytz.timezone('America/Sao_Paulo')
+        ).astimezone(pytz.utc)
+        rrule_parts.append(f"UNTIL={until_dt.strftime('%Y%m%dT%H%M%SZ')}")
+    elif recurrence_details.get('count'):
+        rrule_parts.append(f"COUNT={recurrence_details['count']}")
+    return f"RRULE:{';'.join(rrule_parts)}"
+
+
+class RequestExecutor:
+    """
+    Shared gate for every Calendar API call.
+
+    Before a request runs it takes tokens from a global bucket sized to the
+    project quota and from a bucket of the current `calendar_user`, so one
+    user's bulk operation cannot use up the whole quota. Rate-limit errors
+    (429, 403 rateLimitExceeded/userRateLimitExceeded) and transient 5xx or
+    network errors are retried with jittered exponential backoff; other
+    errors are raised right away.
+
+    `httplib2.Http` is not thread-safe, so with an `http_factory` every
+    thread runs its requests on its own Http object, created on first use,
+    instead of the one built into the service.
+    """
+
+    def __init__(self, rate=10.0, burst=20, user_rate=5.0, user_burst=10,
+                 max_attempts=5, backoff_base=0.5, backoff_cap=32.0, max_users=10000,
+                 http_factory=None):
+        self.bucket = TokenBucket(rate, burst)
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_users = max_users
+        self.http_factory = http_factory
+        self._local = threading.local()
+        self._user_buckets = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self.retried = 0
+        self.failed = 0
+        self.rate_limited = 0
+
+    def _user_bucket(self, user):
+        with self._lock:
+            bucket = self._user_buckets.get(user)
+            if bucket is None:
+                if len(self._user_buckets) >= self.max_users:
+                    for key in [k for k, b in self._user_buckets.items() if b.is_idle()]:
+                        del self._user_buckets[key]
+                bucket = self._user_buckets[user] = TokenBucket(self.user_rate, self.user_burst)
+            return bucket
+
+    def acquire(self, cost=1):
+        """
+        Waits for `cost` tokens (a batch costs one per call it carries).
+        """
+        user = calendar_user.get()
+        waited = self._user_bucket(user).acquire(cost) if user is not None else 0.0
+        waited += self.bucket.acquire(cost)
+        if waited:
+            with self._lock:
+                self.throttled += 1
+
+    def max_cost(self):
+        """
+        Largest cost one call can take without waiting on an empty bucket.
+        """
+        capacity = self.bucket.capacity
+        if calendar_user.get() is not None:
+            capacity = min(capacity, self.user_burst)
+        return max(1, int(capacity))
+
+    def _http(self):
+        http = getattr(self._local, 'http', None)
+        if http is None and self.http_factory is not None:
+            http = self._local.http = self.http_factory()
+        return http
+
+    def backoff(self, attempt, retries=1):
+        # Full jitter, as recommended for the Google APIs
+        time.sleep(random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt)))
+        with self._lock:
+            self.retried += retries
+
+    def execute(self, request, cost=1, retry_server_errors=True, max_attempts=None):
+        """
+        Runs `request.execute()` within the limits. With `retry_server_errors`
+        False (non-idempotent calls such as inserts) only rate-limit errors,
+        which guarantee the call was not applied, are retried. `max_attempts`
+        overrides the executor's, e.g. 1 for callers that retry on their own.
+        """
+        max_attempts = max_attempts or self.max_attempts
+        for attempt in range(max_attempts):
+            self.acquire(cost)
+            with self._lock:
+                self.calls += 1
+            try:
+                return request.execute(http=self._http())
+            except Exception as e:
+                if _http_status(e) in (403, 429) and _is_retryable(e):
+                    with self._lock:
+                        self.rate_limited += 1
+                if attempt == max_attempts - 1 or not _is_retryable(e, retry_server_errors):
+                    with self._lock:
+                        self.failed += 1
+                    raise
+                print(f"Google API: {e}; nova tentativa {attempt + 2}/{max_attempts}.")
+                self.backoff(attempt)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "throttled": self.throttled,
+                "rate_limited": self.rate_limited,
+                "retried": self.retried,
+                "failed": self.failed,
+                "users": len(self._user_buckets),
+            }
+
+
+class CalendarDirectory:
+    """
+    In-memory map of calendar name -> calendar ID.
+
+    Loaded once from calendarList, then kept fresh with calendarList sync
+    tokens: after `ttl` seconds (or on a name that is not known) only the
+    changes since the last sync are fetched. A 410 on the sync token, or an
+    `invalidate()` after a 404, forces a full reload.
+    """
+
+    def __init__(self, service, ttl=300, miss_refresh_interval=5, requests=None):
+        self.service = service
+        self.requests = requests or RequestExecutor()
+        self.ttl = ttl
+        self.miss_refresh_interval = miss_refresh_interval
+        self._ids = {}
+        self._names = {}
+        self._sync_token = None
+        self._synced_at = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.full_loads = 0
+        self.incremental_syncs = 0
+
+    def _list_pages(self, **kwargs):
+        page_token = None
+        while True:
+            calendar_list = self.requests.execute(self.service.calendarList().list(pageToken=page_token, **kwargs))
+            yield calendar_list
+            page_token = calendar_list.get('nextPageToken')
+            if not page_token:
+                break
+
+    def _apply(self, entry):
+        calendar_id = entry['id']
+        old_name = self._names.pop(calendar_id, None)
+        if old_name is not None and self._ids.get(old_name) == calendar_id:
+            del self._ids[old_name]
+        if not entry.get('deleted'):
+            # The first calendar with a given name wins, as in a linear scan
+            self._ids.setdefault(entry.get('summary'), calendar_id)
+            self._names[calendar_id] = entry.get('summary')
+
+    def _full_load(self):
+        items = []
+        sync_token = None
+        for page in self._list_pages():
+            items.extend(page.get('items', []))
+            sync_token = page.get('nextSyncToken', sync_token)
+        self._ids = {}
+        self._names = {}
+        for entry in items:
+            self._apply(entry)
+        self._sync_token = sync_token
+        self._synced_at = time.monotonic()
+        self.full_loads += 1
+        return items
+
+    def _sync(self):
+        if self._sync_token is None:
+            self._full_load()
+            return
+        try:
+            sync_token = self._sync_token
+            for page in self._list_pages(syncToken=self._sync_token):
+                for entry in page.get('items', []):
+                    self._apply(entry)
+                sync_token = page.get('nextSyncToken', sync_token)
+            self._sync_token = sync_token
+            self._synced_at = time.monotonic()
+            self.incremental_syncs += 1
+        except HttpError as e:
+            if _http_status(e) != 410:
+                raise
+            # Sync token expired: start over
+            self._full_load()
+
+    def reload(self):
+        """
+        Full reload; returns every calendarList entry.
+        """
+        with self._lock:
+            return self._full_load()
+
+    def get_id(self, calendar_name):
+        with self._lock:
+            now = time.monotonic()
+            if self._synced_at is None or now - self._synced_at > self.ttl:
+                self._sync()
+            calendar_id = self._ids.get(calendar_name)
+            if calendar_id is None and time.monotonic() - self._synced_at > self.miss_refresh_interval:
+                # Possibly created elsewhere since the last sync
+                self._sync()
+                calendar_id = self._ids.get(calendar_name)
+            if calendar_id is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return calendar_id
+
+    def add(self, calendar):
+        """
+        Records a calendar created by this client without a round trip.
+        """
+        with self._lock:
+            self._apply(calendar)
+
+    def invalidate(self, calendar_id=None):
+        """
+        Drops `calendar_id` (or everything) and forces a full reload on the next lookup.
+        """
+        with self._lock:
+            if calendar_id is not None:
+                self._apply({'id': calendar_id, 'deleted': True})
+            self._sync_token = None
+            self._synced_at = None
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "calendars": len(self._ids),
+                "hits": self.hits,
+                "misses": self.misses,
+                "full_loads": self.full_loads,
+                "incremental_syncs": self.incremental_syncs,
+            }
+
 
 class GoogleCalendar:
-    def __init__(self, client_secret_file, api_name, api_version, *scopes):
+    def __init__(self, client_secret_file, api_name, api_version, *scopes, directory_ttl=300, requests=None):
         self.client_secret_file = client_secret_file
         self.api_name = api_name
         self.api_version = api_version
         self.scopes = [scope for scope in scopes[0]]
+        self.credentials = None
         self.service = self._create_service()
+        # Every API call goes through this executor (quota, backoff, fairness)
+        self.requests = requests or RequestExecutor()
+        if self.requests.http_factory is None and self.credentials is not None:
+            # One authorized Http per thread: the service's own is not thread-safe
+            self.requests.http_factory = lambda: AuthorizedHttp(self.credentials, http=httplib2.Http())
+        self.directory = CalendarDirectory(self.service, ttl=directory_ttl, requests=self.requests)
+
+    def execute(self, request, **kwargs):
+        """
+        Runs an API request through the shared RequestExecutor.
+        """
+        return self.requests.execute(request, **kwargs)
+
+    def _invalidate_on_404(self, error, calendar_id):
+        # A 404 on a calendar-scoped call (listing or inserting events) means
+        # the cached ID is stale. Not for calls on one event: its 404 is
+        # usually the event itself being gone.
+        if _http_status(error) == 404:
+            self.directory.invalidate(calendar_id)
 
     def _create_service(self):
         creds = None
@@ -41,7 +402,8 @@ class GoogleCalendar:
                 os.path.join(working_dir, token_dir, token_file), "w"
             ) as token:
                 token.write(creds.to_json())
-        
+
+        self.credentials = creds
         try:
             service = build(
                 self.api_name, self.api_version, credentials=creds
@@ -88,31 +450,19 @@ class GoogleCalendar:
             # Handle recurrence details if they exist
             recurrence_details = event_data_from_llm.get("recurrence_details")
             if recurrence_details:
-                rrule_parts = [f"FREQ={recurrence_details['rule'].upper()}"]
-                if recurrence_details.get('byweekday'):
-                    byweekday_str = ','.join(recurrence_details['byweekday'])
-                    rrule_parts.append(f"BYDAY={byweekday_str}")
-                if recurrence_details.get('until_date'):
-                    until_date_str = recurrence_details['until_date'].replace('-', '')
-                    until_dt = datetime.datetime.strptime(until_date_str, "%Y%m%d").replace(
-                        hour=23, minute=59, second=59, tzinfo=pytz.timezone('America/Sao_Paulo')
-                    ).astimezone(pytz.utc)
-                    rrule_parts.append(f"UNTIL={until_dt.strftime('%Y%m%dT%H%M%SZ')}")
-                elif recurrence_details.get('count'):
-                    rrule_parts.append(f"COUNT={recurrence_details['count']}")
-
-                event_body['recurrence'] = [f"RRULE:{';'.join(rrule_parts)}"]
+                event_body['recurrence'] = [_recurrence_rule(recurrence_details)]
 
             # Insert the event into the calendar
-            event = self.service.events().insert(
+            event = self.execute(self.service.events().insert(
                 calendarId=calendar_id,
                 body=event_body
-            ).execute()
+            ), retry_server_errors=False)
             print(f"Event created: {event.get('htmlLink')}")
             return event
 
         except Exception as e:
             print(f"Failed to create event: {e}")
+            self._invalidate_on_404(e, calendar_id)
             return None
 
     def create_new_calendar(self, calendar_name):
@@ -121,91 +471,200 @@ class GoogleCalendar:
                 'summary': calendar_name,
                 'timeZone': 'America/Sao_Paulo'
             }
-            created_calendar = self.service.calendars().insert(body=new_calendar).execute()
+            created_calendar = self.execute(
+                self.service.calendars().insert(body=new_calendar), retry_server_errors=False
+            )
             print(f"Calendar created: {created_calendar.get('htmlLink')}")
+            self.directory.add(created_calendar)
             return created_calendar
         except Exception as e:
             print(f"Failed to create calendar: {e}")
             return None
 
-    def update_event(self, calendar_id, event_id, updated_event_data):
+    def update_event(self, calendar_id, event_id, updated_event_data, etag=None):
         """
-        Updates an existing calendar event with new data, handling overnight events and recurrence.
+        Applies the LLM's update fields (summary, location, description,
+        attendees, start/end date and time, recurrence_details) with one
+        events.patch, through `patch_event`; fields not given are kept.
         """
-        try:
-            # Step 1: Get the current event data from the API
-            event_body = self.service.events().get(
-                calendarId=calendar_id,
-                eventId=event_id
-            ).execute()
-
-            # Step 2: Update the event_body with new data from LLM
-            if 'summary' in updated_event_data:
-                event_body['summary'] = updated_event_data['summary']
-            if 'location' in updated_event_data:
-                event_body['location'] = updated_event_data['location']
-            if 'description' in updated_event_data:
-                event_body['description'] = updated_event_data['description']
-            if 'attendees' in updated_event_data:
-                event_body['attendees'] = [{'email': email} for email in updated_event_data['attendees']]
-
-            # Step 3: Handle date and time updates, including overnight events
-            if 'start_date' in updated_event_data and 'start_time' in updated_event_data:
-                start_datetime_str = f"{updated_event_data['start_date']}T{updated_event_data['start_time']}"
-                start_dt = datetime.datetime.fromisoformat(start_datetime_str)
-                event_body['start']['dateTime'] = f"{start_dt.isoformat()}-03:00"
-
-            if 'end_date' in updated_event_data and 'end_time' in updated_event_data:
-                end_datetime_str = f"{updated_event_data['end_date']}T{updated_event_data['end_time']}"
-                end_dt = datetime.datetime.fromisoformat(end_datetime_str)
-
-                # Check if it's an overnight event and adjust the end date
-                if 'start' in event_body and event_body['start']['dateTime'] and end_dt < datetime.datetime.fromisoformat(event_body['start']['dateTime'].split('-')[0]):
-                    end_dt += timedelta(days=1)
-                event_body['end']['dateTime'] = f"{end_dt.isoformat()}-03:00"
-
-            # Step 4: Handle recurrence updates
-            recurrence_details = updated_event_data.get("recurrence_details")
-            if recurrence_details:
-                rrule_parts = [f"FREQ={recurrence_details['rule'].upper()}"]
-                if recurrence_details.get('byweekday'):
-                    byweekday_str = ','.join(recurrence_details['byweekday'])
-                    rrule_parts.append(f"BYDAY={byweekday_str}")
-                if recurrence_details.get('until_date'):
-                    until_date_str = recurrence_details['until_date'].replace('-', '')
-                    until_dt = datetime.datetime.strptime(until_date_str, "%Y%m%d").replace(
-                        hour=23, minute=59, second=59, tzinfo=pytz.timezone('America/Sao_Paulo')
-                    ).astimezone(pytz.utc)
-                    rrule_parts.append(f"UNTIL={until_dt.strftime('%Y%m%dT%H%M%SZ')}")
-                elif recurrence_details.get('count'):
-                    rrule_parts.append(f"COUNT={recurrence_details['count']}")
-                event_body['recurrence'] = [f"RRULE:{';'.join(rrule_parts)}"]
-            elif 'recurrence' in event_body:
-                del event_body['recurrence']
-
-            # Step 5: Perform the update API call
-            updated_event = self.service.events().update(
-                calendarId=calendar_id,
-                eventId=event_id,
-                body=event_body
-            ).execute()
+        changes = {
+            field: updated_event_data[field]
+            for field in ('summary', 'location', 'description')
+            if field in updated_event_data
+        }
+        if 'attendees' in updated_event_data:
+            changes['attendees'] = [{'email': email} for email in updated_event_data['attendees']]
+
+        start_dt = None
+        if 'start_date' in updated_event_data and 'start_time' in updated_event_data:
+            start_dt = datetime.datetime.fromisoformat(
+                f"{updated_event_data['start_date']}T{updated_event_data['start_time']}"
+            )
+            changes['start'] = {'dateTime': f"{start_dt.isoformat()}-03:00"}
+        if 'end_date' in updated_event_data and 'end_time' in updated_event_data:
+            end_dt = datetime.datetime.fromisoformat(
+                f"{updated_event_data['end_date']}T{updated_event_data['end_time']}"
+            )
+            # Overnight event: it ends the day after it starts
+            if start_dt is not None and end_dt < start_dt:
+                end_dt += datetime.timedelta(days=1)
+            changes['end'] = {'dateTime': f"{end_dt.isoformat()}-03:00"}
+
+        recurrence_details = updated_event_data.get("recurrence_details")
+        if recurrence_details:
+            changes['recurrence'] = [_recurrence_rule(recurrence_details)]
 
+        return self.patch_event(calendar_id, event_id, changes, etag)
+
+    def execute_batch(self, requests, max_attempts=3, retry_server_errors=True):
+        """
+        Runs `requests` ({key: callable returning an HttpRequest}) as Google
+        batch HTTP requests of up to BATCH_SIZE calls, fewer if the caller's
+        token bucket holds less, so a batch never waits for a full refill.
+
+        Returns {"succeeded": {key: response}, "failed": {key: error},
+        "attempts": n}. Items that fail with a retryable status (or without
+        one, e.g. a network error) are retried alone, up to `max_attempts`,
+        with the executor's jittered backoff; other failures are reported
+        right away. A batch that fails as a whole is retried the same way,
+        here only: the executor makes a single attempt per batch.
+
+        With `retry_server_errors` False (inserts) only rate-limit errors,
+        which guarantee nothing was applied, are retried, as in
+        `RequestExecutor.execute`.
+        """
+        pending = dict(requests)
+        succeeded = {}
+        failed = {}
+        attempts = 0
+        while pending and attempts < max_attempts:
+            if attempts:
+                self.requests.backoff(attempts - 1, retries=len(pending))
+            attempts += 1
+            retry = {}
+            keys = list(pending)
+            size = min(BATCH_SIZE, self.requests.max_cost())
+            for offset in range(0, len(keys), size):
+                chunk = keys[offset:offset + size]
+
+                def callback(request_id, response, exception, chunk=chunk):
+                    key = chunk[int(request_id)]
+                    if exception is None:
+                        succeeded[key] = response
+                        failed.pop(key, None)
+                        return
+                    failed[key] = exception
+                    if _is_retryable(exception, retry_server_errors) or (
+                        retry_server_errors and _http_status(exception) is None
+                    ):
+                        retry[key] = pending[key]
+
+                batch = self.service.new_batch_http_request(callback=callback)
+                for index, key in enumerate(chunk):
+                    batch.add(pending[key](), request_id=str(index))
+                try:
+                    # Each call in the batch counts against the quota
+                    self.requests.execute(batch, cost=len(chunk), max_attempts=1)
+                except Exception as e:
+                    # The whole batch request failed: every item is retried,
+                    # unless some may have been applied and retrying is unsafe
+                    print(f"Batch request failed: {e}")
+                    resend = retry_server_errors or (
+                        _http_status(e) is not None and _is_retryable(e, server_errors=False)
+                    )
+                    for key in chunk:
+                        if key not in succeeded:
+                            failed[key] = e
+                            if resend:
+                                retry[key] = pending[key]
+            pending = retry
+        return {"succeeded": succeeded, "failed": failed, "attempts": attempts}
+
+    def delete_events(self, calendar_id, event_ids, max_attempts=3):
+        """
+        Deletes many events with batch requests. An event that is already
+        gone (404/410) counts as deleted.
+        """
+        events = self.service.events()
+        result = self.execute_batch(
+            {
+                event_id: (lambda event_id=event_id: events.delete(calendarId=calendar_id, eventId=event_id))
+                for event_id in event_ids
+            },
+            max_attempts=max_attempts,
+        )
+        for event_id, error in list(result["failed"].items()):
+            if _http_status(error) in (404, 410):
+                del result["failed"][event_id]
+                result["succeeded"][event_id] = None
+        if result["failed"]:
+            print(f"Failed to delete {len(result['failed'])} event(s): {list(result['failed'])}")
+        return result
+
+    def insert_events(self, calendar_id, event_bodies, max_attempts=3):
+        """
+        Inserts many events ({key: event body}) with batch requests. Only
+        rate-limit errors are retried: after a 5xx the event may exist already.
+        """
+        events = self.service.events()
+        return self.execute_batch(
+            {
+                key: (lambda body=body: events.insert(calendarId=calendar_id, body=body))
+                for key, body in event_bodies.items()
+            },
+            max_attempts=max_attempts,
+            retry_server_errors=False,
+        )
+
+    def _patch_request(self, calendar_id, event_id, changes, etag=None):
+        request = self.service.events().patch(calendarId=calendar_id, eventId=event_id, body=changes)
+        if etag:
+            # The API answers 412 if the event changed since it was read
+            request.headers['If-Match'] = etag
+        return request
+
+    def patch_event(self, calendar_id, event_id, changes, etag=None):
+        """
+        Sends only `changes` (a partial event body) with events.patch, without
+        reading the event first. With `etag`, the patch only applies if the
+        event is still the version that was read.
+        """
+        try:
+            updated_event = self.execute(self._patch_request(calendar_id, event_id, changes, etag))
             print(f"Event updated: {updated_event.get('htmlLink')}")
             return updated_event
-
         except Exception as e:
-            print(f"Failed to update event: {e}")
+            if _http_status(e) == 412:
+                print(f"Event {event_id} changed since it was read; not updated.")
+            else:
+                print(f"Failed to patch event: {e}")
             return None
 
+    def patch_events(self, calendar_id, patches, etags=None, max_attempts=3):
+        """
+        Patches many events ({event_id: partial body}) with batch requests,
+        with the If-Match preconditions in `etags` ({event_id: etag}).
+        """
+        etags = etags or {}
+        return self.execute_batch(
+            {
+                event_id: (lambda event_id=event_id, body=body: self._patch_request(
+                    calendar_id, event_id, body, etags.get(event_id)
+                ))
+                for event_id, body in patches.items()
+            },
+            max_attempts=max_attempts,
+        )
+
     def delete_event(self, calendar_id, event_id):
         """
         Deletes a single event by its ID.
         """
         try:
-            self.service.events().delete(
+            self.execute(self.service.events().delete(
                 calendarId=calendar_id,
                 eventId=event_id
-            ).execute()
+            ))
             print(f"Event {event_id} deleted successfully.")
             return True
         except Exception as e:
@@ -214,51 +673,108 @@ class GoogleCalendar:
 
 
     def get_calendar_id_by_name(self, calendar_name):
+        """
+        Resolves the name through the cached calendar directory.
+        """
         try:
-            page_token = None
-            while True:
-                calendar_list = self.service.calendarList().list(pageToken=page_token).execute()
-                for calendar_list_entry in calendar_list['items']:
-                    if calendar_list_entry['summary'] == calendar_name:
-                        print(f"Found calendar '{calendar_name}' with ID: {calendar_list_entry['id']}")
-                        return calendar_list_entry['id']
-                page_token = calendar_list.get('nextPageToken')
-                if not page_token:
-                    break
+            calendar_id = self.directory.get_id(calendar_name)
+            if calendar_id:
+                print(f"Found calendar '{calendar_name}' with ID: {calendar_id}")
+                return calendar_id
             print(f"Calendar with name '{calendar_name}' not found.")
             return None
         except Exception as e:
             print(f"Failed to retrieve calendar ID: {e}")
             return None
         
-    def get_all_events(self, calendar_id, start_date=None, end_date=None, summary=None):
-        try:
-            # Pega a data e hora atual no fuso horário de São Paulo como padrão
-            saopaulo_tz = pytz.timezone("America/Sao_Paulo")
-            now = datetime.datetime.now(saopaulo_tz)
-
-            # Se start_date não for fornecido, usa a data e hora atual
-            if not start_date:
-                start_date = now.isoformat()
+    @staticmethod
+    def _time_window(start_date=None, end_date=None):
+        # Pega a data e hora atual no fuso horário de São Paulo como padrão
+        saopaulo_tz = pytz.timezone("America/Sao_Paulo")
+        now = datetime.datetime.now(saopaulo_tz)
+
+        # Se start_date não for fornecido, usa a data e hora atual
+        if not start_date:
+            start_date = now.isoformat()
+
+        # Se end_date não for fornecido, usa 30 dias a partir de agora
+        if not end_date:
+            end_date = (now + datetime.timedelta(days=30)).isoformat()
+
+        # Formata as datas para o Google Calendar
+        start_datetime = start_date + 'Z' if 'T' not in start_date else start_date
+        end_datetime = end_date + 'Z' if 'T' not in end_date else end_date
+        return start_datetime, end_datetime
+
+    def iter_events(self, calendar_id, start_date=None, end_date=None, q=None,
+                    fields=None, page_size=250, max_results=None):
+        """
+        Lazily yields the events of the window, page by page (following
+        nextPageToken). `fields` limits each event to the given fields
+        (e.g. "id,summary,start"), `page_size` is the API maxResults, and
+        `max_results` stops after that many events; callers may also just
+        stop iterating. API errors are raised to the caller.
+        """
+        start_datetime, end_datetime = self._time_window(start_date, end_date)
+        params = {
+            'calendarId': calendar_id,
+            'timeMin': start_datetime,
+            'timeMax': end_datetime,
+            'singleEvents': True,
+            'orderBy': 'startTime',
+            'maxResults': page_size,
+        }
+        if q:
+            params['q'] = q
+        if fields:
+            params['fields'] = f"items({fields}),nextPageToken"
+
+        yielded = 0
+        page_token = None
+        while True:
+            if max_results is not None:
+                params['maxResults'] = min(page_size, max_results - yielded)
+            events_result = self.execute(self.service.events().list(pageToken=page_token, **params))
+            for event in events_result.get('items', []):
+                yield event
+                yielded += 1
+                if max_results is not None and yielded >= max_results:
+                    return
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return
+
+    def search_events(self, calendar_id, query, start_date=None, end_date=None):
+        """
+        Finds the events whose title contains `query` (accent/case-insensitive).
 
-            # Se end_date não for fornecido, usa 30 dias a partir de agora
-            if not end_date:
-                end_date = (now + datetime.timedelta(days=30)).isoformat()
+        The title goes to the API as `q`, the window as timeMin/timeMax, and
+        only SEARCH_FIELDS come back. `q` matches whole words, so if it finds
+        nothing the window is listed again without it; the local title filter
+        is always applied as the final check.
+        """
+        try:
+            normalized_query = normalize_text(query)
+
+            def fetch(q=None):
+                return [
+                    event for event in self.iter_events(
+                        calendar_id, start_date, end_date, q=q, fields=SEARCH_FIELDS
+                    )
+                    if normalized_query in normalize_text(event.get('summary', ''))
+                ]
 
-            # Formata as datas para o Google Calendar
-            start_datetime = start_date + 'Z' if 'T' not in start_date else start_date
-            end_datetime = end_date + 'Z' if 'T' not in end_date else end_date
+            return fetch(q=query) or fetch()
+        except Exception as e:
+            print(f"Failed to search events: {e}")
+            self._invalidate_on_404(e, calendar_id)
+            return None
 
-            events_result = self.service.events().list(
-                calendarId=calendar_id,
-                timeMin=start_datetime,
-                timeMax=end_datetime,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
+    def get_all_events(self, calendar_id, start_date=None, end_date=None, summary=None):
+        try:
+            # Todas as páginas, não só as primeiras 250
+            events = list(self.iter_events(calendar_id, start_date, end_date))
 
-            events = events_result.get('items', [])
-            
             # Filtra por resumo se um for fornecido
             if summary:
                 normalized_summary = normalize_text(summary)
@@ -271,20 +787,15 @@ class GoogleCalendar:
             return events
         except Exception as e:
             print(f"Failed to retrieve events: {e}")
+            self._invalidate_on_404(e, calendar_id)
             return None
 
         
     def get_all_calendars(self):
         try:
-            page_token = None
-            all_calendars = []
-            while True:
-                calendar_list = self.service.calendarList().list(pageToken=page_token).execute()
-                all_calendars.extend(calendar_list.get('items', []))
-                page_token = calendar_list.get('nextPageToken')
-                if not page_token:
-                    break
-            
+            # Always fresh; also reloads the calendar directory
+            all_calendars = self.directory.reload()
+
             print("Your calendars:")
             for calendar in all_calendars:
                 print(f"  - {calendar.get('summary')} (ID: {calendar.get('id')})")
@@ -294,41 +805,41 @@ class GoogleCalendar:
             print(f"Failed to retrieve calendars: {e}")
             return None
 
+
 # --- Example Usage with the new class ---
-API_NAME = "calendar"
-API_VERSION = "v3"
-SCOPES = ["https://www.googleapis.com/auth/calendar"]
-
-# Instantiate the class, which handles authentication and service creation
-calendar_client = GoogleCalendar(
-    "google_api/client_secret.json", API_NAME, API_VERSION, SCOPES
-)
-
-
-
-if calendar_client.service:
-    all_my_calendars = calendar_client.get_all_calendars()
-    calendar_name = "wpp-llm"
-    wpp_calendar_id = calendar_client.get_calendar_id_by_name(calendar_name)
-    
-    # 1. Create the calendar only if it doesn't already exist
-    if not wpp_calendar_id:
-        print(f"Calendar '{calendar_name}' not found. Creating a new one...")
-        new_calendar = calendar_client.create_new_calendar(calendar_name)
-        if new_calendar:
-            wpp_calendar_id = new_calendar.get('id')
-    
-    if wpp_calendar_id:
-        # 2. Add an event to the specific calendar (if we found its ID)
-        event_details = {
-            'summary': 'Refactoring complete!',
-            'start': {'dateTime': '2025-08-28T10:00:00-03:00', 'timeZone': 'America/Sao_Paulo'},
-            'end': {'dateTime': '2025-08-28T11:00:00-03:00', 'timeZone': 'America/Sao_Paulo'},
-        }
-        calendar_client.create_event(wpp_calendar_id, event_details)
-        
-        # 3. Get all events from that specific calendar
-        calendar_client.get_all_events(wpp_calendar_id)
-    else:
-        print(f"Could not find or create calendar '{calendar_name}'. Event creation skipped.")
+# Only when run as a script: importing the module must not authenticate
+if __name__ == "__main__":
+    API_NAME = "calendar"
+    API_VERSION = "v3"
+    SCOPES = ["https://www.googleapis.com/auth/calendar"]
+
+    # Instantiate the class, which handles authentication and service creation
+    calendar_client = GoogleCalendar(
+        "google_api/client_secret.json", API_NAME, API_VERSION, SCOPES
+    )
+
+    if calendar_client.service:
+        all_my_calendars = calendar_client.get_all_calendars()
+        calendar_name = "wpp-llm"
+        wpp_calendar_id = calendar_client.get_calendar_id_by_name(calendar_name)
+
+        # 1. Create the calendar only if it doesn't already exist
+        if not wpp_calendar_id:
+            print(f"Calendar '{calendar_name}' not found. Creating a new one...")
+            new_calendar = calendar_client.create_new_calendar(calendar_name)
+            if new_calendar:
+                wpp_calendar_id = new_calendar.get('id')
+
+        if wpp_calendar_id:
+            # 2. Add an event to the specific calendar (if we found its ID)
+            event_details = {
+                'summary': 'Refactoring complete!',
+                'start': {'dateTime': '2025-08-28T10:00:00-03:00', 'timeZone': 'America/Sao_Paulo'},
+                'end': {'dateTime': '2025-08-28T11:00:00-03:00', 'timeZone': 'America/Sao_Paulo'},
+            }
+            calendar_client.create_event(wpp_calendar_id, event_details)
 
+            # 3. Get all events from that specific calendar
+            calendar_client.get_all_events(wpp_calendar_id)
+        else:
+            print(f"Could not find or create calendar '{calendar_name}'. Event creation skipped.")
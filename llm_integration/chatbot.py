@@ -1,6 +1,9 @@
+import asyncio
 import os
 import datetime
 import sys
+import threading
+import time
 import pytz
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -23,6 +26,10 @@ try:
 except ImportError:
     config = {}
 
+from llm_integration.fast_parser import FastIntentParser
+from llm_integration.prompt_builder import PromptBuilder, TokenUsage
+from llm_integration.router import ModelRouter, ModelTier
+
 # Define o nome do calendário padrão. Isso pode ser movido para um arquivo de configuração.
 DEFAULT_CALENDAR_NAME = config.get("DEFAULT_CALENDAR_NAME", "wpp-llm")
 
@@ -88,34 +95,8 @@ class GoogleCalendarAction(BaseModel):
         return v
 
 
-class GeminiChatbot:
-    """
-    Uma classe de chatbot que interage com a API do Google Gemini via LangChain.
-    """
-    def __init__(self, model_name: str = "gemini-2.0-flash"):
-        try:
-            if "GOOGLE_API_KEY" not in os.environ:
-                os.environ["GOOGLE_API_KEY"] = config.get("GOOGLE_API_KEY")
-            self.llm = ChatGoogleGenerativeAI(model=model_name, temperature=0.7)
-        except ValueError as e:
-            print(f"Error initializing the GeminiChatbot: {e}")
-            self.llm = None
-        except Exception as e:
-            print(f"An unexpected error occurred during initialization: {e}")
-            self.llm = None
-
-    def ask_question(self, user_question: str) -> dict:
-        """
-        Envia uma pergunta ao modelo Gemini para extrair informações da ação de calendário.
-        """
-        if not self.llm:
-            return {"error": "Chatbot is not initialized. Please check the API key."}
-
-        parser = JsonOutputParser(pydantic_object=GoogleCalendarAction)
-
-        # Prompt estruturado para guiar o LLM a gerar o JSON correto para todas as ações.
-        prompt = ChatPromptTemplate.from_template(
-            """
+# Prompt estruturado para guiar o LLM a gerar o JSON correto para todas as ações.
+PROMPT_TEMPLATE = """
         Você é um assistente de calendário inteligente que extrai intenções de usuário para um formato JSON.
         Sua tarefa é analisar a mensagem do usuário e determinar a ação, o alvo e os dados relevantes para o Google Calendar.
 
@@ -157,6 +138,7 @@ class GeminiChatbot:
             - Use o campo `update_data` para fornecer os dados que devem ser alterados.
             - Para adiar ou alterar a data, use `start_date` e `end_date` em `update_data`.
             - Se a intenção for adiar por um período (ex: "uma semana"), o valor em `update_data` deve ser um "offset" que o seu código interpretará, como `start_date_offset`.
+            - Se o usuário só quer ver como ficaria a alteração (ex: "simule", "como ficaria"), inclua `"dry_run": true` em `update_data`; nada será alterado.
 
             Exemplo: "Mude a reunião com o cliente para amanhã" -> {{"action": "update", "target": "event", "event_summary_or_id": "Reunião com o cliente", "update_data": {{"start_date": "2025-08-27", "end_date": "2025-08-27"}}}}
             
@@ -174,19 +156,292 @@ class GeminiChatbot:
 
         Mensagem do usuário: {question}
         """
-        ).partial(format_instructions=parser.get_format_instructions())
 
+
+def validate_action(response) -> dict:
+    """
+    Garante que a saída do LLM segue o esquema `GoogleCalendarAction`.
+    Um objeto vazio é válido: a mensagem não é sobre calendário.
+    """
+    if not isinstance(response, dict):
+        raise ValueError(f"Resposta do LLM não é um objeto JSON: {response!r}")
+    if response:
+        GoogleCalendarAction(**response)
+    return response
+
+
+class _FieldTracker:
+    """
+    Detecta, no JSON parcial transmitido pelo LLM, os campos de primeiro
+    nível que já estão completos: um campo termina quando o próximo começa.
+    """
+
+    def __init__(self, on_field):
+        self.on_field = on_field
+        self.emitted = set()
+
+    def _emit(self, name, value):
+        if name in self.emitted:
+            return
+        self.emitted.add(name)
         try:
-            current_date_str = get_current_saopaulo_date()
-            chain = prompt | self.llm | parser
-            response = chain.invoke(
-                {
-                    "question": user_question,
-                    "current_date": current_date_str,
-                    "default_calendar_name": DEFAULT_CALENDAR_NAME,
-                }
-            )
+            self.on_field(name, value)
+        except Exception as e:
+            print(f"Erro ao despachar o campo '{name}': {e}")
+
+    def update(self, partial):
+        if self.on_field is None or not isinstance(partial, dict):
+            return
+        keys = list(partial)
+        for name in keys[:-1]:
+            self._emit(name, partial[name])
+
+    def finish(self, response):
+        if self.on_field is None or not isinstance(response, dict):
+            return
+        for name, value in response.items():
+            self._emit(name, value)
+
+
+class GeminiChatbot:
+    """
+    Uma classe de chatbot que interage com a API do Google Gemini via LangChain.
+
+    O parser, o prompt e a chain são montados uma única vez no construtor;
+    cada mensagem só formata o prompt e chama o modelo.
+
+    Mensagens formulaicas são resolvidas antes pelo `FastIntentParser`,
+    sem chamar o LLM, e respostas repetidas vêm do `response_cache`.
+    """
+    def __init__(
+        self,
+        model_name: str = "gemini-2.0-flash",
+        use_fast_path: bool = True,
+        response_cache=None,
+        escalation_model_name: Optional[str] = None,
+        temperature: float = 0.7,
+        timeout: Optional[float] = None,
+        hedge_percentile: Optional[float] = None,
+        simple_max_chars: int = 120,
+        prompt_mode: str = "compact",
+        llms: Optional[list] = None,
+    ):
+        """
+        `model_name` atende mensagens simples e `escalation_model_name`, se
+        informado, as complexas e as que o primeiro modelo não conseguiu
+        responder com um JSON válido. `llms` aceita uma lista de pares
+        (nome, modelo LangChain) no lugar dos modelos Gemini, por exemplo
+        um `FakeListChatModel` em testes. `prompt_mode` escolhe entre o
+        prompt compacto ("compact") e o original ("full").
+        """
+        self.fast_parser = FastIntentParser(DEFAULT_CALENDAR_NAME) if use_fast_path else None
+        self.response_cache = response_cache
+        self.hedge_percentile = hedge_percentile
+        self.simple_max_chars = simple_max_chars
+        self.prompt_mode = prompt_mode
+        self.parser = None
+        self.prompt = None
+        self.prompt_builder = None
+        self.token_usage = TokenUsage()
+        self.router = None
+        self.build_seconds = 0.0
+        self._stats_lock = threading.Lock()
+        self._stats = {"calls": 0, "errors": 0, "prompt_seconds": 0.0, "llm_seconds": 0.0}
+        if llms is None:
+            llms = []
+            try:
+                if "GOOGLE_API_KEY" not in os.environ:
+                    os.environ["GOOGLE_API_KEY"] = config.get("GOOGLE_API_KEY")
+                for name in filter(None, [model_name, escalation_model_name]):
+                    llms.append((
+                        name,
+                        ChatGoogleGenerativeAI(model=name, temperature=temperature, timeout=timeout),
+                    ))
+            except ValueError as e:
+                print(f"Error initializing the GeminiChatbot: {e}")
+                llms = []
+            except Exception as e:
+                print(f"An unexpected error occurred during initialization: {e}")
+                llms = []
+        self.llms = llms
+        self.llm = llms[0][1] if llms else None
+
+        if self.llm:
+            self._build_chain()
+
+    def _build_chain(self):
+        """
+        Compila o parser, o prompt e as chains que são reutilizados em todas as mensagens.
+        """
+        started = time.perf_counter()
+        self.parser = JsonOutputParser(pydantic_object=GoogleCalendarAction)
+        self.prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE).partial(
+            format_instructions=self.parser.get_format_instructions(),
+            default_calendar_name=DEFAULT_CALENDAR_NAME,
+        )
+        self.prompt_builder = PromptBuilder(self.prompt, DEFAULT_CALENDAR_NAME, mode=self.prompt_mode)
+        self.router = ModelRouter(
+            [
+                ModelTier(name, llm.with_config(callbacks=[self.token_usage]) | self.parser)
+                for name, llm in self.llms
+            ],
+            validator=validate_action,
+            simple_max_chars=self.simple_max_chars,
+            hedge_percentile=self.hedge_percentile,
+        )
+        self.build_seconds = time.perf_counter() - started
+
+    def _record(self, prompt_seconds: float, llm_seconds: float, failed: bool = False):
+        with self._stats_lock:
+            self._stats["calls"] += 1
+            self._stats["prompt_seconds"] += prompt_seconds
+            self._stats["llm_seconds"] += llm_seconds
+            if failed:
+                self._stats["errors"] += 1
+
+    def _fast_path(self, user_question: str):
+        if self.fast_parser is None:
+            return None
+        return self.fast_parser.parse(user_question)
+
+    def _cache_get(self, user_question: str, current_date: str):
+        if self.response_cache is None:
+            return None
+        try:
+            return self.response_cache.get(user_question, current_date)
+        except Exception as e:
+            print(f"Erro ao consultar o cache do LLM: {e}")
+            return None
+
+    def _cache_set(self, user_question: str, current_date: str, response: dict):
+        if self.response_cache is None:
+            return
+        try:
+            self.response_cache.set(user_question, current_date, response)
+        except Exception as e:
+            print(f"Erro ao gravar no cache do LLM: {e}")
+
+    async def _acache_call(self, func, *args):
+        # O backend Redis faz I/O de rede: fora do event loop
+        if self.response_cache is not None and self.response_cache.redis is not None:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    def ask_question(self, user_question: str) -> dict:
+        """
+        Envia uma pergunta ao modelo Gemini para extrair informações da ação de calendário.
+        """
+        fast_response = self._fast_path(user_question)
+        if fast_response is not None:
+            return fast_response
+
+        if not self.llm:
+            return {"error": "Chatbot is not initialized. Please check the API key."}
+
+        current_date = get_current_saopaulo_date()
+        cached = self._cache_get(user_question, current_date)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
+        prompt_done = started
+        try:
+            prompt_value = self.prompt_builder.build(user_question, current_date)
+            prompt_done = time.perf_counter()
+            response = self.router.invoke(user_question, prompt_value)
+            self._record(prompt_done - started, time.perf_counter() - prompt_done)
+            self._cache_set(user_question, current_date, response)
+            return response
+        except Exception as e:
+            self._record(prompt_done - started, time.perf_counter() - prompt_done, failed=True)
+            print(f"Erro ao obter a resposta do LLM: {e}")
+            return {}
+
+    async def aask_question(self, user_question: str) -> dict:
+        """
+        Versão assíncrona de `ask_question`: aguarda o modelo com `ainvoke`,
+        sem ocupar uma thread.
+        """
+        fast_response = self._fast_path(user_question)
+        if fast_response is not None:
+            return fast_response
+
+        if not self.llm:
+            return {"error": "Chatbot is not initialized. Please check the API key."}
+
+        current_date = get_current_saopaulo_date()
+        cached = await self._acache_call(self._cache_get, user_question, current_date)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
+        prompt_done = started
+        try:
+            prompt_value = self.prompt_builder.build(user_question, current_date)
+            prompt_done = time.perf_counter()
+            response = await self.router.ainvoke(user_question, prompt_value)
+            self._record(prompt_done - started, time.perf_counter() - prompt_done)
+            await self._acache_call(self._cache_set, user_question, current_date, response)
+            return response
+        except Exception as e:
+            self._record(prompt_done - started, time.perf_counter() - prompt_done, failed=True)
+            print(f"Erro ao obter a resposta do LLM: {e}")
+            return {}
+
+    async def astream_question(self, user_question: str, on_field=None) -> dict:
+        """
+        Versão em streaming de `aask_question`. `on_field(nome, valor)` é
+        chamado para cada campo de primeiro nível assim que ele está completo
+        no JSON parcial, antes do fim da geração, para que o chamador possa
+        adiantar buscas no Google Calendar.
+        """
+        tracker = _FieldTracker(on_field)
+        fast_response = self._fast_path(user_question)
+        if fast_response is not None:
+            tracker.finish(fast_response)
+            return fast_response
+
+        if not self.llm:
+            return {"error": "Chatbot is not initialized. Please check the API key."}
+
+        current_date = get_current_saopaulo_date()
+        cached = await self._acache_call(self._cache_get, user_question, current_date)
+        if cached is not None:
+            tracker.finish(cached)
+            return cached
+
+        started = time.perf_counter()
+        prompt_done = started
+        try:
+            prompt_value = self.prompt_builder.build(user_question, current_date)
+            prompt_done = time.perf_counter()
+            response = await self.router.astream(user_question, prompt_value, tracker.update)
+            tracker.finish(response)
+            self._record(prompt_done - started, time.perf_counter() - prompt_done)
+            await self._acache_call(self._cache_set, user_question, current_date, response)
             return response
         except Exception as e:
+            self._record(prompt_done - started, time.perf_counter() - prompt_done, failed=True)
             print(f"Erro ao obter a resposta do LLM: {e}")
-            return {}
\ No newline at end of file
+            return {}
+
+    def get_stats(self) -> dict:
+        """
+        Tempo de montagem do prompt e tempo do LLM, reportados separadamente,
+        e o tamanho dos prompts (estimado e o real informado pelo modelo).
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        calls = stats["calls"] or 1
+        return {
+            "calls": stats["calls"],
+            "errors": stats["errors"],
+            "chain_build_ms": round(self.build_seconds * 1000, 2),
+            "avg_prompt_ms": round(stats["prompt_seconds"] / calls * 1000, 3),
+            "avg_llm_ms": round(stats["llm_seconds"] / calls * 1000, 2),
+            "fast_path": self.fast_parser.metrics() if self.fast_parser else None,
+            "cache": self.response_cache.metrics() if self.response_cache else None,
+            "routing": self.router.metrics() if self.router else None,
+            "prompt": self.prompt_builder.metrics() if self.prompt_builder else None,
+            "tokens": self.token_usage.metrics(),
+        }
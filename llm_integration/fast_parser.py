@@ -0,0 +1,299 @@
+import datetime
+import re
+import threading
+import time
+
+import pytz
+
+from python_integration.src.utils.text import normalize_text
+
+SAOPAULO_TZ = pytz.timezone("America/Sao_Paulo")
+
+NUMBER_WORDS = {
+    "um": 1,
+    "uma": 1,
+    "dois": 2,
+    "duas": 2,
+    "tres": 3,
+    "quatro": 4,
+    "cinco": 5,
+    "seis": 6,
+    "sete": 7,
+    "oito": 8,
+    "nove": 9,
+    "dez": 10,
+    "quinze": 15,
+    "trinta": 30,
+}
+UNITS = {
+    "dia": "day",
+    "dias": "day",
+    "semana": "week",
+    "semanas": "week",
+    "mes": "month",
+    "meses": "month",
+    "ano": "year",
+    "anos": "year",
+}
+WEEKDAYS = {
+    "segunda": 0,
+    "terca": 1,
+    "quarta": 2,
+    "quinta": 3,
+    "sexta": 4,
+    "sabado": 5,
+    "domingo": 6,
+}
+
+_NUMBER = r"\d+|" + "|".join(NUMBER_WORDS)
+_TIME = r"(?P<{0}hour>\d{{1,2}})(?:(?:h|:)(?P<{0}minute>\d{{2}})?|\s*horas?)"
+_DAY = (
+    r"(?P<day>hoje|amanha|depois de amanha"
+    r"|(?:n[ao]\s+)?(?:proxim[oa]\s+)?"
+    r"(?P<weekday>segunda|terca|quarta|quinta|sexta|sabado|domingo)(?:-feira)?"
+    r"|(?:(?:n?o\s+)?dia\s+)?(?P<dm>\d{1,2}/\d{1,2}(?:/\d{4})?))"
+)
+
+# Todas as regras casam a mensagem inteira (já sem acentos e em minúsculas),
+# então só mensagens sem ambiguidade passam pelo caminho rápido.
+_LIST_CALENDARS = re.compile(
+    r"(?:quais\s+(?:sao\s+)?|mostre\s+|mostrar\s+|liste\s+|listar\s+|ver\s+)?"
+    r"(?:os\s+|todos\s+os\s+)?(?:meus\s+)?calendarios"
+)
+_LIST_EVENTS = re.compile(
+    r"(?:(?:mostre|mostrar|mostra|liste|listar|lista|ver|veja|exiba|exibir"
+    r"|quais\s+sao|quais)\s+(?:os\s+|todos\s+os\s+)?(?:meus\s+)?"
+    r"(?:proximos\s+)?(?:eventos|compromissos)|minha\s+agenda|meus\s+eventos)"
+)
+_DELETE_ALL = re.compile(
+    r"(?:apague|apagar|apaga|delete|deletar|deleta|exclua|excluir|remova|remover)"
+    r"\s+(?:tudo|todos\s+os\s+(?:meus\s+)?(?:eventos|compromissos))"
+    r"|(?:limpe|limpar|limpa)\s+(?:o\s+|a\s+|meu\s+|minha\s+)?(?:calendario|agenda)"
+)
+_CREATE_CALENDAR = re.compile(
+    r"(?:crie|criar|cria|adicione|adicionar)\s+(?:um\s+)?(?:novo\s+)?calendario"
+    r"\s+(?:chamado\s+|com\s+o\s+nome\s+(?:de\s+)?)?"
+    r"(?:(?:para|pra|de|do|da)\s+)?(?P<name>.+)"
+)
+_SHIFT_EVENTS = re.compile(
+    r"(?P<verb>adie|adiar|adia|postergue|postergar|empurre|empurrar"
+    r"|antecipe|antecipar|adiante|adiantar)\s+"
+    r"(?:(?:o|a|os|as)\s+)?(?:eventos?\s+|compromissos?\s+)?"
+    r"(?P<summary>.+?)\s+(?:em|por)\s+"
+    r"(?P<n>" + _NUMBER + r")\s+(?P<unit>dias?|semanas?|mes|meses|anos?)"
+)
+# "todos os eventos", "tudo"...: vários eventos, não um título; fica para o LLM
+_QUANTIFIER = re.compile(r"(?:tod[oa]s?|tudo|cada|eventos|compromissos)\b")
+_CREATE_EVENT = re.compile(
+    r"(?:agende|agendar|marque|marcar|crie|criar)\s+(?:um\s+|uma\s+)?"
+    r"(?:evento\s+|compromisso\s+)?(?P<summary>.+?)\s+"
+    + _DAY
+    + r"\s+(?:as|a|ao|das)\s+"
+    + _TIME.format("")
+    + r"(?:\s+(?:ate|as|a)\s+(?:as\s+)?"
+    + _TIME.format("end_")
+    + r")?"
+)
+# Título seguido de um dia ("reuniao de hoje", "dentista na sexta")
+_TITLE_DAY = re.compile(r"(?P<title>.+?)\s+(?:(?:de|do|da|para|pra)\s+)?" + _DAY)
+_TRAILING = re.compile(r"[\s.!?]+$")
+_QUOTES = "'\"“”‘’"
+
+
+def _fold(text: str):
+    """
+    Normaliza o texto e devolve, para cada caractere normalizado, a posição
+    correspondente no texto original (para recuperar nomes com acentos).
+    """
+    if text.isascii():
+        return text.lower(), range(len(text))
+    chars, index = [], []
+    for i, c in enumerate(text):
+        for folded in normalize_text(c):
+            chars.append(folded)
+            index.append(i)
+    return "".join(chars), index
+
+
+def _number(value: str) -> int:
+    return int(value) if value.isdigit() else NUMBER_WORDS[value]
+
+
+class FastIntentParser:
+    """
+    Parser local e determinístico para mensagens formulaicas
+    ("mostre meus eventos", "apagar tudo", "adie X em uma semana",
+    "crie calendário Y", "marque X amanhã às 15h").
+
+    Devolve o mesmo formato de `GoogleCalendarAction` que o LLM, ou None
+    quando a mensagem não casa com nenhuma regra de alta confiança.
+    """
+
+    def __init__(self, default_calendar_name: str):
+        self.default_calendar_name = default_calendar_name
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.total_seconds = 0.0
+
+    def parse(self, message: str, now: datetime.datetime = None):
+        started = time.perf_counter()
+        result = self._parse(message, now)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.total_seconds += elapsed
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def _parse(self, message: str, now):
+        if not isinstance(message, str):
+            return None
+        original = " ".join(message.split())
+        folded, index = _fold(original)
+        folded = _TRAILING.sub("", folded)
+
+        def span(match, group):
+            start, stop = match.span(group)
+            return original[index[start] : index[stop - 1] + 1].strip(_QUOTES + " ")
+
+        if _LIST_CALENDARS.fullmatch(folded):
+            return {"action": "list", "target": "calendar"}
+
+        if _LIST_EVENTS.fullmatch(folded):
+            return {
+                "action": "list",
+                "target": "event",
+                "calendar_name": self.default_calendar_name,
+            }
+
+        if _DELETE_ALL.fullmatch(folded):
+            return {
+                "action": "delete_all_events",
+                "target": "event",
+                "calendar_name": self.default_calendar_name,
+            }
+
+        match = _CREATE_CALENDAR.fullmatch(folded)
+        if match:
+            name = span(match, "name")
+            if not name:
+                return None
+            return {"action": "create", "target": "calendar", "calendar_name": name}
+
+        match = _SHIFT_EVENTS.fullmatch(folded)
+        if match and not _QUANTIFIER.match(match.group("summary")):
+            sign = "-" if match.group("verb").startswith(("antecip", "adiant")) else "+"
+            value = _number(match.group("n"))
+            unit = UNITS[match.group("unit")]
+            return {
+                "action": "update",
+                "target": "event",
+                "calendar_name": self.default_calendar_name,
+                "event_summary_or_id": span(match, "summary"),
+                "update_data": {
+                    "start_date_offset": f"{sign}{value} {unit}{'s' if value != 1 else ''}"
+                },
+            }
+
+        match = _CREATE_EVENT.fullmatch(folded)
+        if match:
+            return self._create_event(match, span(match, "summary"), now)
+
+        return None
+
+    def _create_event(self, match, summary: str, now):
+        today = (now or datetime.datetime.now(SAOPAULO_TZ)).date()
+        start_date = resolve_relative_date(match, today)
+        hour = int(match.group("hour"))
+        minute = int(match.group("minute") or 0)
+        if start_date is None or not summary or hour > 23 or minute > 59:
+            return None
+
+        start = datetime.datetime.combine(start_date, datetime.time(hour, minute))
+        if match.group("end_hour"):
+            end_hour = int(match.group("end_hour"))
+            end_minute = int(match.group("end_minute") or 0)
+            if end_hour > 23 or end_minute > 59:
+                return None
+            end = datetime.datetime.combine(
+                start_date, datetime.time(end_hour, end_minute)
+            )
+            if end <= start:
+                end += datetime.timedelta(days=1)
+        else:
+            end = start + datetime.timedelta(hours=1)
+
+        return {
+            "action": "create",
+            "target": "event",
+            "calendar_name": self.default_calendar_name,
+            "event_details": {
+                "summary": summary,
+                "start_date": start.strftime("%Y-%m-%d"),
+                "end_date": end.strftime("%Y-%m-%d"),
+                "start_time": start.strftime("%H:%M:%S"),
+                "end_time": end.strftime("%H:%M:%S"),
+                "location": "To be determined",
+            },
+        }
+
+    def metrics(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "avg_us": round(self.total_seconds / total * 1e6, 2) if total else 0.0,
+            }
+
+
+def resolve_relative_date(match, today: datetime.date):
+    """
+    Converte "hoje", "amanhã", "depois de amanhã", dias da semana e "dd/mm[/aaaa]"
+    (grupos `day`, `weekday` e `dm` de `_DAY`) em uma data.
+    """
+    day = match.group("day")
+    if day == "hoje":
+        return today
+    if day == "amanha":
+        return today + datetime.timedelta(days=1)
+    if day == "depois de amanha":
+        return today + datetime.timedelta(days=2)
+    if match.group("weekday"):
+        days_ahead = (WEEKDAYS[match.group("weekday")] - today.weekday()) % 7 or 7
+        return today + datetime.timedelta(days=days_ahead)
+    if match.group("dm"):
+        parts = [int(p) for p in match.group("dm").split("/")]
+        year = parts[2] if len(parts) == 3 else today.year
+        try:
+            date = datetime.date(year, parts[1], parts[0])
+        except ValueError:
+            return None
+        if len(parts) == 2 and date < today:
+            date = date.replace(year=year + 1)
+        return date
+    return None
+
+
+def split_title_and_day(text: str, today: datetime.date):
+    """
+    Separa um dia no fim de um título de evento: "Reunião de hoje" ->
+    ("Reunião", data de hoje). Sem dia reconhecível, devolve (text, None).
+    """
+    if not isinstance(text, str):
+        return text, None
+    original = " ".join(text.split())
+    folded, index = _fold(original)
+    folded = _TRAILING.sub("", folded)
+    match = _TITLE_DAY.fullmatch(folded)
+    if not match:
+        return text, None
+    day = resolve_relative_date(match, today)
+    if day is None:
+        return text, None
+    start, stop = match.span("title")
+    return original[index[start] : index[stop - 1] + 1].strip(_QUOTES + " "), day
@@ -0,0 +1,254 @@
+import re
+import threading
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.prompts import ChatPromptTemplate
+
+from python_integration.src.utils.text import normalize_text
+
+# Núcleo do prompt compacto: o esquema vai escrito à mão, no lugar das
+# instruções de formato geradas a partir do pydantic.
+COMPACT_TEMPLATE = """Extraia a intenção de calendário da mensagem do usuário como um objeto JSON.
+Data de referência atual: {current_date}
+
+Esquema (omita campos não usados):
+{{"action": "create|delete|list|update|delete_all_events", "target": "event|calendar",
+ "calendar_name": str, "event_summary_or_id": str, "update_data": {{campo: novo valor}},
+ "event_details": {{"summary": str, "start_date": "YYYY-MM-DD", "end_date": "YYYY-MM-DD",
+  "start_time": "HH:MM:SS", "end_time": "HH:MM:SS", "location": str, "description": str{recurrence_field}}}}}
+{recurrence_rules}
+Regras:
+- Responda SOMENTE com o JSON, sem texto adicional.
+- Calcule datas relativas ("amanhã", "sexta") a partir da data de referência; sem horário, use "00:00:00".
+- `calendar_name` padrão: "{default_calendar_name}".
+- Para adiar/antecipar por um período use `update_data.start_date_offset` (ex: "+7 days").
+- Se o usuário só quer ver como ficaria uma alteração ("simule", "como ficaria"), inclua `update_data.dry_run: true`.
+- Se a mensagem não é sobre calendário, responda {{}}.
+
+Exemplos:
+{examples}
+
+Mensagem do usuário: {question}"""
+
+_RECURRENCE_FIELD = """,
+  "recurrence_details": {"rule": "DAILY|WEEKLY|MONTHLY|YEARLY", "until_date": "YYYY-MM-DD",
+   "count": int, "byweekday": ["MO".."SU"], "interval": int}"""
+
+_RECURRENCE_RULES = (
+    """Recorrência: com N semanas e D dias da semana, `count` = N * D."""
+)
+
+# Exemplos few-shot, agrupados pela intenção que ilustram
+FEW_SHOT_EXAMPLES = {
+    "create_calendar": [
+        (
+            "Crie um novo calendário chamado 'Viagens'",
+            '{"action": "create", "target": "calendar", "calendar_name": "Viagens"}',
+        ),
+    ],
+    "create": [
+        (
+            "Agende um almoço amanhã às 13h no restaurante de sempre",
+            '{"action": "create", "target": "event", "event_details": {"summary": "Almoço", '
+            '"start_date": "2025-08-29", "end_date": "2025-08-29", "start_time": "13:00:00", '
+            '"end_time": "14:00:00", "location": "Restaurante de sempre"}}',
+        ),
+    ],
+    "recurring": [
+        (
+            "marcar investigação pessoal de segunda a sexta das 21:30 ate o fim da semana que vem",
+            '{"action": "create", "target": "event", "event_details": {"summary": "investigação pessoal", '
+            '"start_date": "2025-09-01", "end_date": "2025-09-01", "start_time": "21:30:00", '
+            '"end_time": "23:59:00", "recurrence_details": {"rule": "WEEKLY", '
+            '"byweekday": ["MO", "TU", "WE", "TH", "FR"], "until_date": "2025-09-12"}}}',
+        ),
+    ],
+    "list": [
+        (
+            "Mostre meus eventos",
+            '{"action": "list", "target": "event", "calendar_name": "{default_calendar_name}"}',
+        ),
+        ("Quais são meus calendários?", '{"action": "list", "target": "calendar"}'),
+    ],
+    "delete": [
+        (
+            "Delete a reunião de hoje",
+            '{"action": "delete", "target": "event", "event_summary_or_id": "Reunião de hoje"}',
+        ),
+        (
+            "Delete todos os eventos até o fim do ano",
+            '{"action": "delete_all_events", "target": "event"}',
+        ),
+    ],
+    "update": [
+        (
+            "Mude a reunião com o cliente para amanhã",
+            '{"action": "update", "target": "event", "event_summary_or_id": "Reunião com o cliente", '
+            '"update_data": {"start_date": "2025-08-27", "end_date": "2025-08-27"}}',
+        ),
+        (
+            "Adie todos os eventos teste em uma semana",
+            '{"action": "update", "target": "event", "event_summary_or_id": "teste", '
+            '"update_data": {"start_date_offset": "+7 days"}}',
+        ),
+    ],
+}
+
+# Palavras-chave (sem acentos) que indicam cada intenção
+_INTENT_PATTERNS = [
+    (
+        "recurring",
+        re.compile(
+            r"\b(?:tod[oa]s?\b|cada|semanas|repet|recorr|diariamente|de segunda a|durante)"
+        ),
+    ),
+    (
+        "update",
+        re.compile(
+            r"\b(?:mud|alter|adi[ae]|antecip|remarc|troc|edit|atualiz|pass[ae])"
+        ),
+    ),
+    ("delete", re.compile(r"\b(?:apag|delet|exclu|remov|cancel|limp)")),
+    ("list", re.compile(r"\b(?:mostr|list|quais|ver\b|veja|o que tenho|minha agenda)")),
+    ("create_calendar", re.compile(r"\b(?:cri|nov)\w*\b.*\bcalendario")),
+    ("create", re.compile(r"\b(?:marc|agend|cri|adicion|coloc|lembr)")),
+]
+_DEFAULT_INTENTS = ("create", "list")
+
+
+def classify_intents(message: str) -> list:
+    """
+    Intenções prováveis da mensagem, na ordem de `_INTENT_PATTERNS`.
+    """
+    text = normalize_text(message)
+    intents = [name for name, pattern in _INTENT_PATTERNS if pattern.search(text)]
+    return intents or list(_DEFAULT_INTENTS)
+
+
+def estimate_tokens(text: str) -> int:
+    # Aproximação de ~4 caracteres por token, usada quando o provedor não
+    # devolve a contagem real
+    return max(1, len(text) // 4)
+
+
+class TokenUsage(BaseCallbackHandler):
+    """
+    Soma os tokens reais (usage_metadata) reportados pelo modelo.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.last_input_tokens = None
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if not usage:
+                    continue
+                with self._lock:
+                    self.calls += 1
+                    self.input_tokens += usage.get("input_tokens", 0)
+                    self.output_tokens += usage.get("output_tokens", 0)
+                    self.last_input_tokens = usage.get("input_tokens")
+
+    def metrics(self) -> dict:
+        with self._lock:
+            calls = self.calls or 1
+            return {
+                "calls": self.calls,
+                "avg_input_tokens": round(self.input_tokens / calls, 1),
+                "avg_output_tokens": round(self.output_tokens / calls, 1),
+                "last_input_tokens": self.last_input_tokens,
+            }
+
+
+class PromptBuilder:
+    """
+    Monta o prompt de cada mensagem.
+
+    - `compact`: esquema enxuto e só os exemplos das intenções detectadas
+      na mensagem (no máximo `max_examples`).
+    - `full`: o prompt original (`full_prompt`), com todas as instruções e
+      as instruções de formato do pydantic.
+
+    Guarda o tamanho estimado de cada prompt por modo, para comparar os dois.
+    """
+
+    def __init__(
+        self,
+        full_prompt,
+        default_calendar_name: str,
+        mode: str = "compact",
+        max_examples: int = 3,
+    ):
+        if mode not in ("compact", "full"):
+            raise ValueError(f"PROMPT_MODE inválido: {mode!r}")
+        self.mode = mode
+        self.full_prompt = full_prompt
+        self.default_calendar_name = default_calendar_name
+        self.max_examples = max_examples
+        self.compact_prompt = ChatPromptTemplate.from_template(
+            COMPACT_TEMPLATE
+        ).partial(default_calendar_name=default_calendar_name)
+        self.requests = 0
+        self.estimated_tokens = 0
+        self.last_estimated_tokens = None
+        self._lock = threading.Lock()
+
+    def select_examples(self, question: str) -> list:
+        examples = []
+        for intent in classify_intents(question):
+            for example in FEW_SHOT_EXAMPLES[intent]:
+                if len(examples) >= self.max_examples:
+                    return examples
+                examples.append(example)
+        return examples
+
+    def _compact(self, question: str, current_date: str):
+        intents = classify_intents(question)
+        recurring = "recurring" in intents
+        examples = "\n".join(
+            f'"{message}" -> {output.replace("{default_calendar_name}", self.default_calendar_name)}'
+            for message, output in self.select_examples(question)
+        )
+        return self.compact_prompt.invoke(
+            {
+                "question": question,
+                "current_date": current_date,
+                "examples": examples,
+                "recurrence_field": _RECURRENCE_FIELD if recurring else "",
+                "recurrence_rules": _RECURRENCE_RULES if recurring else "",
+            }
+        )
+
+    def build(self, question: str, current_date: str):
+        if self.mode == "full":
+            prompt_value = self.full_prompt.invoke(
+                {"question": question, "current_date": current_date}
+            )
+        else:
+            prompt_value = self._compact(question, current_date)
+        tokens = estimate_tokens(prompt_value.to_string())
+        with self._lock:
+            self.requests += 1
+            self.estimated_tokens += tokens
+            self.last_estimated_tokens = tokens
+        return prompt_value
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "requests": self.requests,
+                "avg_estimated_input_tokens": (
+                    round(self.estimated_tokens / self.requests, 1)
+                    if self.requests
+                    else 0.0
+                ),
+                "last_estimated_input_tokens": self.last_estimated_tokens,
+            }
@@ -0,0 +1,105 @@
+import json
+import re
+
+from python_integration.src.utils.text import normalize_text
+from python_integration.src.utils.ttl_cache import TTLCache
+
+# Mensagens relativas à hora atual ("daqui a 2 horas") mudam de resposta
+# dentro do mesmo dia e nunca são cacheadas.
+_TIME_RELATIVE = re.compile(
+    r"\b(?:agora|daqui|dentro de|minutos?|em \d+ horas?|em uma hora|proxima hora)\b"
+)
+_PUNCTUATION = re.compile(r"[^\w\s/:]")
+
+
+class ResponseCache:
+    """
+    Cache das respostas do LLM.
+
+    A chave é a mensagem normalizada (sem acentos, caixa e pontuação) mais o
+    dia de referência que `get_current_saopaulo_date` injeta no prompt, então
+    "amanhã" continua resolvendo para a data certa. Usa um LRU local com TTL
+    e, opcionalmente, Redis para compartilhar as respostas entre réplicas.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600,
+        max_size: int = 1024,
+        redis_client=None,
+        prefix: str = "wpp:llm",
+    ):
+        self.ttl = ttl
+        self.redis = redis_client
+        self.prefix = prefix
+        self._local = TTLCache(max_size=max_size, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def key(self, message: str, current_date: str):
+        """
+        Devolve a chave da mensagem, ou None se ela não pode ser cacheada.
+        """
+        normalized = " ".join(_PUNCTUATION.sub(" ", normalize_text(message)).split())
+        if not normalized or _TIME_RELATIVE.search(normalized):
+            return None
+        # current_date vem como "YYYY-MM-DD HH:MM:SS TZ": o balde é o dia
+        return f"{self.prefix}:{current_date[:10]}:{normalized}"
+
+    def get(self, message: str, current_date: str):
+        key = self.key(message, current_date)
+        if key is None:
+            self.skipped += 1
+            return None
+        raw = self._local.get(key)
+        if raw is None and self.redis is not None:
+            raw = self.redis.get(key)
+            if raw is not None:
+                self._local.set(key, raw)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Uma cópia nova a cada acerto: os handlers alteram o dicionário
+        return json.loads(raw)
+
+    def set(self, message: str, current_date: str, response: dict):
+        key = self.key(message, current_date)
+        if key is None or not isinstance(response, dict) or "action" not in response:
+            return
+        raw = json.dumps(response)
+        self._local.set(key, raw)
+        if self.redis is not None:
+            self.redis.set(key, raw, ex=int(self.ttl))
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis" if self.redis is not None else "memory",
+            "size": len(self._local),
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def create_response_cache(config: dict):
+    """
+    Monta o cache configurado por LLM_CACHE_ENABLED / LLM_CACHE_BACKEND.
+    """
+    if config.get("LLM_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    redis_client = None
+    if config.get("LLM_CACHE_BACKEND", "memory") == "redis":
+        import redis
+
+        redis_client = redis.Redis.from_url(
+            config.get("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True
+        )
+    return ResponseCache(
+        ttl=float(config.get("LLM_CACHE_TTL", 3600)),
+        max_size=int(config.get("LLM_CACHE_MAX_SIZE", 1024)),
+        redis_client=redis_client,
+    )
@@ -0,0 +1,254 @@
+import asyncio
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from python_integration.src.utils.text import normalize_text
+
+# Mensagens com recorrência ou várias datas vão direto para o modelo mais forte
+# (aplicado ao texto sem acentos, em minúsculas)
+_COMPLEX_HINTS = re.compile(
+    r"\b(?:tod[oa]s?|cada|semanas|recorr|repet|ate o fim|de segunda a|diariamente)"
+)
+
+
+class ModelTier:
+    """
+    Um modelo da cadeia de roteamento, com suas métricas de latência.
+    `chain` recebe o prompt já formatado e devolve o JSON parseado.
+    """
+
+    def __init__(self, name: str, chain, window: int = 200):
+        self.name = name
+        self.chain = chain
+        self.calls = 0
+        self.failures = 0
+        self.invalid = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.total_seconds = 0.0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, failed: bool = False):
+        with self._lock:
+            self.calls += 1
+            self.total_seconds += seconds
+            if failed:
+                self.failures += 1
+            else:
+                self._latencies.append(seconds)
+
+    def percentile(self, p: float, min_samples: int = 20):
+        with self._lock:
+            if len(self._latencies) < min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def metrics(self) -> dict:
+        p50 = self.percentile(0.5, min_samples=1)
+        p90 = self.percentile(0.9, min_samples=1)
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "invalid": self.invalid,
+            "avg_ms": (
+                round(self.total_seconds / self.calls * 1000, 2) if self.calls else 0.0
+            ),
+            "p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+            "p90_ms": round(p90 * 1000, 2) if p90 is not None else None,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+class ModelRouter:
+    """
+    Roteia cada mensagem entre modelos em camadas (do mais barato ao mais forte).
+
+    - Mensagens curtas e simples começam no primeiro modelo; as demais, no
+      segundo (quando existir).
+    - Se a saída não for um JSON válido ou falhar em `validator`, a mensagem
+      sobe para o próximo modelo.
+    - Com `hedge_percentile` (ex: 0.9), se a chamada passar da latência
+      desse percentil do modelo, uma segunda requisição idêntica é disparada
+      e vence a que responder primeiro.
+    """
+
+    def __init__(
+        self,
+        tiers,
+        validator=None,
+        simple_max_chars: int = 120,
+        hedge_percentile: float = None,
+    ):
+        self.tiers = list(tiers)
+        self.validator = validator
+        self.simple_max_chars = simple_max_chars
+        self.hedge_percentile = hedge_percentile
+        self.requests = 0
+        self.escalations = 0
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="llm-hedge")
+
+    def route(self, question: str) -> int:
+        """
+        Índice do modelo em que a mensagem começa.
+        """
+        if len(self.tiers) == 1:
+            return 0
+        if len(question) <= self.simple_max_chars and not _COMPLEX_HINTS.search(
+            normalize_text(question)
+        ):
+            return 0
+        return 1
+
+    def _hedge_delay(self, tier: ModelTier):
+        if not self.hedge_percentile:
+            return None
+        return tier.percentile(self.hedge_percentile)
+
+    def _validate(self, tier: ModelTier, response):
+        if self.validator is not None:
+            try:
+                self.validator(response)
+            except Exception:
+                tier.invalid += 1
+                raise
+        return response
+
+    def invoke(self, question: str, prompt_value) -> dict:
+        self.requests += 1
+        start = self.route(question)
+        error = None
+        for index in range(start, len(self.tiers)):
+            if index > start:
+                self.escalations += 1
+            try:
+                tier = self.tiers[index]
+                return self._validate(tier, self._call(tier, prompt_value))
+            except Exception as e:
+                print(f"Modelo '{self.tiers[index].name}' falhou: {e}")
+                error = e
+        raise error
+
+    async def ainvoke(self, question: str, prompt_value) -> dict:
+        self.requests += 1
+        return await self._aescalate(self.route(question), prompt_value)
+
+    async def _aescalate(
+        self, start: int, prompt_value, error=None, escalated=False
+    ) -> dict:
+        for index in range(start, len(self.tiers)):
+            if index > start or escalated:
+                self.escalations += 1
+            try:
+                tier = self.tiers[index]
+                return self._validate(tier, await self._acall(tier, prompt_value))
+            except Exception as e:
+                print(f"Modelo '{self.tiers[index].name}' falhou: {e}")
+                error = e
+        raise error
+
+    async def astream(self, question: str, prompt_value, on_partial) -> dict:
+        """
+        Como `ainvoke`, mas transmite a saída do primeiro modelo: `on_partial`
+        recebe cada versão parcial do JSON à medida que ele é gerado. Se a
+        resposta final for inválida, a mensagem sobe de modelo normalmente
+        (sem streaming). Requisições em streaming não são duplicadas (hedge).
+        """
+        self.requests += 1
+        start = self.route(question)
+        tier = self.tiers[start]
+        started = time.perf_counter()
+        response = None
+        failed = True
+        try:
+            async for partial in tier.chain.astream(prompt_value):
+                response = partial
+                on_partial(partial)
+            failed = False
+        except Exception as e:
+            print(f"Modelo '{tier.name}' falhou: {e}")
+            error = e
+        finally:
+            tier.observe(time.perf_counter() - started, failed)
+
+        if not failed:
+            try:
+                return self._validate(tier, response)
+            except Exception as e:
+                print(f"Modelo '{tier.name}' falhou: {e}")
+                error = e
+        return await self._aescalate(start + 1, prompt_value, error, escalated=True)
+
+    def _call(self, tier: ModelTier, prompt_value):
+        started = time.perf_counter()
+        failed = True
+        futures = [self._pool.submit(tier.chain.invoke, prompt_value)]
+        try:
+            delay = self._hedge_delay(tier)
+            if delay is not None and not wait(futures, timeout=delay).done:
+                tier.hedges += 1
+                futures.append(self._pool.submit(tier.chain.invoke, prompt_value))
+            pending = list(futures)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    if future.exception() is None:
+                        if future is not futures[0]:
+                            tier.hedge_wins += 1
+                        failed = False
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            for future in futures:
+                future.cancel()
+            tier.observe(time.perf_counter() - started, failed)
+
+    async def _acall(self, tier: ModelTier, prompt_value):
+        started = time.perf_counter()
+        failed = True
+        first = asyncio.ensure_future(tier.chain.ainvoke(prompt_value))
+        tasks = [first]
+        try:
+            delay = self._hedge_delay(tier)
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    tier.hedges += 1
+                    tasks.append(
+                        asyncio.ensure_future(tier.chain.ainvoke(prompt_value))
+                    )
+            pending = list(tasks)
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    pending.remove(task)
+                    if task.exception() is None:
+                        if task is not first:
+                            tier.hedge_wins += 1
+                        failed = False
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            tier.observe(time.perf_counter() - started, failed)
+
+    def metrics(self) -> dict:
+        return {
+            "requests": self.requests,
+            "escalations": self.escalations,
+            "escalation_rate": (
+                round(self.escalations / self.requests, 4) if self.requests else 0.0
+            ),
+            "tiers": {tier.name: tier.metrics() for tier in self.tiers},
+        }
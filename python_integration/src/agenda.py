@@ -0,0 +1,130 @@
+import datetime
+import threading
+
+from utils.text import normalize_text
+from utils.ttl_cache import TTLCache
+
+# Messages (without accents) that ask for the next page of a listing
+FOLLOW_UP_MESSAGES = {
+    "mais",
+    "ver mais",
+    "mostrar mais",
+    "mostre mais",
+    "manda mais",
+    "proxima",
+    "proxima pagina",
+    "continua",
+    "continuar",
+    "next",
+    "next page",
+}
+
+MORE_HINT = "\n\nEnvie *mais* para ver os próximos eventos."
+
+
+def format_event_line(event: dict) -> str:
+    start_data = event.get("start", {})
+    start_time = start_data.get("dateTime")
+    start_date_only = start_data.get("date")
+
+    if start_time:
+        start_time_obj = datetime.datetime.fromisoformat(start_time)
+        start_time_str = start_time_obj.strftime("%d/%m/%Y %H:%M")
+    elif start_date_only:
+        start_date_obj = datetime.datetime.strptime(start_date_only, "%Y-%m-%d")
+        start_time_str = f"Dia inteiro em {start_date_obj.strftime('%d/%m/%Y')}"
+    else:
+        start_time_str = "Data/Hora não informada"
+
+    return f"- **{event.get('summary', 'Evento sem título')}** ({start_time_str})"
+
+
+class AgendaPager:
+    """
+    Splits event listings into messages of at most `max_chars` characters.
+
+    `start(chat_id, events, ...)` formats events only until the first
+    message is full. If more remain, the event iterator itself (e.g. the
+    lazy `iter_events` pages) is kept as the chat's cursor for `ttl`
+    seconds, and a "mais" from that chat resumes it with `next_page`,
+    without listing or formatting the window again.
+    """
+
+    def __init__(self, max_chars: int = 3000, ttl: float = 600, max_chats: int = 1000):
+        self.max_chars = max_chars
+        self._cursors = TTLCache(max_size=max_chats, ttl=ttl)
+        self._lock = threading.Lock()
+        self.listings = 0
+        self.pages = 0
+        self.follow_ups = 0
+
+    def _fill(self, events, pending, budget):
+        """
+        Formats events until `budget` characters; returns the lines and the
+        first event that did not fit (None when the iterator is exhausted).
+        """
+        lines = []
+        used = 0
+        event = pending if pending is not None else next(events, None)
+        while event is not None:
+            line = format_event_line(event)
+            if lines and used + len(line) + 1 > budget:
+                return lines, event
+            lines.append(line[:budget])
+            used += len(line) + 1
+            event = next(events, None)
+        return lines, None
+
+    def _page(self, chat_id, events, pending, header):
+        budget = max(1, self.max_chars - len(header) - len(MORE_HINT))
+        lines, pending = self._fill(events, pending, budget)
+        with self._lock:
+            self.pages += 1
+        text = header + "\n".join(lines)
+        if pending is None or chat_id is None:
+            self._cursors.pop(chat_id)
+            return text
+        self._cursors.set(chat_id, (events, pending))
+        return text + MORE_HINT
+
+    def start(self, chat_id, events, header: str, empty_text: str) -> str:
+        """
+        First message of a listing; replaces any cursor the chat had.
+        """
+        events = iter(events)
+        first = next(events, None)
+        with self._lock:
+            self.listings += 1
+        if first is None:
+            self._cursors.pop(chat_id)
+            return empty_text
+        return self._page(chat_id, events, first, header)
+
+    def is_follow_up(self, chat_id, message_text: str) -> bool:
+        """
+        True if the message asks for more and the chat has a listing to resume.
+        """
+        if normalize_text(message_text).strip(" .!?") not in FOLLOW_UP_MESSAGES:
+            return False
+        return self._cursors.get(chat_id) is not None
+
+    def next_page(self, chat_id) -> str:
+        cursor = self._cursors.pop(chat_id)
+        if cursor is None:
+            return "Não há mais eventos para mostrar."
+        events, pending = cursor
+        with self._lock:
+            self.follow_ups += 1
+        try:
+            return self._page(chat_id, events, pending, "")
+        except Exception as e:
+            return f"Ocorreu um erro ao listar os eventos: {e}"
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "listings": self.listings,
+                "pages": self.pages,
+                "follow_ups": self.follow_ups,
+                "open_cursors": len(self._cursors),
+            }
@@ -1,30 +1,218 @@
-import requests
-from utils.config import load_config
+import asyncio
+import random
+import threading
+import time
 
+import httpx
+from utils.config import load_config
 
 config = load_config()
 
+# Status codes worth another attempt: throttling and server-side failures
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
 
 class EvolutionAPI:
+    """
+    Evolution API client on a pooled `httpx.AsyncClient`.
+
+    Every request goes through one client with keep-alive connections, so
+    consecutive replies reuse the same TCP/TLS connection instead of opening
+    a new one. The client lives on a private event loop thread: the async
+    `asend_message` can be awaited from any loop and the sync `send_message`
+    facade keeps working for the existing callers, both sharing the pool.
+
+    429 and 5xx responses, and connections that could not be opened, are
+    retried with jittered exponential backoff (honouring Retry-After). A
+    read timeout is not retried: the message may already have been sent.
+    An error status left after the retries is raised as
+    `httpx.HTTPStatusError`, so callers never mistake it for a delivery.
+    """
 
     BASE_URL = config["BASE_URL"]
     INSTANCE_NAME = config["INSTANCE_NAME"]
 
-    def __init__(self):
+    def __init__(
+        self,
+        timeout: float = float(config.get("EVOLUTION_TIMEOUT", 10)),
+        connect_timeout: float = float(config.get("EVOLUTION_CONNECT_TIMEOUT", 5)),
+        max_connections: int = int(config.get("EVOLUTION_MAX_CONNECTIONS", 20)),
+        max_attempts: int = int(config.get("EVOLUTION_MAX_ATTEMPTS", 3)),
+        backoff: float = float(config.get("EVOLUTION_BACKOFF", 0.5)),
+        max_backoff: float = 8.0,
+        transport=None,
+    ):
         self.__api_key = config["AUTHENTICATION_API_KEY"]
         self.__headers = {
             "apikey": self.__api_key,
             "Content-Type": "application/json",
         }
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections
+        )
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._transport = transport
+        self._client = None
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.responses = 0
+        self.connections_opened = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
 
-    def send_message(self, number, text):
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="evolution-http", daemon=True
+                )
+                self._thread.start()
+        return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Only called on the private loop, so the pool is bound to it
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.BASE_URL,
+                headers=self.__headers,
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self._transport,
+            )
+        return self._client
+
+    def _delay(self, attempt: int, response=None) -> float:
+        retry_after = (
+            response.headers.get("Retry-After") if response is not None else None
+        )
+        if retry_after:
+            try:
+                return min(self.max_backoff, float(retry_after))
+            except ValueError:
+                pass
+        # Full jitter: spreads retries of concurrent replies apart
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    async def _trace(self, event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            with self._stats_lock:
+                self.connections_opened += 1
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        client = self._get_client()
+        started = time.perf_counter()
+        failed = True
+        try:
+            for attempt in range(self.max_attempts):
+                last = attempt == self.max_attempts - 1
+                with self._stats_lock:
+                    self.attempts += 1
+                try:
+                    response = await client.post(
+                        path, json=payload, extensions={"trace": self._trace}
+                    )
+                except (
+                    httpx.ConnectError,
+                    httpx.ConnectTimeout,
+                    httpx.PoolTimeout,
+                ) as e:
+                    # Nothing reached the server, so retrying cannot duplicate the message
+                    if last:
+                        raise
+                    print(
+                        f"Falha de conexão com a Evolution API ({e!r}); tentando de novo."
+                    )
+                    delay = self._delay(attempt)
+                else:
+                    with self._stats_lock:
+                        self.responses += 1
+                    if response.status_code not in RETRYABLE_STATUSES or last:
+                        failed = response.is_error
+                        response.raise_for_status()
+                        try:
+                            return response.json()
+                        except ValueError:
+                            return {
+                                "status": response.status_code,
+                                "text": response.text,
+                            }
+                    print(
+                        f"Evolution API respondeu {response.status_code}; tentando de novo."
+                    )
+                    delay = self._delay(attempt, response)
+                with self._stats_lock:
+                    self.retries += 1
+                await asyncio.sleep(delay)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                self.requests += 1
+                self.failures += failed
+                self.total_seconds += elapsed
+                self.max_seconds = max(self.max_seconds, elapsed)
+
+    def _submit(self, path: str, payload: dict):
+        return asyncio.run_coroutine_threadsafe(
+            self._post(path, payload), self._ensure_loop()
+        )
+
+    async def asend_message(self, number, text):
         payload = {
             "number": number,
             "text": text,
         }
-        response = requests.post(
-            url=f"{self.BASE_URL}/message/sendText/{self.INSTANCE_NAME}",
-            headers=self.__headers,
-            json=payload,
+        return await asyncio.wrap_future(
+            self._submit(f"/message/sendText/{self.INSTANCE_NAME}", payload)
         )
-        return response.json()
+
+    def send_message(self, number, text):
+        """
+        Blocking facade over `asend_message`; do not call it from inside a
+        running event loop (await `asend_message` there instead).
+        """
+        payload = {
+            "number": number,
+            "text": text,
+        }
+        return self._submit(f"/message/sendText/{self.INSTANCE_NAME}", payload).result()
+
+    def close(self):
+        """
+        Closes the pooled connections and stops the private loop.
+        """
+        with self._start_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result(
+                timeout=5
+            )
+            self._client = None
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=5)
+
+    def metrics(self) -> dict:
+        with self._stats_lock:
+            requests = self.requests or 1
+            return {
+                "requests": self.requests,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "failures": self.failures,
+                "connections_opened": self.connections_opened,
+                # Responses served on an already open keep-alive connection
+                "connections_reused": max(0, self.responses - self.connections_opened),
+                "avg_ms": round(self.total_seconds / requests * 1000, 2),
+                "max_ms": round(self.max_seconds * 1000, 2),
+            }
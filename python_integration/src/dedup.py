@@ -0,0 +1,74 @@
+from utils.ttl_cache import TTLCache
+
+
+class MessageDeduplicator:
+    """
+    Idempotency layer for webhooks, keyed on the WhatsApp message id
+    (`data.key.id`).
+
+    Evolution redelivers a webhook when it times out; the first delivery is
+    processed and any redelivery within `ttl` seconds is dropped before it
+    reaches the LLM. The in-memory LRU answers most checks; when a Redis
+    client is given, ids are also claimed there (SET NX) so every webhook
+    replica sees the same ids.
+    """
+
+    def __init__(self, ttl: float = 3600, max_size: int = 10000, redis_client=None):
+        self.ttl = ttl
+        self.redis = redis_client
+        self._local = TTLCache(max_size=max_size, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def is_duplicate(self, message_id: str) -> bool:
+        """
+        Marks `message_id` as seen and returns True if it already was.
+        """
+        if not message_id:
+            return False
+        duplicate = not self._local.add(message_id)
+        if not duplicate and self.redis is not None:
+            claimed = self.redis.set(
+                f"wpp:dedup:{message_id}", 1, nx=True, ex=int(self.ttl)
+            )
+            duplicate = not claimed
+        if duplicate:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return duplicate
+
+    def forget(self, message_id: str):
+        """
+        Releases an id so a redelivery is processed, e.g. after the job could
+        not be enqueued.
+        """
+        self._local.pop(message_id)
+        if self.redis is not None:
+            self.redis.delete(f"wpp:dedup:{message_id}")
+
+    def metrics(self) -> dict:
+        return {
+            "backend": "redis" if self.redis is not None else "memory",
+            "size": len(self._local),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def create_deduplicator(config: dict) -> MessageDeduplicator:
+    """
+    Builds the deduplicator selected by DEDUP_BACKEND ("memory" or "redis").
+    """
+    redis_client = None
+    if config.get("DEDUP_BACKEND", "memory") == "redis":
+        import redis
+
+        redis_client = redis.Redis.from_url(
+            config.get("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True
+        )
+    return MessageDeduplicator(
+        ttl=float(config.get("DEDUP_TTL", 3600)),
+        max_size=int(config.get("DEDUP_MAX_SIZE", 10000)),
+        redis_client=redis_client,
+    )
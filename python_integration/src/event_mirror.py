@@ -0,0 +1,437 @@
+import datetime
+import json
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+import pytz
+from googleapiclient.errors import HttpError
+from title_index import TitleIndex
+
+SAO_PAULO = pytz.timezone("America/Sao_Paulo")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    summary TEXT,
+    start_ts REAL,
+    end_ts REAL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (calendar_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS events_by_start ON events (calendar_id, start_ts);
+CREATE TABLE IF NOT EXISTS sync_state (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token TEXT,
+    synced_at REAL,
+    window_start REAL,
+    window_end REAL
+);
+"""
+DAY = 86400
+
+
+def _timestamp(value, default=None):
+    """
+    Epoch seconds for a Calendar API date ({"dateTime"} or all-day {"date"}).
+    """
+    if not value:
+        return default
+    if value.get("dateTime"):
+        return datetime.datetime.fromisoformat(
+            value["dateTime"].replace("Z", "+00:00")
+        ).timestamp()
+    if value.get("date"):
+        day = datetime.datetime.strptime(value["date"], "%Y-%m-%d")
+        return SAO_PAULO.localize(day).timestamp()
+    return default
+
+
+def _parse_bound(value):
+    if not value:
+        return None
+    if "T" not in value:
+        value += "T00:00:00+00:00"
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _rfc3339(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat()
+
+
+class EventMirror:
+    """
+    Local SQLite copy of the events of each calendar, kept up to date with
+    `events.list` sync tokens.
+
+    The first read of a calendar downloads its events from `past_days` ago
+    to `future_days` ahead (recurring series are expanded, so the window is
+    bounded); every later read first pulls the changes since the previous
+    sync (new, edited and cancelled events, one small `events.list` call),
+    so the handlers never act on events changed elsewhere in the meantime.
+    Reads that waited for a sync started after they were made reuse it
+    instead of pulling again. A 410 Gone
+    on the sync token, or half of the future window having elapsed, drops
+    the calendar's rows and resyncs. Reads outside the mirrored window, and
+    reads while the API is failing, are answered by the API.
+
+    `get_all_events` has the same signature as `GoogleCalendar.get_all_events`
+    and can be used in its place. Titles are kept in a `TitleIndex`, so
+    `summary=` lookups do not scan every event. Title searches sent to the
+    API as `q` (`search_events`, `iter_events(q=...)`) keep using the
+    client's field-projected search.
+
+    The HTTP calls of a sync only hold that calendar's lock; the database
+    lock is taken just to read or apply the results.
+    """
+
+    def __init__(
+        self,
+        calendar_client,
+        path: str = ":memory:",
+        past_days: float = 30,
+        future_days: float = 400,
+    ):
+        self.calendar_client = calendar_client
+        self.past_days = past_days
+        self.future_days = future_days
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(sync_state)")}
+        for column in ("window_start", "window_end"):
+            # Mirrors created before the window was stored; they resync fully
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE sync_state ADD COLUMN {column} REAL")
+        self._lock = threading.Lock()
+        self._calendar_locks = defaultdict(threading.Lock)
+        self.titles = TitleIndex()
+        for calendar_id, event_id, summary in self._db.execute(
+            "SELECT calendar_id, event_id, summary FROM events"
+        ):
+            self.titles.add(calendar_id, event_id, summary)
+        self.full_syncs = 0
+        self.incremental_syncs = 0
+        self.changes = 0
+        self.fallbacks = 0
+        # Calendars whose last sync succeeded, i.e. whose titles are current
+        self._synced = set()
+        self.last_sync_ms = None
+
+    def _list_pages(self, calendar_id, **kwargs):
+        page_token = None
+        while True:
+            page = self.calendar_client.execute(
+                self.calendar_client.service.events().list(
+                    calendarId=calendar_id,
+                    singleEvents=True,
+                    pageToken=page_token,
+                    **kwargs,
+                )
+            )
+            yield page
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                break
+
+    def _apply(self, calendar_id, event):
+        if event.get("status") == "cancelled":
+            self._db.execute(
+                "DELETE FROM events WHERE calendar_id = ? AND event_id = ?",
+                (calendar_id, event["id"]),
+            )
+            self.titles.remove(calendar_id, event["id"])
+            return
+        start_ts = _timestamp(event.get("start"))
+        self._db.execute(
+            "INSERT OR REPLACE INTO events (calendar_id, event_id, summary, start_ts, end_ts, body) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                calendar_id,
+                event["id"],
+                event.get("summary"),
+                start_ts,
+                _timestamp(event.get("end"), start_ts),
+                json.dumps(event),
+            ),
+        )
+        self.titles.add(calendar_id, event["id"], event.get("summary"))
+
+    def _fetch(self, calendar_id, **kwargs):
+        """
+        Every page of a (full or incremental) listing: (events, next sync token).
+        """
+        events = []
+        next_token = kwargs.get("syncToken")
+        for page in self._list_pages(calendar_id, **kwargs):
+            events.extend(page.get("items", []))
+            next_token = page.get("nextSyncToken", next_token)
+        return events, next_token
+
+    def _store(self, calendar_id, events, token, started, window=None):
+        """
+        Applies a listing in one transaction; `window` marks a full sync,
+        which replaces the calendar's rows. `started` is when the listing began.
+        """
+        with self._lock:
+            try:
+                if window is not None:
+                    self._db.execute(
+                        "DELETE FROM events WHERE calendar_id = ?", (calendar_id,)
+                    )
+                    self.titles.clear(calendar_id)
+                for event in events:
+                    self._apply(calendar_id, event)
+                self.changes += len(events)
+                if window is not None:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO sync_state "
+                        "(calendar_id, sync_token, synced_at, window_start, window_end) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (calendar_id, token, started, *window),
+                    )
+                else:
+                    self._db.execute(
+                        "UPDATE sync_state SET sync_token = ?, synced_at = ? "
+                        "WHERE calendar_id = ?",
+                        (token, started, calendar_id),
+                    )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                # The index may hold rows that were rolled back
+                self._reindex(calendar_id)
+                raise
+
+    def _calendar_lock(self, calendar_id):
+        with self._lock:
+            return self._calendar_locks[calendar_id]
+
+    def sync(self, calendar_id):
+        """
+        Brings the calendar's rows up to date with the API.
+        """
+        requested = time.time()
+        with self._calendar_lock(calendar_id):
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT sync_token, synced_at, window_end FROM sync_state "
+                    "WHERE calendar_id = ?",
+                    (calendar_id,),
+                ).fetchone()
+            # Another thread synced while this one waited for the lock
+            if row and row[1] is not None and row[1] >= requested:
+                return
+            now = time.time()
+            started = time.perf_counter()
+            try:
+                full = (
+                    not row
+                    or not row[0]
+                    or row[2] is None
+                    or row[2] - now < self.future_days * DAY / 2
+                )
+                if not full:
+                    try:
+                        events, token = self._fetch(calendar_id, syncToken=row[0])
+                    except HttpError as e:
+                        if e.resp.status != 410:
+                            raise
+                        print(
+                            f"Sync token expirado para {calendar_id}; sincronizando tudo de novo."
+                        )
+                        full = True
+                if full:
+                    window = (now - self.past_days * DAY, now + self.future_days * DAY)
+                    events, token = self._fetch(
+                        calendar_id,
+                        timeMin=_rfc3339(window[0]),
+                        timeMax=_rfc3339(window[1]),
+                    )
+                    self._store(calendar_id, events, token, now, window)
+                    self.full_syncs += 1
+                else:
+                    self._store(calendar_id, events, token, now)
+                    self.incremental_syncs += 1
+            except Exception:
+                with self._lock:
+                    self._synced.discard(calendar_id)
+                raise
+            else:
+                with self._lock:
+                    self._synced.add(calendar_id)
+            finally:
+                self.last_sync_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def _reindex(self, calendar_id):
+        self.titles.clear(calendar_id)
+        for event_id, summary in self._db.execute(
+            "SELECT event_id, summary FROM events WHERE calendar_id = ?", (calendar_id,)
+        ):
+            self.titles.add(calendar_id, event_id, summary)
+
+    def invalidate(self, calendar_id):
+        """
+        Forgets the calendar: the next read does a full sync.
+        """
+        with self._calendar_lock(calendar_id), self._lock:
+            self._db.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+            self._db.execute(
+                "DELETE FROM sync_state WHERE calendar_id = ?", (calendar_id,)
+            )
+            self._db.commit()
+            self.titles.clear(calendar_id)
+            self._synced.discard(calendar_id)
+
+    def match_titles(self, calendar_id, query):
+        """
+        IDs of the mirrored events whose title contains `query`, or None if
+        the calendar's last sync failed (its reads came from the API and
+        the index may be out of date).
+        """
+        with self._lock:
+            if calendar_id not in self._synced:
+                return None
+        return self.titles.match(calendar_id, query)
+
+    def suggest_titles(self, calendar_id, query, limit: int = 3) -> list:
+        """
+        Closest titles for a query with no exact match, best first.
+        """
+        titles = []
+        for event_id, _, _ in self.titles.suggest(calendar_id, query, limit=limit * 4):
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT summary FROM events WHERE calendar_id = ? AND event_id = ?",
+                    (calendar_id, event_id),
+                ).fetchone()
+            # Instances of a recurring event share the title
+            if row and row[0] not in titles:
+                titles.append(row[0])
+        return titles[:limit]
+
+    def get_all_events(self, calendar_id, start_date=None, end_date=None, summary=None):
+        """
+        Same contract as `GoogleCalendar.get_all_events` (now to 30 days ahead
+        by default, sorted by start), answered from the mirror when it covers
+        the window.
+        """
+        events = self._read(calendar_id, start_date, end_date, summary)
+        if events is None:
+            return self.calendar_client.get_all_events(
+                calendar_id, start_date, end_date, summary
+            )
+        return events
+
+    def _read(self, calendar_id, start_date=None, end_date=None, summary=None):
+        """
+        The mirrored events of the window, or None if the sync fails or the
+        window is not (entirely) mirrored.
+        """
+        try:
+            self.sync(calendar_id)
+        except Exception as e:
+            print(f"Falha ao sincronizar o espelho de eventos: {e}")
+            self.fallbacks += 1
+            return None
+        events = self._query(calendar_id, start_date, end_date, summary)
+        if events is None:
+            self.fallbacks += 1
+        return events
+
+    def _query(self, calendar_id, start_date=None, end_date=None, summary=None):
+        now = datetime.datetime.now(SAO_PAULO)
+        start_ts = _parse_bound(start_date) or now.timestamp()
+        end_ts = (
+            _parse_bound(end_date) or (now + datetime.timedelta(days=30)).timestamp()
+        )
+        with self._lock:
+            window = self._db.execute(
+                "SELECT window_start, window_end FROM sync_state WHERE calendar_id = ?",
+                (calendar_id,),
+            ).fetchone()
+        if (
+            not window
+            or window[0] is None
+            or start_ts < window[0]
+            or end_ts > window[1]
+        ):
+            return None
+        matching = self.titles.match(calendar_id, summary) if summary else None
+        if matching is not None and not matching:
+            return []
+        with self._lock:
+            # Same overlap rule as timeMin/timeMax: ends after the start, starts before the end
+            rows = self._db.execute(
+                "SELECT event_id, body FROM events "
+                "WHERE calendar_id = ? AND end_ts > ? AND start_ts < ? ORDER BY start_ts",
+                (calendar_id, start_ts, end_ts),
+            ).fetchall()
+        return [
+            json.loads(body)
+            for event_id, body in rows
+            if matching is None or event_id in matching
+        ]
+
+    def iter_events(
+        self,
+        calendar_id,
+        start_date=None,
+        end_date=None,
+        q=None,
+        fields=None,
+        page_size=250,
+        max_results=None,
+    ):
+        """
+        Same contract as `GoogleCalendar.iter_events`; `fields` and
+        `page_size` do not apply to local rows. Searches (`q`) and windows
+        the mirror cannot answer go to the API.
+        """
+        events = None
+        if not q:
+            events = self._read(calendar_id, start_date, end_date)
+        if events is None:
+            return self.calendar_client.iter_events(
+                calendar_id, start_date, end_date, q, fields, page_size, max_results
+            )
+        return iter(events[:max_results] if max_results is not None else events)
+
+    def search_events(self, calendar_id, query, start_date=None, end_date=None):
+        """
+        Same contract as `GoogleCalendar.search_events`, which it calls: the
+        API narrows the search with `q`, the window and SEARCH_FIELDS.
+        """
+        return self.calendar_client.search_events(
+            calendar_id, query, start_date, end_date
+        )
+
+    def metrics(self) -> dict:
+        with self._lock:
+            events, calendars = self._db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT calendar_id) FROM events"
+            ).fetchone()
+        return {
+            "calendars": calendars,
+            "events": events,
+            "full_syncs": self.full_syncs,
+            "incremental_syncs": self.incremental_syncs,
+            "changes": self.changes,
+            "fallbacks": self.fallbacks,
+            "last_sync_ms": self.last_sync_ms,
+        }
+
+
+def create_event_mirror(config: dict, calendar_client):
+    """
+    Builds the mirror configured by the EVENT_MIRROR_* settings.
+    """
+    if config.get("EVENT_MIRROR_ENABLED", "true").lower() != "true":
+        return None
+    return EventMirror(
+        calendar_client,
+        path=config.get("EVENT_MIRROR_PATH", ":memory:"),
+        past_days=float(config.get("EVENT_MIRROR_PAST_DAYS", 30)),
+        future_days=float(config.get("EVENT_MIRROR_FUTURE_DAYS", 400)),
+    )
@@ -0,0 +1,302 @@
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+
+
+def compute_backoff(attempts: int, base: float, cap: float) -> float:
+    """
+    Exponential backoff with full jitter for the given attempt number (1-based).
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempts - 1)))
+
+
+class InMemoryJobQueue:
+    """
+    In-process stand-in for RedisJobQueue with the same semantics
+    (at-least-once delivery, visibility timeout, retry with backoff).
+    Useful for tests and for running a worker without Redis.
+    """
+
+    def __init__(
+        self,
+        visibility_timeout: float = 300,
+        max_attempts: int = 5,
+        backoff_base: float = 2,
+        backoff_cap: float = 300,
+    ):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._attempts = {}
+        self._ready = deque()
+        self._inflight = {}
+        self._delayed = {}
+        self._dead = []
+
+    def enqueue(self, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        with self._cond:
+            self._jobs[job_id] = payload
+            self._attempts[job_id] = 0
+            self._ready.appendleft(job_id)
+            self._cond.notify()
+        return job_id
+
+    def _promote(self, now: float):
+        for job_id, ready_at in list(self._delayed.items()):
+            if ready_at <= now:
+                del self._delayed[job_id]
+                self._ready.appendleft(job_id)
+        for job_id, deadline in list(self._inflight.items()):
+            if deadline <= now:
+                del self._inflight[job_id]
+                self._ready.append(job_id)
+
+    def reserve(self, timeout: float = 1.0):
+        """
+        Returns (job_id, payload) or None if nothing became available in time.
+        The job stays invisible to other consumers until acked or expired.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.time()
+                self._promote(now)
+                while self._ready:
+                    job_id = self._ready.pop()
+                    if job_id not in self._jobs:
+                        # Acked by a previous holder after its lease expired
+                        continue
+                    self._attempts[job_id] += 1
+                    if self._attempts[job_id] > self.max_attempts:
+                        self._bury(job_id)
+                        continue
+                    self._inflight[job_id] = now + self.visibility_timeout
+                    return job_id, self._jobs[job_id]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(min(remaining, 0.5))
+
+    def ack(self, job_id: str):
+        with self._cond:
+            self._inflight.pop(job_id, None)
+            self._jobs.pop(job_id, None)
+            self._attempts.pop(job_id, None)
+
+    def nack(self, job_id: str):
+        """
+        Schedules a failed job for retry, or moves it to the dead letter list.
+        """
+        with self._cond:
+            self._inflight.pop(job_id, None)
+            attempts = self._attempts.get(job_id, 0)
+            if job_id not in self._jobs:
+                return
+            if attempts >= self.max_attempts:
+                self._bury(job_id)
+                return
+            delay = compute_backoff(attempts, self.backoff_base, self.backoff_cap)
+            self._delayed[job_id] = time.time() + delay
+            self._cond.notify()
+
+    def touch(self, job_id: str):
+        """
+        Extends the visibility timeout of an in-flight job.
+        """
+        with self._cond:
+            if job_id in self._inflight:
+                self._inflight[job_id] = time.time() + self.visibility_timeout
+
+    def _bury(self, job_id: str):
+        self._dead.append({"id": job_id, "payload": self._jobs.pop(job_id, None)})
+        self._attempts.pop(job_id, None)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            return {
+                "backend": "memory",
+                "ready": len(self._ready),
+                "inflight": len(self._inflight),
+                "delayed": len(self._delayed),
+                "dead": len(self._dead),
+            }
+
+
+# Moves due delayed jobs and expired leases back to the ready list, then pops
+# one job and leases it. Runs atomically so concurrent workers never share a job.
+_RESERVE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local due = redis.call('ZRANGEBYSCORE', KEYS[4], '-inf', now, 'LIMIT', 0, 100)
+for _, id in ipairs(due) do
+    redis.call('ZREM', KEYS[4], id)
+    redis.call('LPUSH', KEYS[1], id)
+end
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now, 'LIMIT', 0, 100)
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('RPUSH', KEYS[1], id)
+end
+local id = redis.call('RPOP', KEYS[1])
+if not id then
+    return nil
+end
+redis.call('ZADD', KEYS[2], now + tonumber(ARGV[2]), id)
+local attempts = redis.call('HINCRBY', KEYS[5], id, 1)
+return {id, redis.call('HGET', KEYS[3], id), attempts}
+"""
+
+
+class RedisJobQueue:
+    """
+    Durable job queue on Redis shared by the webhook receiver and any number
+    of worker replicas.
+
+    Keys (under `prefix`):
+    - ready: list of job ids waiting to run
+    - inflight: zset of leased job ids scored by lease deadline
+    - delayed: zset of job ids waiting for their retry backoff
+    - jobs / attempts: hashes with payloads and delivery counts
+    - dead: list of jobs that exhausted `max_attempts`
+    """
+
+    def __init__(
+        self,
+        client,
+        prefix: str = "wpp:jobs",
+        visibility_timeout: float = 300,
+        max_attempts: int = 5,
+        backoff_base: float = 2,
+        backoff_cap: float = 300,
+        poll_interval: float = 0.2,
+    ):
+        self.client = client
+        self.prefix = prefix
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.poll_interval = poll_interval
+        self._reserve = client.register_script(_RESERVE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs):
+        import redis
+
+        return cls(redis.Redis.from_url(url, decode_responses=True), **kwargs)
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}:{name}"
+
+    def enqueue(self, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        pipe = self.client.pipeline()
+        pipe.hset(self._key("jobs"), job_id, json.dumps(payload))
+        pipe.lpush(self._key("ready"), job_id)
+        pipe.execute()
+        return job_id
+
+    def reserve(self, timeout: float = 1.0):
+        """
+        Returns (job_id, payload) or None if nothing became available in time.
+        """
+        deadline = time.monotonic() + timeout
+        keys = [
+            self._key("ready"),
+            self._key("inflight"),
+            self._key("jobs"),
+            self._key("delayed"),
+            self._key("attempts"),
+        ]
+        while True:
+            result = self._reserve(
+                keys=keys, args=[time.time(), self.visibility_timeout]
+            )
+            if result:
+                job_id, raw, attempts = result
+                if raw is None:
+                    # Acked by a previous holder after its lease expired
+                    self.ack(job_id)
+                    continue
+                if int(attempts) > self.max_attempts:
+                    self._bury(job_id, raw)
+                    continue
+                return job_id, json.loads(raw)
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def ack(self, job_id: str):
+        pipe = self.client.pipeline()
+        pipe.zrem(self._key("inflight"), job_id)
+        pipe.hdel(self._key("jobs"), job_id)
+        pipe.hdel(self._key("attempts"), job_id)
+        pipe.execute()
+
+    def nack(self, job_id: str):
+        """
+        Schedules a failed job for retry, or moves it to the dead letter list.
+        """
+        attempts = int(self.client.hget(self._key("attempts"), job_id) or 0)
+        if attempts >= self.max_attempts:
+            self._bury(job_id, self.client.hget(self._key("jobs"), job_id))
+            return
+        delay = compute_backoff(attempts, self.backoff_base, self.backoff_cap)
+        pipe = self.client.pipeline()
+        pipe.zrem(self._key("inflight"), job_id)
+        pipe.zadd(self._key("delayed"), {job_id: time.time() + delay})
+        pipe.execute()
+
+    def touch(self, job_id: str):
+        """
+        Extends the visibility timeout of an in-flight job.
+        """
+        self.client.zadd(
+            self._key("inflight"),
+            {job_id: time.time() + self.visibility_timeout},
+            xx=True,
+        )
+
+    def _bury(self, job_id: str, raw):
+        pipe = self.client.pipeline()
+        pipe.zrem(self._key("inflight"), job_id)
+        pipe.lpush(self._key("dead"), json.dumps({"id": job_id, "payload": raw}))
+        pipe.hdel(self._key("jobs"), job_id)
+        pipe.hdel(self._key("attempts"), job_id)
+        pipe.execute()
+
+    def metrics(self) -> dict:
+        pipe = self.client.pipeline()
+        pipe.llen(self._key("ready"))
+        pipe.zcard(self._key("inflight"))
+        pipe.zcard(self._key("delayed"))
+        pipe.llen(self._key("dead"))
+        ready, inflight, delayed, dead = pipe.execute()
+        return {
+            "backend": "redis",
+            "ready": ready,
+            "inflight": inflight,
+            "delayed": delayed,
+            "dead": dead,
+        }
+
+
+def create_job_queue(config: dict):
+    """
+    Builds the job queue selected by QUEUE_BACKEND ("memory" or "redis").
+    """
+    options = {
+        "visibility_timeout": float(config.get("QUEUE_VISIBILITY_TIMEOUT", 300)),
+        "max_attempts": int(config.get("QUEUE_MAX_ATTEMPTS", 5)),
+    }
+    if config.get("QUEUE_BACKEND", "memory") == "redis":
+        return RedisJobQueue.from_url(
+            config.get("REDIS_URL", "redis://localhost:6379/0"), **options
+        )
+    return InMemoryJobQueue(**options)
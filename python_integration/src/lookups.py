@@ -0,0 +1,234 @@
+import contextvars
+import datetime
+import threading
+from concurrent.futures import Future
+
+import pytz
+from utils.text import normalize_text
+
+
+class PrefetchStats:
+    """
+    Counters for speculative lookups, shared by every `CalendarLookups`.
+    A prefetched lookup is a hit when a handler consumes it, wasted otherwise.
+    """
+
+    def __init__(self):
+        self.issued = 0
+        self.hits = 0
+        self.wasted = 0
+        self._lock = threading.Lock()
+
+    def record(self, issued: int, hits: int):
+        with self._lock:
+            self.issued += issued
+            self.hits += hits
+            self.wasted += issued - hits
+
+    def metrics(self) -> dict:
+        with self._lock:
+            settled = self.hits + self.wasted
+            return {
+                "issued": self.issued,
+                "hits": self.hits,
+                "wasted": self.wasted,
+                "hit_rate": round(self.hits / settled, 4) if settled else 0.0,
+            }
+
+
+class CalendarLookups:
+    """
+    Per-message memo of the Google Calendar lookups used by the action
+    handlers (calendar name -> ID, upcoming events of a calendar).
+
+    A lookup can be started early on `pool` (e.g. while the LLM is still
+    generating) with `start_*`; the handlers then pick up the running or
+    finished result instead of calling the API again. Without a pool every
+    lookup runs synchronously on first use.
+
+    `prefetch` starts lookups speculatively, before the calendar is known;
+    call `close` once the message is handled so `stats` can tell the
+    prefetches that were used from the wasted ones.
+
+    Events are read from `event_source` (e.g. an `EventMirror`), which
+    defaults to `calendar_client` itself.
+    """
+
+    def __init__(
+        self,
+        calendar_client,
+        pool=None,
+        default_calendar_name=None,
+        stats=None,
+        event_source=None,
+    ):
+        self.calendar_client = calendar_client
+        self.event_source = event_source or calendar_client
+        self.pool = pool
+        self.default_calendar_name = default_calendar_name
+        self.stats = stats
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._llm_fields = {}
+        self._speculative = set()
+        self._used = set()
+
+    def _start(self, key, func, *args):
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future
+            if self.pool is None:
+                future = Future()
+                self._futures[key] = future
+            else:
+                ctx = contextvars.copy_context()
+                future = self.pool.submit(ctx.run, func, *args)
+                self._futures[key] = future
+                return future
+        # Synchronous fallback, outside the lock
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def start_calendar_id(self, calendar_name: str):
+        return self._start(
+            ("calendar_id", calendar_name),
+            self.calendar_client.get_calendar_id_by_name,
+            calendar_name,
+        )
+
+    def start_upcoming_events(self, calendar_name: str):
+        # The ID lookup is submitted first: the pool runs tasks in order, so
+        # the events task never waits on a lookup that has not started.
+        self.start_calendar_id(calendar_name)
+        return self._start(
+            ("upcoming_events", calendar_name),
+            self._fetch_upcoming_events,
+            calendar_name,
+        )
+
+    def _fetch_upcoming_events(self, calendar_name: str):
+        # Not a handler read: does not count as a use of the prefetched ID
+        calendar_id = self.start_calendar_id(calendar_name).result()
+        if not calendar_id:
+            return None
+        return self.event_source.get_all_events(
+            calendar_id=calendar_id,
+            start_date=datetime.datetime.now(
+                pytz.timezone("America/Sao_Paulo")
+            ).isoformat(),
+        )
+
+    def calendar_id(self, calendar_name: str):
+        self._used.add(("calendar_id", calendar_name))
+        return self.start_calendar_id(calendar_name).result()
+
+    def upcoming_events(self, calendar_name: str):
+        """
+        Events from now until the default window of `get_all_events`.
+        """
+        self._used.add(("upcoming_events", calendar_name))
+        return self.start_upcoming_events(calendar_name).result()
+
+    def matching_events(
+        self, calendar_name: str, title: str, start_date=None, end_date=None
+    ):
+        """
+        Events whose title contains `title`, ignoring accents and case, from
+        `start_date` (default: now) to `end_date` (default: 30 days later).
+
+        If the upcoming events were already fetched (prefetch or streaming)
+        they are filtered locally; otherwise `event_source.search_events`
+        narrows the search on its side.
+        """
+        if (
+            start_date is None
+            and end_date is None
+            and ("upcoming_events", calendar_name) in self._futures
+        ):
+            events = self.upcoming_events(calendar_name) or []
+            match_titles = getattr(self.event_source, "match_titles", None)
+            event_ids = (
+                match_titles(self.calendar_id(calendar_name), title)
+                if match_titles is not None
+                else None
+            )
+            # None: the index was not kept current (e.g. the mirror fell back to the API)
+            if event_ids is not None:
+                return [event for event in events if event["id"] in event_ids]
+            normalized_title = normalize_text(title)
+            return [
+                event
+                for event in events
+                if normalized_title in normalize_text(event.get("summary", ""))
+            ]
+
+        calendar_id = self.calendar_id(calendar_name)
+        if not calendar_id:
+            return []
+        if start_date is None:
+            start_date = datetime.datetime.now(
+                pytz.timezone("America/Sao_Paulo")
+            ).isoformat()
+        return (
+            self.event_source.search_events(calendar_id, title, start_date, end_date)
+            or []
+        )
+
+    def suggest_titles(self, calendar_name: str, title: str, limit: int = 3):
+        """
+        Closest event titles when `matching_events` finds nothing.
+        """
+        suggest_titles = getattr(self.event_source, "suggest_titles", None)
+        if suggest_titles is None:
+            return []
+        return suggest_titles(self.calendar_id(calendar_name), title, limit)
+
+    def prefetch(self, calendar_name: str, events: bool = True):
+        """
+        Speculatively starts the calendar ID (and upcoming events) lookups.
+        Only makes sense with a pool; without one it would block the caller.
+        """
+        if self.pool is None or not calendar_name:
+            return
+        keys = [("calendar_id", calendar_name)]
+        self.start_calendar_id(calendar_name)
+        if events:
+            keys.append(("upcoming_events", calendar_name))
+            self.start_upcoming_events(calendar_name)
+        with self._lock:
+            self._speculative.update(keys)
+
+    def close(self):
+        """
+        Settles the prefetch counters and cancels prefetches nobody used.
+        """
+        with self._lock:
+            speculative = set(self._speculative)
+            self._speculative.clear()
+        unused = speculative - self._used
+        for key in unused:
+            future = self._futures.get(key)
+            if future is not None:
+                future.cancel()
+        if self.stats is not None and speculative:
+            self.stats.record(len(speculative), len(speculative) - len(unused))
+
+    def on_llm_field(self, name: str, value):
+        """
+        Callback for streamed LLM output: starts the lookups a field reveals.
+        """
+        self._llm_fields[name] = value
+        if not value:
+            return
+        if name == "calendar_name":
+            self.start_calendar_id(value)
+        elif name == "event_summary_or_id":
+            calendar_name = (
+                self._llm_fields.get("calendar_name") or self.default_calendar_name
+            )
+            if calendar_name:
+                self.start_upcoming_events(calendar_name)
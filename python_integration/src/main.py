@@ -1,13 +1,24 @@
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from fastapi import Request
 import uvicorn
 from fastapi import FastAPI
-from api_send import EvolutionAPI 
-import unicodedata
+from fastapi.responses import JSONResponse
+from agenda import AgendaPager
+from api_send import EvolutionAPI
+from dedup import create_deduplicator
+from event_mirror import create_event_mirror
+from job_queue import create_job_queue
+from lookups import CalendarLookups, PrefetchStats
+from outbound import OutboundDispatcher
+from reschedule import apply_plan, describe_plan, plan_reschedule
+from webhook_decoder import WebhookDecoder
+from pipeline import MessagePipeline
+from utils.concurrency import BlockingExecutor
 import datetime
 import pytz
-import re
 # Get the path to the project's root directory
 project_root = os.path.dirname(
     os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -15,8 +26,10 @@ project_root = os.path.dirname(
 # Add the project's root directory to the system path
 sys.path.append(project_root)
 
-from google_api.google_api import GoogleCalendar
+from google_api.google_api import GoogleCalendar, RequestExecutor, calendar_user
 from llm_integration.chatbot import GeminiChatbot, get_current_saopaulo_date
+from llm_integration.fast_parser import split_title_and_day
+from llm_integration.response_cache import create_response_cache
 try:
     from python_integration.src.utils.config import load_config
 
@@ -24,12 +37,37 @@ try:
 except ImportError:
     config = {}
 DEFAULT_CALENDAR_NAME = config.get("DEFAULT_CALENDAR_NAME", "wpp-llm")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await pipeline.start()
+    yield
+    await pipeline.stop()
+    await dispatcher.stop()
+    executor.shutdown()
+    lookup_pool.shutdown(wait=False, cancel_futures=True)
+    evo.close()
+
+
 # Create FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Initialize the sending class
 evo = EvolutionAPI()
 
+# Replies go out through per-chat and global token buckets; replies that
+# queue up for the same chat while it is throttled are merged into one message
+dispatcher = OutboundDispatcher(
+    evo.asend_message,
+    per_recipient_rate=float(config.get("OUTBOUND_RATE_PER_CHAT", 1)),
+    per_recipient_burst=float(config.get("OUTBOUND_BURST_PER_CHAT", 3)),
+    global_rate=float(config.get("OUTBOUND_GLOBAL_RATE", 20)),
+    global_burst=float(config.get("OUTBOUND_GLOBAL_BURST", 40)),
+    # Merged replies never grow past the size of a listing chunk
+    max_chars=int(config.get("AGENDA_CHUNK_CHARS", 3000)),
+)
+
 # Initialize the Google Calendar and Gemini Chatbot clients once
 API_NAME = "calendar"
 API_VERSION = "v3"
@@ -42,7 +80,16 @@ print("Iniciando a conexão com o Google Calendar...")
 print(f"Tentando carregar o arquivo de credenciais de: {client_secret_path}")
 try:
     calendar_client = GoogleCalendar(
-        client_secret_path, API_NAME, API_VERSION, SCOPES
+        client_secret_path, API_NAME, API_VERSION, SCOPES,
+        directory_ttl=float(config.get("CALENDAR_DIRECTORY_TTL", 300)),
+        # Shared quota for every Calendar call, with a per-user share
+        requests=RequestExecutor(
+            rate=float(config.get("GOOGLE_API_RATE", 10)),
+            burst=float(config.get("GOOGLE_API_BURST", 20)),
+            user_rate=float(config.get("GOOGLE_API_USER_RATE", 5)),
+            user_burst=float(config.get("GOOGLE_API_USER_BURST", 10)),
+            max_attempts=int(config.get("GOOGLE_API_MAX_ATTEMPTS", 5)),
+        ),
     )
     print("Conexão com o Google Calendar inicializada com sucesso.")
 except FileNotFoundError:
@@ -50,329 +97,438 @@ except FileNotFoundError:
     print("Por favor, verifique se o arquivo existe e se o caminho está correto na sua configuração do Docker.")
     sys.exit(1) # Exit with an error code to make the problem obvious
 
+# Long listings are split into messages; "mais" resumes the chat's cursor
+agenda_pager = AgendaPager(
+    max_chars=int(config.get("AGENDA_CHUNK_CHARS", 3000)),
+    ttl=float(config.get("AGENDA_CURSOR_TTL", 600)),
+)
+
+# Local copy of the events, kept current with sync tokens; the handlers read
+# events from here instead of listing them from the API on every message
+event_mirror = create_event_mirror(config, calendar_client)
+event_source = event_mirror or calendar_client
+
 print("\n" + "=" * 30 + "\n")
 
 print("Iniciando o chatbot Gemini...")
-chatbot = GeminiChatbot(model_name="gemini-2.0-flash")
+chatbot = GeminiChatbot(
+    model_name=config.get("LLM_FAST_MODEL", "gemini-2.0-flash-lite"),
+    escalation_model_name=config.get("LLM_STRONG_MODEL", "gemini-2.0-flash") or None,
+    temperature=float(config.get("LLM_TEMPERATURE", 0.7)),
+    timeout=float(config.get("LLM_TIMEOUT", 30)),
+    hedge_percentile=float(config.get("LLM_HEDGE_PERCENTILE", 0)) or None,
+    use_fast_path=config.get("FAST_PATH_ENABLED", "true").lower() == "true",
+    prompt_mode=config.get("PROMPT_MODE", "compact"),
+    response_cache=create_response_cache(config),
+)
 print("\n" + "=" * 30 + "\n")
 
+# Blocking stages run here so the event loop keeps accepting webhooks
+executor = BlockingExecutor(
+    mode=config.get("EXECUTION_MODE", "threaded"),
+    max_workers=int(config.get("BLOCKING_POOL_SIZE", 8)),
+    max_concurrency=int(config.get("MAX_CONCURRENT_REQUESTS", 32)),
+)
+
+# Calendar lookups started before the execute stage (e.g. while the LLM streams)
+# get their own pool so they never wait behind the handlers that need them.
+lookup_pool = ThreadPoolExecutor(
+    max_workers=int(config.get("LOOKUP_POOL_SIZE", 8)), thread_name_prefix="lookup"
+)
+LLM_STREAMING = config.get("LLM_STREAMING", "false").lower() == "true"
+
+# Opt-in: look up the default calendar (ID + upcoming events) while the LLM
+# is still parsing the message
+PREFETCH_ENABLED = config.get("PREFETCH_ENABLED", "false").lower() == "true"
+prefetch_stats = PrefetchStats()
 
-def normalize_text(text: str) -> str:
+
+def search_scope(action_request: dict):
     """
-    Normaliza o texto removendo acentos e convertendo para minúsculas.
+    Title and time window to search for the event of a delete/update:
+    a day at the end of the title ("Reunião de hoje") or the dates in
+    event_details narrow the window; otherwise it is left to the default.
     """
-    # Se o texto não for uma string, retorne uma string vazia para evitar erros
-    if not isinstance(text, str):
-        return ""
-    
-    # Normaliza a string para a forma NFKD, que separa os caracteres de seus acentos
-    normalized = unicodedata.normalize('NFKD', text)
-    
-    # Filtra e decodifica a string para remover os acentos
-    return "".join([
-        c for c in normalized if not unicodedata.combining(c)
-    ]).lower()
-@app.post("/")
-async def webhook(request: Request):
+    saopaulo_tz = pytz.timezone("America/Sao_Paulo")
+    event_summary_or_id = action_request.get("event_summary_or_id")
+    title, day = split_title_and_day(event_summary_or_id, datetime.datetime.now(saopaulo_tz).date())
+    first_day = last_day = day
+    if day is None:
+        details = action_request.get("event_details") or {}
+        try:
+            if details.get("start_date"):
+                first_day = datetime.date.fromisoformat(details["start_date"])
+                last_day = datetime.date.fromisoformat(details.get("end_date") or details["start_date"])
+        except ValueError:
+            first_day = last_day = None
+    if first_day is None:
+        return title, None, None
+    start = saopaulo_tz.localize(datetime.datetime.combine(first_day, datetime.time()))
+    end = saopaulo_tz.localize(datetime.datetime.combine(last_day + datetime.timedelta(days=1), datetime.time()))
+    return title, start.isoformat(), end.isoformat()
+
+
+def delete_in_batches(calendar_id: str, events: list) -> dict:
     """
-    Handles incoming webhook requests from the WhatsApp API.
+    Deletes the events with batch requests (up to 50 per HTTP call).
     """
-    data = await request.json()
-    print("📩 Received webhook:", data)
-
-    telephone = data["data"]["key"]["remoteJid"]
-    message_text = data["data"]["message"].get("conversation")
-
-    if telephone and message_text:
-        print(f"Processando a solicitação do usuário: {message_text}")
-        action_request = chatbot.ask_question(message_text)
-        print(f"LLM action_request: {action_request}")
-
-        if not action_request or "action" not in action_request:
-            reply_text = "Não consegui entender sua solicitação de calendário. Por favor, tente novamente."
-            evo.send_message(telephone, reply_text)
-            return {"status": "ok"}
-
-        action = action_request.get("action")
-        target = action_request.get("target")
-        reply_text = "Ação de calendário executada com sucesso!"
-
-        # Execute the action based on the LLM's intent
-        if action == "create" and target == "calendar":
-            calendar_name = action_request.get("calendar_name", DEFAULT_CALENDAR_NAME)
-            if calendar_name:
-                existing_id = calendar_client.get_calendar_id_by_name(calendar_name)
-                if not existing_id:
-                    print(f"Criando o calendário '{calendar_name}'...")
-                    calendar_client.create_new_calendar(calendar_name)
-                    reply_text = f"Calendário '{calendar_name}' criado com sucesso."
-                else:
-                    reply_text = f"O calendário '{calendar_name}' já existe. Não foi criado novamente."
-            else:
-                reply_text = "Nome do calendário não fornecido. Ação de criação cancelada."
-
-        if action == "create" and target == "event":
-            event_data = action_request.get("event_details")
-            calendar_name = action_request.get("calendar_name", DEFAULT_CALENDAR_NAME)
-            
-            # 1. Obter o ID do calendário
-            calendar_id = calendar_client.get_calendar_id_by_name(calendar_name)
-            if not calendar_id:
-                reply_text = f"Erro: Não foi possível encontrar o calendário '{calendar_name}'."
-            else:
-                try:
-                    # 2. Lógica para definir o horário de término padrão (se não fornecido)
-                    if 'start_time' in event_data and 'end_time' not in event_data:
-                        start_datetime_str = f"{event_data['start_date']}T{event_data['start_time']}"
-                        start_datetime_obj = datetime.datetime.strptime(start_datetime_str, "%Y-%m-%dT%H:%M:%S")
-                        end_datetime_obj = start_datetime_obj + datetime.timedelta(hours=1)
-                        event_data['end_time'] = end_datetime_obj.strftime("%H:%M:%S")
-
-                    # 3. Chamar a API de criação de evento
-                    # Essa é a parte que estava faltando.
-                    created_event = calendar_client.create_event(calendar_id, event_data)
-                    
-                    if created_event:
-                        reply_text = f"Evento '{created_event.get('summary')}' criado com sucesso."
-                    else:
-                        reply_text = "O evento não pôde ser criado. Verifique os logs para mais detalhes."
-                except Exception as e:
-                    reply_text = f"Ocorreu um erro ao criar o evento: {e}"
-
-        elif action == "delete" and target == "event":
-            event_summary_or_id = action_request.get("event_summary_or_id")
-            calendar_name = action_request.get("calendar_name", DEFAULT_CALENDAR_NAME)
-
-            if not event_summary_or_id:
-                reply_text = "Por favor, especifique o nome do evento que deseja excluir."
-                evo.send_message(telephone, reply_text)
-                return {"status": "ok"}
-            
-            calendar_id = calendar_client.get_calendar_id_by_name(calendar_name)
-            if not calendar_id:
-                reply_text = f"Erro: Não foi possível encontrar o calendário '{calendar_name}'."
-            else:
-                try:
-                    # Busque eventos específicos
-                    events = calendar_client.get_all_events(
-                        calendar_id=calendar_id,
-                        start_date=datetime.datetime.now(pytz.timezone("America/Sao_Paulo")).isoformat()
-                    )
-                    
-                    events_to_delete = []
-                    normalized_summary = normalize_text(event_summary_or_id)
-                    
-                    for event in events:
-                        normalized_event_summary = normalize_text(event.get('summary', ''))
-                        if normalized_summary in normalized_event_summary:
-                            events_to_delete.append(event)
-                    
-                    if events_to_delete:
-                        deleted_count = 0
-                        for event in events_to_delete:
-                            try:
-                                calendar_client.delete_event(calendar_id, event['id'])
-                                deleted_count += 1
-                            except Exception as e:
-                                print(f"Erro ao deletar o evento {event.get('summary', 'sem título')}: {e}", file=sys.stderr)
-                        
-                        if deleted_count > 0:
-                            reply_text = f"{deleted_count} evento(s) com o título '{event_summary_or_id}' foram excluídos com sucesso."
-                        else:
-                            reply_text = "Nenhum evento foi excluído."
-                    else:
-                        reply_text = f"Nenhum evento com o título '{event_summary_or_id}' foi encontrado."
-                except Exception as e:
-                    reply_text = f"Ocorreu um erro ao buscar e excluir os eventos: {e}"
+    # Instances of a recurring event may repeat in the list
+    event_ids = list(dict.fromkeys(event["id"] for event in events))
+    result = calendar_client.delete_events(calendar_id, event_ids)
+    summaries = {event["id"]: event.get("summary", "sem título") for event in events}
+    for event_id, error in result["failed"].items():
+        print(f"Erro ao deletar o evento {summaries.get(event_id)}: {error}", file=sys.stderr)
+    return result
+
+
+def failed_deletes_reply(result: dict) -> str:
+    if not result["failed"]:
+        return ""
+    return f" {len(result['failed'])} evento(s) não puderam ser excluídos."
 
 
-        elif action == "delete_all_events" and target == "event":
-            calendar_name = action_request.get("calendar_name", DEFAULT_CALENDAR_NAME)
+def not_found_reply(lookups: CalendarLookups, calendar_name: str, event_summary_or_id: str) -> str:
+    reply_text = f"Nenhum evento com o título '{event_summary_or_id}' foi encontrado."
+    suggestions = lookups.suggest_titles(calendar_name, event_summary_or_id)
+    if suggestions:
+        reply_text += " Você quis dizer: " + ", ".join(f"'{title}'" for title in suggestions) + "?"
+    return reply_text
 
-            calendar_id = calendar_client.get_calendar_id_by_name(calendar_name)
-            if not calendar_id:
-                reply_text = f"Erro: Não foi possível encontrar o calendário '{calendar_name}'."
+
+def execute_action(action_request: dict, lookups: CalendarLookups = None, chat_id: str = None) -> str:
+    """
+    Executes the calendar action parsed by the LLM and returns the reply text.
+    This is blocking code (Google Calendar API) and runs on the executor.
+    `lookups` may carry calendar lookups that were started ahead of time;
+    `chat_id` keys the cursor of long listings.
+    """
+    if lookups is None:
+        lookups = CalendarLookups(calendar_client, event_source=event_source)
+
+    if not action_request or "action" not in action_request:
+        return "Não consegui entender sua solicitação de calendário. Por favor, tente novamente."
+
+    action = action_request.get("action")
+    target = action_request.get("target")
+    reply_text = "Ação de calendário executada com sucesso!"
+
+    # Execute the action based on the LLM's intent
+    if action == "create" and target == "calendar":
+        calendar_name = action_request.get("calendar_name", DEFAULT_CALENDAR_NAME)
+        if calendar_name:
+            existing_id = lookups.calendar_id(calendar_name)
+            if not existing_id:
+                print(f"Criando o calendário '{calendar_name}'...")
+                calendar_client.create_new_calendar(calendar_name)
+                reply_text = f"Calendário '{calendar_name}' criado com sucesso."
             else:
-                try:
-                    now = datetime.datetime.now(pytz.timezone("America/Sao_Paulo"))
-                    end_of_year = datetime.datetime(now.year, 12, 31, 23, 59, 59, tzinfo=now.tzinfo)
-                    
-                    events = calendar_client.get_all_events(
-                        calendar_id=calendar_id,
-                        start_date=now.isoformat(),
-                        end_date=end_of_year.isoformat()
-                    )
-
-                    if events:
-                        deleted_count = 0
-                        for event in events:
-                            try:
-                                calendar_client.delete_event(calendar_id, event['id'])
-                                deleted_count += 1
-                            except Exception as e:
-                                print(f"Erro ao deletar o evento {event.get('summary', 'sem título')}: {e}", file=sys.stderr)
-                        
-                        if deleted_count > 0:
-                            reply_text = f"{deleted_count} evento(s) foram excluído(s) com sucesso até o fim do ano."
-                        else:
-                            reply_text = "Nenhum evento foi excluído. Por favor, verifique os logs."
+                reply_text = f"O calendário '{calendar_name}' já existe. Não foi criado novamente."
+        else:
+            reply_text = "Nome do calendário não fornecido. Ação de criação cancelada."
+
+    if action == "create" and target == "event":
+        event_data = action_request.get("event_details")
+        calendar_name = action_request.get("calendar_name", DEFAULT_CALENDAR_NAME)
+        
+        # 1. Obter o ID do calendário
+        calendar_id = lookups.calendar_id(calendar_name)
+        if not calendar_id:
+            reply_text = f"Erro: Não foi possível encontrar o calendário '{calendar_name}'."
+        else:
+            try:
+                # 2. Lógica para definir o horário de término padrão (se não fornecido)
+                if 'start_time' in event_data and 'end_time' not in event_data:
+                    start_datetime_str = f"{event_data['start_date']}T{event_data['start_time']}"
+                    start_datetime_obj = datetime.datetime.strptime(start_datetime_str, "%Y-%m-%dT%H:%M:%S")
+                    end_datetime_obj = start_datetime_obj + datetime.timedelta(hours=1)
+                    event_data['end_time'] = end_datetime_obj.strftime("%H:%M:%S")
+
+                # 3. Chamar a API de criação de evento
+                # Essa é a parte que estava faltando.
+                created_event = calendar_client.create_event(calendar_id, event_data)
+                
+                if created_event:
+                    reply_text = f"Evento '{created_event.get('summary')}' criado com sucesso."
+                else:
+                    reply_text = "O evento não pôde ser criado. Verifique os logs para mais detalhes."
+            except Exception as e:
+                reply_text = f"Ocorreu um erro ao criar o evento: {e}"
+
+    elif action == "delete" and target == "event":
+        event_summary_or_id = action_request.get("event_summary_or_id")
+        calendar_name = action_request.get("calendar_name", DEFAULT_CALENDAR_NAME)
+
+        if not event_summary_or_id:
+            reply_text = "Por favor, especifique o nome do evento que deseja excluir."
+            return reply_text
+        
+        calendar_id = lookups.calendar_id(calendar_name)
+        if not calendar_id:
+            reply_text = f"Erro: Não foi possível encontrar o calendário '{calendar_name}'."
+        else:
+            try:
+                # Busque eventos específicos (pelo índice de títulos)
+                events_to_delete = lookups.matching_events(calendar_name, *search_scope(action_request))
+
+                if events_to_delete:
+                    result = delete_in_batches(calendar_id, events_to_delete)
+                    deleted_count = len(result["succeeded"])
+
+                    if deleted_count > 0:
+                        reply_text = f"{deleted_count} evento(s) com o título '{event_summary_or_id}' foram excluídos com sucesso."
                     else:
-                        reply_text = "Não há eventos para excluir no período solicitado."
-                except Exception as e:
-                    reply_text = f"Ocorreu um erro ao buscar e excluir os eventos: {e}"
+                        reply_text = "Nenhum evento foi excluído."
+                    reply_text += failed_deletes_reply(result)
+                else:
+                    reply_text = not_found_reply(lookups, calendar_name, event_summary_or_id)
+            except Exception as e:
+                reply_text = f"Ocorreu um erro ao buscar e excluir os eventos: {e}"
+
+
+    elif action == "delete_all_events" and target == "event":
+        calendar_name = action_request.get("calendar_name", DEFAULT_CALENDAR_NAME)
+
+        calendar_id = lookups.calendar_id(calendar_name)
+        if not calendar_id:
+            reply_text = f"Erro: Não foi possível encontrar o calendário '{calendar_name}'."
+        else:
+            try:
+                now = datetime.datetime.now(pytz.timezone("America/Sao_Paulo"))
+                end_of_year = datetime.datetime(now.year, 12, 31, 23, 59, 59, tzinfo=now.tzinfo)
+                
+                # Só os IDs e títulos, de todas as páginas. A lista é
+                # materializada antes de apagar para não paginar uma listagem
+                # que está sendo alterada.
+                events = list(event_source.iter_events(
+                    calendar_id=calendar_id,
+                    start_date=now.isoformat(),
+                    end_date=end_of_year.isoformat(),
+                    fields="id,summary",
+                ))
+
+                if events:
+                    result = delete_in_batches(calendar_id, events)
+                    deleted_count = len(result["succeeded"])
+
+                    if deleted_count > 0:
+                        reply_text = f"{deleted_count} evento(s) foram excluído(s) com sucesso até o fim do ano."
+                    else:
+                        reply_text = "Nenhum evento foi excluído. Por favor, verifique os logs."
+                    reply_text += failed_deletes_reply(result)
+                else:
+                    reply_text = "Não há eventos para excluir no período solicitado."
+            except Exception as e:
+                reply_text = f"Ocorreu um erro ao buscar e excluir os eventos: {e}"
 
 
 
-        # Ação de atualização para eventos
-        elif action == "update" and target == "event":
-            event_summary_or_id = action_request.get("event_summary_or_id")
-            update_data = action_request.get("update_data")
-            calendar_name = action_request.get("calendar_name", DEFAULT_CALENDAR_NAME)
+    # Ação de atualização para eventos
+    elif action == "update" and target == "event":
+        event_summary_or_id = action_request.get("event_summary_or_id")
+        update_data = action_request.get("update_data")
+        calendar_name = action_request.get("calendar_name", DEFAULT_CALENDAR_NAME)
 
-            if not event_summary_or_id or not update_data:
-                reply_text = "Por favor, especifique qual evento e o que deseja atualizar."
-                evo.send_message(telephone, reply_text)
-                return {"status": "ok"}
+        if not event_summary_or_id or not update_data:
+            reply_text = "Por favor, especifique qual evento e o que deseja atualizar."
+            return reply_text
 
-            calendar_id = calendar_client.get_calendar_id_by_name(calendar_name)
-            if not calendar_id:
-                reply_text = f"Erro: Não foi possível encontrar o calendário '{calendar_name}'."
-            else:
-                try:
-                    # 1. Busca todos os eventos para encontrar o(s) evento(s) correto(s)
-                    all_events = calendar_client.get_all_events(calendar_id)
-                    events_to_update = []
-
-                    # 2. Filtra os eventos com base no resumo/título
-                    normalized_search_term = normalize_text(event_summary_or_id)
-                    for event in all_events:
-                        if 'summary' in event and normalized_search_term in normalize_text(event['summary']):
-                            events_to_update.append(event)
-
-                    if not events_to_update:
-                        reply_text = f"Nenhum evento com o título '{event_summary_or_id}' foi encontrado."
+        calendar_id = lookups.calendar_id(calendar_name)
+        if not calendar_id:
+            reply_text = f"Erro: Não foi possível encontrar o calendário '{calendar_name}'."
+        else:
+            try:
+                # 1. e 2. Busca os eventos cujo título contém o termo (pelo índice de títulos)
+                events_to_update = lookups.matching_events(calendar_name, *search_scope(action_request))
+
+                if not events_to_update:
+                    reply_text = not_found_reply(lookups, calendar_name, event_summary_or_id)
+                else:
+                    # 3. e 4. Calcula de uma vez o patch de cada evento (offset de
+                    # data, horário, textos) e envia tudo em uma mutação em lote
+                    plan = plan_reschedule(events_to_update, update_data)
+                    if update_data.get("dry_run"):
+                        return describe_plan(plan)
+                    updated_count = len(apply_plan(calendar_client, calendar_id, plan)["succeeded"]) if plan else 0
+
+                    if updated_count > 0:
+                        reply_text = f"{updated_count} evento(s) com o título '{event_summary_or_id}' foram atualizados com sucesso."
                     else:
-                        updated_count = 0
-                        for event in events_to_update:
-                            # 3. Aplica as modificações de offset de data
-                            if 'start_date_offset' in update_data:
-                                offset_str = update_data['start_date_offset']
-                                match = re.match(r"([+-])(\d+)\s*(day|week|month|year)s?", offset_str, re.IGNORECASE)
-
-                                if match:
-                                    sign = match.group(1)
-                                    value = int(match.group(2))
-                                    unit = match.group(3).lower()
-
-                                    if sign == '-':
-                                        value = -value
-
-                                    delta_kwargs = {}
-                                    if unit == 'day':
-                                        delta_kwargs['days'] = value
-                                    elif unit == 'week':
-                                        delta_kwargs['weeks'] = value
-                                    elif unit == 'month':
-                                        delta_kwargs['days'] = value * 30
-                                    elif unit == 'year':
-                                        delta_kwargs['days'] = value * 365
-
-                                    if delta_kwargs:
-                                        original_start_time = datetime.datetime.fromisoformat(event['start']['dateTime'])
-                                        new_start_time = original_start_time + datetime.timedelta(**delta_kwargs)
-
-                                        event['start']['dateTime'] = new_start_time.isoformat()
-                                        event['end']['dateTime'] = (new_start_time + (datetime.datetime.fromisoformat(event['end']['dateTime']) - original_start_time)).isoformat()
-                                        calendar_client.update_event(calendar_id, event['id'], event)
-                                        updated_count += 1
-
-                            # 4. Aplica as modificações de horário
-                            if 'start_time' in update_data:
-                                new_time_str = update_data['start_time']
-                                new_time = datetime.datetime.strptime(new_time_str, '%H:%M:%S').time()
-                                
-                                original_start_time = datetime.datetime.fromisoformat(event['start']['dateTime'])
-                                original_end_time = datetime.datetime.fromisoformat(event['end']['dateTime'])
-                                duration = original_end_time - original_start_time
-                                
-                                new_start_time = original_start_time.replace(hour=new_time.hour, minute=new_time.minute, second=new_time.second)
-                                new_end_time = new_start_time + duration
-                                
-                                event['start']['dateTime'] = new_start_time.isoformat()
-                                event['end']['dateTime'] = new_end_time.isoformat()
-                                
-                                calendar_client.update_event(calendar_id, event['id'], event)
-                                updated_count += 1
-
-                        if updated_count > 0:
-                            reply_text = f"{updated_count} evento(s) com o título '{event_summary_or_id}' foram atualizados com sucesso."
-                        else:
-                            reply_text = "Nenhum evento foi atualizado. Verifique se os dados de atualização estão corretos."
-
-                except Exception as e:
-                    reply_text = f"Ocorreu um erro ao atualizar os eventos: {e}"
-
-            evo.send_message(telephone, reply_text)
-            return {"status": "ok"}
-
-
-        elif action == "list" and target == "event":
-            calendar_name = action_request.get("calendar_name", DEFAULT_CALENDAR_NAME)
-            
-            # Adicionando a lógica para capturar a duração da solicitação, se disponível
-            duration_months = action_request.get('duration_months', 12)
-            # Por padrão, se a LLM não especificar, assumiremos 12 meses.
-            
-            calendar_id = calendar_client.get_calendar_id_by_name(calendar_name)
-            if not calendar_id:
-                reply_text = f"Erro: Não foi possível encontrar o calendário '{calendar_name}'."
-            else:
-                try:
-                    now = datetime.datetime.now(pytz.timezone("America/Sao_Paulo"))
-                    # Definir a data de início como a data e hora atuais
-                    start_date = now.isoformat()
-                    
-                    # Calcular a data de término com base no número de meses
-                    end_date = (now + datetime.timedelta(days=30 * duration_months)).isoformat()
-                    
-                    events = calendar_client.get_all_events(
-                        calendar_id=calendar_id,
-                        start_date=start_date,
-                        end_date=end_date
-                    )
-                    
-                    if events:
-                        event_list_str = []
-                        for event in events:
-                            start_data = event.get('start', {})
-                            start_time = start_data.get('dateTime')
-                            start_date_only = start_data.get('date')
-
-                            if start_time:
-                                start_time_obj = datetime.datetime.fromisoformat(start_time)
-                                start_time_str = start_time_obj.strftime('%d/%m/%Y %H:%M')
-                            elif start_date_only:
-                                start_date_obj = datetime.datetime.strptime(start_date_only, '%Y-%m-%d')
-                                start_time_str = f"Dia inteiro em {start_date_obj.strftime('%d/%m/%Y')}"
-                            else:
-                                start_time_str = "Data/Hora não informada"
-                            
-                            event_list_str.append(f"- **{event.get('summary', 'Evento sem título')}** ({start_time_str})")
-                        
-                        reply_text = f"Seus próximos eventos para os próximos {duration_months} meses são:\n" + "\n".join(event_list_str)
+                        reply_text = "Nenhum evento foi atualizado. Verifique se os dados de atualização estão corretos."
+
+            except Exception as e:
+                reply_text = f"Ocorreu um erro ao atualizar os eventos: {e}"
+
+
+
+    elif action == "list" and target == "event":
+        calendar_name = action_request.get("calendar_name", DEFAULT_CALENDAR_NAME)
+        
+        # Adicionando a lógica para capturar a duração da solicitação, se disponível
+        duration_months = action_request.get('duration_months', 12)
+        # Por padrão, se a LLM não especificar, assumiremos 12 meses.
+        
+        calendar_id = lookups.calendar_id(calendar_name)
+        if not calendar_id:
+            reply_text = f"Erro: Não foi possível encontrar o calendário '{calendar_name}'."
+        else:
+            try:
+                now = datetime.datetime.now(pytz.timezone("America/Sao_Paulo"))
+                # Definir a data de início como a data e hora atuais
+                start_date = now.isoformat()
+                
+                # Calcular a data de término com base no número de meses
+                end_date = (now + datetime.timedelta(days=30 * duration_months)).isoformat()
+                
+                # As páginas chegam sob demanda e só com título e início; só
+                # são formatados os eventos que cabem na primeira mensagem
+                events = event_source.iter_events(
+                    calendar_id=calendar_id,
+                    start_date=start_date,
+                    end_date=end_date,
+                    fields="summary,start",
+                )
+                reply_text = agenda_pager.start(
+                    chat_id,
+                    events,
+                    header=f"Seus próximos eventos para os próximos {duration_months} meses são:\n",
+                    empty_text=f"Não há eventos para os próximos {duration_months} meses.",
+                )
+            except Exception as e:
+                reply_text = f"Ocorreu um erro ao listar os eventos: {e}"
+
+    return reply_text
+
+
+async def process_message(job: dict):
+    """
+    Runs the parse -> execute -> reply stages for a single WhatsApp message.
+    """
+    telephone = job["telephone"]
+    message_text = job["message_text"]
+
+    # Calendar API calls made for this message count against the sender's share
+    user_token = calendar_user.set(telephone)
+    try:
+        async with executor.limit():
+            print(f"Processando a solicitação do usuário: {message_text}")
+            if agenda_pager.is_follow_up(telephone, message_text):
+                # "mais" after a long listing: resume its cursor, no LLM call
+                with pipeline.stage("execute"):
+                    reply_text = await executor.run(agenda_pager.next_page, telephone)
+                with pipeline.stage("reply"):
+                    await dispatcher.submit(telephone, reply_text)
+                print(f"📤 Sent reply to {telephone}: {reply_text}")
+                return
+
+            lookups = CalendarLookups(
+                calendar_client, lookup_pool, DEFAULT_CALENDAR_NAME,
+                stats=prefetch_stats, event_source=event_source,
+            )
+            if PREFETCH_ENABLED:
+                lookups.prefetch(DEFAULT_CALENDAR_NAME)
+            try:
+                with pipeline.stage("parse"):
+                    if LLM_STREAMING:
+                        # Calendar lookups start as soon as the streamed JSON reveals
+                        # calendar_name / event_summary_or_id
+                        action_request = await chatbot.astream_question(
+                            message_text, on_field=lookups.on_llm_field
+                        )
                     else:
-                        reply_text = f"Não há eventos para os próximos {duration_months} meses."
-                except Exception as e:
-                    reply_text = f"Ocorreu um erro ao listar os eventos: {e}"
+                        action_request = await chatbot.aask_question(message_text)
+                print(f"LLM action_request: {action_request}")
+
+                with pipeline.stage("execute"):
+                    reply_text = await executor.run(execute_action, action_request, lookups, telephone)
+            finally:
+                lookups.close()
+
+            # Send the final response back to WhatsApp through the dispatcher;
+            # a send error fails the job so a durable queue can retry it
+            with pipeline.stage("reply"):
+                await dispatcher.submit(telephone, reply_text)
+            print(f"📤 Sent reply to {telephone}: {reply_text}")
+    finally:
+        calendar_user.reset(user_token)
+
+
+# Messages are acknowledged right away and processed by background workers
+pipeline = MessagePipeline(
+    process_message,
+    workers=int(config.get("PIPELINE_WORKERS", 4)),
+    max_queue_size=int(config.get("PIPELINE_MAX_QUEUE", 1000)),
+)
 
+# With QUEUE_BACKEND=redis jobs go to a durable queue consumed by worker.py
+job_queue = (
+    create_job_queue(config) if config.get("QUEUE_BACKEND") == "redis" else None
+)
+
+# Rejects non-message events and the bot's own messages before parsing
+decoder = WebhookDecoder()
 
-    
-        # Send the final response back to WhatsApp
-        evo.send_message(telephone, reply_text)
-        print(f"📤 Sent reply to {telephone}: {reply_text}")
+# Drops webhook redeliveries (same WhatsApp message id) before the LLM runs
+deduplicator = create_deduplicator(config)
+
+
+@app.post("/")
+async def webhook(request: Request):
+    """
+    Handles incoming webhook requests from the WhatsApp API.
+    Validates the payload, enqueues the job and returns right away.
+    """
+    message = decoder.decode(await request.body())
+    if message is None:
+        return {"status": "ignored"}
+
+    telephone = message.remote_jid
+    message_id = message.message_id
+    message_text = message.text
+    print(f"📩 Received message {message_id} from {telephone}")
+
+    if await executor.run(deduplicator.is_duplicate, message_id):
+        print(f"Mensagem duplicada ignorada: {message_id}")
+        return {"status": "duplicate"}
+
+    job = {"telephone": telephone, "message_text": message_text}
+    if job_queue is not None:
+        try:
+            await executor.run(job_queue.enqueue, job)
+        except Exception as e:
+            # Let the redelivery through once the queue is reachable again
+            print(f"Failed to enqueue message {message_id}: {e}")
+            await executor.run(deduplicator.forget, message_id)
+            return JSONResponse(status_code=503, content={"status": "unavailable"})
+    elif not pipeline.submit(job):
+        await executor.run(deduplicator.forget, message_id)
+        return JSONResponse(status_code=503, content={"status": "busy"})
 
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """
+    Exposes pipeline queue depth and per-stage latency counters.
+    """
+    result = {
+        "pipeline": pipeline.metrics(),
+        "executor": {"in_flight": executor.in_flight()},
+        "webhook": decoder.metrics(),
+        "evolution": evo.metrics(),
+        "outbound": dispatcher.metrics(),
+        "agenda": agenda_pager.metrics(),
+        "dedup": deduplicator.metrics(),
+        "llm": chatbot.get_stats(),
+        "prefetch": prefetch_stats.metrics(),
+        "calendar_directory": calendar_client.directory.metrics(),
+        "google_api": calendar_client.requests.metrics(),
+        "event_mirror": event_mirror.metrics() if event_mirror else None,
+    }
+    if job_queue is not None:
+        result["queue"] = await executor.run(job_queue.metrics)
+    return result
+
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=9421, reload=True)
@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+from utils.rate_limit import TokenBucket
+
+
+class OutboundDispatcher:
+    """
+    Shapes the replies sent through the Evolution API.
+
+    `submit(number, text)` queues a reply and returns a future that the
+    caller awaits until the reply is delivered (send errors are raised
+    there). Each send waits for a token from the recipient's bucket and
+    from the global one, so bursts (bulk operations, rapid-fire messages)
+    are spread out instead of being throttled by WhatsApp. A reply goes out
+    as soon as its tokens allow; replies that queued up for the same
+    recipient meanwhile (during a throttle wait or the previous send) are
+    merged into one message, as long as the merged text stays within
+    `max_chars`; the rest goes in the next one. Messages to one recipient
+    are sent in order.
+
+    `send` is the coroutine doing the delivery, e.g. `EvolutionAPI.asend_message`.
+    """
+
+    def __init__(
+        self,
+        send,
+        per_recipient_rate: float = 1.0,
+        per_recipient_burst: float = 3,
+        global_rate: float = 20.0,
+        global_burst: float = 40,
+        separator: str = "\n\n",
+        max_chars: int = 3000,
+        max_recipients: int = 10000,
+    ):
+        self.send = send
+        self.per_recipient_rate = per_recipient_rate
+        self.per_recipient_burst = per_recipient_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.separator = separator
+        self.max_chars = max_chars
+        self.max_recipients = max_recipients
+        self._buckets = {}
+        self._pending = {}
+        self._drainers = {}
+        self.submitted = 0
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.throttled = 0
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+
+    def _bucket(self, number) -> TokenBucket:
+        bucket = self._buckets.get(number)
+        if bucket is None:
+            if len(self._buckets) >= self.max_recipients:
+                # Refilled buckets carry no state worth keeping
+                for key in [k for k, b in self._buckets.items() if b.is_idle()]:
+                    del self._buckets[key]
+            bucket = TokenBucket(self.per_recipient_rate, self.per_recipient_burst)
+            self._buckets[number] = bucket
+        return bucket
+
+    def submit(self, number, text) -> asyncio.Future:
+        """
+        Queues a reply; the returned future resolves with the API response
+        of the (possibly merged) message that carried it.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(number, []).append((time.perf_counter(), text, future))
+        self.submitted += 1
+        if number not in self._drainers:
+            self._drainers[number] = asyncio.create_task(
+                self._drain(number), name=f"outbound-{number}"
+            )
+        return future
+
+    def _take_batch(self, number):
+        """
+        Pops the replies that fit in one message; the others stay queued first.
+        """
+        queued = self._pending.pop(number, None)
+        if not queued:
+            return None
+        size = len(queued[0][1])
+        count = 1
+        while count < len(queued):
+            size += len(self.separator) + len(queued[count][1])
+            if size > self.max_chars:
+                break
+            count += 1
+        if count < len(queued):
+            self._pending[number] = queued[count:]
+        return queued[:count]
+
+    async def _drain(self, number):
+        try:
+            while self._pending.get(number):
+                waited = await self._bucket(number).aacquire()
+                waited += await self.global_bucket.aacquire()
+                # Taken after the wait: replies queued meanwhile are merged
+                batch = self._take_batch(number)
+                self.throttled += waited > 0
+                self.coalesced += len(batch) - 1
+                delay = time.perf_counter() - batch[0][0]
+                self.total_delay += delay
+                self.max_delay = max(self.max_delay, delay)
+                text = self.separator.join(text for _, text, _ in batch)
+                try:
+                    result = await self.send(number, text)
+                except Exception as e:
+                    self.failed += 1
+                    print(f"Falha ao enviar a resposta para {number}: {e}")
+                    for _, _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                            # Nobody may be awaiting it; do not warn about it
+                            future.exception()
+                    continue
+                self.sent += 1
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            self._drainers.pop(number, None)
+
+    async def stop(self):
+        """
+        Waits for the queued replies to be sent.
+        """
+        while self._drainers:
+            await asyncio.gather(*list(self._drainers.values()), return_exceptions=True)
+
+    def metrics(self) -> dict:
+        batches = (self.sent + self.failed) or 1
+        return {
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "pending": self.pending(),
+            "throttled": self.throttled,
+            # From the first reply of a batch being queued until it is sent
+            "avg_queue_delay_ms": round(self.total_delay / batches * 1000, 2),
+            "max_queue_delay_ms": round(self.max_delay * 1000, 2),
+        }
+
+    def pending(self) -> int:
+        return sum(len(batch) for batch in self._pending.values())
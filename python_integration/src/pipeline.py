@@ -0,0 +1,145 @@
+import asyncio
+import contextlib
+import time
+
+from scheduler import ChatScheduler
+
+
+class StageStats:
+    """
+    Latency counters for a single pipeline stage.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def observe(self, seconds: float, failed: bool = False):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        if failed:
+            self.errors += 1
+
+    def to_dict(self) -> dict:
+        avg = self.total_seconds / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(avg * 1000, 2),
+            "max_ms": round(self.max_seconds * 1000, 2),
+        }
+
+
+class MessagePipeline:
+    """
+    In-process work queue for incoming WhatsApp messages.
+
+    The webhook only calls `submit(job)` and returns immediately; a pool of
+    worker tasks pulls jobs from the queue and runs `handler(job)`, which is
+    expected to wrap its parse -> execute -> reply steps in `stage(name)`.
+
+    Jobs are sharded by `shard_key(job)`: jobs of the same shard run in
+    order, different shards run in parallel (see ChatScheduler).
+    """
+
+    def __init__(
+        self,
+        handler,
+        workers: int = 4,
+        max_queue_size: int = 1000,
+        shard_key=lambda job: job.get("telephone"),
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.shard_key = shard_key
+        self._queue = None
+        self._tasks = []
+        self._stages = {}
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def start(self):
+        self._queue = ChatScheduler(max_pending=self.max_queue_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"pipeline-worker-{i}")
+            for i in range(self.workers)
+        ]
+        print(f"Pipeline iniciado com {self.workers} workers.")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job: dict, on_done=None) -> bool:
+        """
+        Enqueues a job without waiting. Returns False if the queue is full.
+        `on_done(job, error)` is awaited once the job finished (error is None
+        on success), e.g. to ack or retry a job taken from a durable queue.
+        """
+        try:
+            self._queue.put_nowait(
+                self.shard_key(job), (time.perf_counter(), job, on_done)
+            )
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.submitted += 1
+        return True
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """
+        Measures the wall time of a pipeline stage.
+        """
+        stats = self._stages.setdefault(name, StageStats())
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            stats.observe(time.perf_counter() - started, failed)
+
+    async def _worker(self):
+        while True:
+            key, (enqueued_at, job, on_done) = await self._queue.get()
+            self._stages.setdefault("queue_wait", StageStats()).observe(
+                time.perf_counter() - enqueued_at
+            )
+            error = None
+            try:
+                await self.handler(job)
+                self.completed += 1
+            except Exception as e:
+                error = e
+                self.failed += 1
+                print(f"Erro ao processar a mensagem {job}: {e}")
+            try:
+                if on_done is not None:
+                    await on_done(job, error)
+            except Exception as e:
+                print(f"Erro ao finalizar a mensagem {job}: {e}")
+            finally:
+                self._queue.task_done(key)
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "scheduler": self._queue.metrics() if self._queue else {},
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "stages": {name: s.to_dict() for name, s in self._stages.items()},
+        }
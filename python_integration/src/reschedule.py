@@ -0,0 +1,205 @@
+import datetime
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from dateutil.relativedelta import relativedelta
+from utils.text import normalize_text
+
+# Sign optional; anything after the unit ("2 semanas depois") is ignored
+_OFFSET_RE = re.compile(
+    r"\s*([+-])?\s*(\d+)\s*(hour|hora|day|dia|week|semana|month|mes|year|ano)(?:e?s)?\b"
+    r"(\s*antes\b)?"
+)
+_OFFSET_UNITS = {
+    "hour": "hours",
+    "hora": "hours",
+    "day": "days",
+    "dia": "days",
+    "week": "weeks",
+    "semana": "weeks",
+    "month": "months",
+    "mes": "months",
+    "year": "years",
+    "ano": "years",
+}
+_TEXT_FIELDS = ("summary", "location", "description")
+
+
+def parse_offset(offset_str: str) -> Optional[relativedelta]:
+    """
+    Converts an offset like "+7 days", "-2 weeks", "+1 month" or
+    "2 semanas depois" into a relativedelta (calendar months and years:
+    Jan 31 + 1 month = Feb 28/29). Without a sign the offset is forward,
+    unless followed by "antes".
+    """
+    match = _OFFSET_RE.match(normalize_text(offset_str))
+    if not match:
+        return None
+    value = int(match.group(2))
+    if match.group(1) == "-" or (match.group(1) is None and match.group(4)):
+        value = -value
+    return relativedelta(**{_OFFSET_UNITS[match.group(3)]: value})
+
+
+@dataclass(frozen=True)
+class PlannedChange:
+    """The patch planned for one event, with before/after start for display."""
+
+    event_id: str
+    summary: str
+    old_start: str
+    new_start: str
+    patch: dict
+    etag: Optional[str] = None
+
+
+def _shift_timed(event, offset, new_date, new_time):
+    start = datetime.datetime.fromisoformat(event["start"]["dateTime"])
+    duration = datetime.datetime.fromisoformat(event["end"]["dateTime"]) - start
+    new_start = start + offset if offset else start
+    if new_date is not None:
+        new_start = new_start.replace(
+            year=new_date.year, month=new_date.month, day=new_date.day
+        )
+    if new_time is not None:
+        new_start = new_start.replace(
+            hour=new_time.hour, minute=new_time.minute, second=new_time.second
+        )
+    if new_start == start:
+        return None
+    patch = {
+        "start": {"dateTime": new_start.isoformat()},
+        "end": {"dateTime": (new_start + duration).isoformat()},
+    }
+    for key in ("start", "end"):
+        if event[key].get("timeZone"):
+            patch[key]["timeZone"] = event[key]["timeZone"]
+    return patch
+
+
+def _shift_all_day(event, offset, new_date):
+    # All-day events use "date" and an exclusive end date; a new time of day
+    # does not apply to them
+    start = datetime.date.fromisoformat(event["start"]["date"])
+    end = (
+        datetime.date.fromisoformat(event["end"]["date"])
+        if event.get("end", {}).get("date")
+        else start + datetime.timedelta(days=1)
+    )
+    new_start = start
+    if offset and (offset.years or offset.months or offset.days):
+        new_start = start + offset
+    if new_date is not None:
+        new_start = new_date
+    if new_start == start:
+        return None
+    return {
+        "start": {"date": new_start.isoformat()},
+        "end": {"date": (new_start + (end - start)).isoformat()},
+    }
+
+
+def plan_reschedule(events: list, update_data: dict) -> list:
+    """
+    Computes, in one pass, the minimal patch for every event: date offset
+    (`start_date_offset`) or new date (`start_date`), new start time
+    (`start_time`) and text fields, merged per event. Durations are kept.
+    Events with nothing to change are left out.
+    """
+    offset = (
+        parse_offset(update_data.get("start_date_offset"))
+        if "start_date_offset" in update_data
+        else None
+    )
+    new_date = None
+    if update_data.get("start_date"):
+        new_date = datetime.date.fromisoformat(update_data["start_date"])
+    new_time = None
+    if update_data.get("start_time"):
+        new_time = datetime.datetime.strptime(
+            update_data["start_time"], "%H:%M:%S"
+        ).time()
+
+    plan = []
+    seen = set()
+    for event in events:
+        if event["id"] in seen:
+            continue
+        seen.add(event["id"])
+        start = event.get("start", {})
+        if start.get("dateTime") and event.get("end", {}).get("dateTime"):
+            patch = _shift_timed(event, offset, new_date, new_time) or {}
+        elif start.get("date"):
+            patch = _shift_all_day(event, offset, new_date) or {}
+        else:
+            patch = {}
+        for field in _TEXT_FIELDS:
+            if field in update_data and update_data[field] != event.get(field):
+                patch[field] = update_data[field]
+        if patch:
+            new_start = patch.get("start", start)
+            plan.append(
+                PlannedChange(
+                    event_id=event["id"],
+                    summary=event.get("summary", "Evento sem título"),
+                    old_start=start.get("dateTime") or start.get("date") or "",
+                    new_start=new_start.get("dateTime") or new_start.get("date") or "",
+                    patch=patch,
+                    etag=event.get("etag"),
+                )
+            )
+    return plan
+
+
+def _format_start(value: str) -> str:
+    if not value:
+        return "sem data"
+    if "T" in value:
+        return datetime.datetime.fromisoformat(value).strftime("%d/%m/%Y %H:%M")
+    return f"dia inteiro em {datetime.date.fromisoformat(value).strftime('%d/%m/%Y')}"
+
+
+def describe_plan(plan: list) -> str:
+    """
+    Dry-run text: what would change, without applying anything.
+    """
+    if not plan:
+        return "Nenhum evento seria alterado."
+    lines = [f"{len(plan)} evento(s) seriam alterados:"]
+    for change in plan:
+        if change.old_start != change.new_start:
+            lines.append(
+                f"- **{change.summary}**: {_format_start(change.old_start)} -> {_format_start(change.new_start)}"
+            )
+        else:
+            lines.append(f"- **{change.summary}**: {', '.join(sorted(change.patch))}")
+    return "\n".join(lines)
+
+
+def apply_plan(calendar_client, calendar_id: str, plan: list) -> dict:
+    """
+    Submits the whole plan as one batched mutation (a plain PATCH when it
+    has a single event). Returns the `execute_batch` result format.
+    """
+    if len(plan) == 1:
+        change = plan[0]
+        updated = calendar_client.patch_event(
+            calendar_id, change.event_id, change.patch, change.etag
+        )
+        if updated:
+            return {
+                "succeeded": {change.event_id: updated},
+                "failed": {},
+                "attempts": 1,
+            }
+        return {
+            "succeeded": {},
+            "failed": {change.event_id: "patch failed"},
+            "attempts": 1,
+        }
+    return calendar_client.patch_events(
+        calendar_id,
+        {change.event_id: change.patch for change in plan},
+        {change.event_id: change.etag for change in plan if change.etag},
+    )
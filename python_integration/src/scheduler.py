@@ -0,0 +1,68 @@
+import asyncio
+from collections import deque
+
+
+class ChatScheduler:
+    """
+    Work queue sharded by chat (WhatsApp `remoteJid`).
+
+    - Jobs of the same chat run one at a time, in FIFO order, so "create X"
+      followed by "postpone X" never race.
+    - Different chats run in parallel across the pipeline workers.
+    - Chats take turns: after each job a busy chat goes to the back of the
+      ready line, so a hot chat cannot starve the others.
+    - A shard is dropped as soon as its chat has nothing pending.
+    """
+
+    def __init__(self, max_pending: int = 1000):
+        self.max_pending = max_pending
+        self._shards = {}
+        self._running = set()
+        self._ready = asyncio.Queue()
+        self._pending = 0
+
+    def put_nowait(self, key, item):
+        """
+        Adds an item to the shard of `key`. Raises asyncio.QueueFull when
+        `max_pending` items are already waiting.
+        """
+        if self._pending >= self.max_pending:
+            raise asyncio.QueueFull
+        shard = self._shards.get(key)
+        if shard is None:
+            shard = self._shards[key] = deque()
+        shard.append(item)
+        self._pending += 1
+        # A chat is in the ready line only while it has work and is idle
+        if len(shard) == 1 and key not in self._running:
+            self._ready.put_nowait(key)
+
+    async def get(self):
+        """
+        Waits for the next runnable chat and returns (key, item).
+        `task_done(key)` must be called once the item was processed.
+        """
+        key = await self._ready.get()
+        item = self._shards[key].popleft()
+        self._pending -= 1
+        self._running.add(key)
+        return key, item
+
+    def task_done(self, key):
+        self._running.discard(key)
+        shard = self._shards.get(key)
+        if shard:
+            self._ready.put_nowait(key)
+        elif shard is not None:
+            del self._shards[key]
+
+    def qsize(self) -> int:
+        return self._pending
+
+    def metrics(self) -> dict:
+        return {
+            "pending": self._pending,
+            "active_chats": len(self._shards),
+            "running_chats": len(self._running),
+            "max_chat_depth": max((len(s) for s in self._shards.values()), default=0),
+        }
@@ -0,0 +1,141 @@
+import threading
+from collections import Counter, defaultdict
+
+from utils.text import normalize_text
+
+
+def _trigrams(text: str) -> set:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class TitleIndex:
+    """
+    Inverted index of normalized event titles (tokens and trigrams), per calendar.
+
+    `match` returns the events whose normalized title contains the normalized
+    query, the same rule as the old linear scan, but only verifies the
+    events that share every trigram of the query. `suggest` ranks fuzzy
+    matches by trigram and token overlap, for queries with no exact match.
+    """
+
+    def __init__(self):
+        self._titles = defaultdict(dict)
+        self._trigram_counts = defaultdict(dict)
+        self._tokens = defaultdict(lambda: defaultdict(set))
+        self._trigrams = defaultdict(lambda: defaultdict(set))
+        self._lock = threading.Lock()
+
+    def add(self, calendar_id: str, event_id: str, title: str):
+        with self._lock:
+            self._remove(calendar_id, event_id)
+            normalized = normalize_text(title)
+            self._titles[calendar_id][event_id] = normalized
+            self._trigram_counts[calendar_id][event_id] = len(_trigrams(normalized))
+            for token in normalized.split():
+                self._tokens[calendar_id][token].add(event_id)
+            for trigram in _trigrams(normalized):
+                self._trigrams[calendar_id][trigram].add(event_id)
+
+    def remove(self, calendar_id: str, event_id: str):
+        with self._lock:
+            self._remove(calendar_id, event_id)
+
+    def _remove(self, calendar_id, event_id):
+        normalized = self._titles[calendar_id].pop(event_id, None)
+        if normalized is None:
+            return
+        self._trigram_counts[calendar_id].pop(event_id, None)
+        for index, keys in (
+            (self._tokens[calendar_id], normalized.split()),
+            (self._trigrams[calendar_id], _trigrams(normalized)),
+        ):
+            for key in keys:
+                postings = index.get(key)
+                if postings is not None:
+                    postings.discard(event_id)
+                    if not postings:
+                        del index[key]
+
+    def clear(self, calendar_id: str):
+        with self._lock:
+            self._titles.pop(calendar_id, None)
+            self._trigram_counts.pop(calendar_id, None)
+            self._tokens.pop(calendar_id, None)
+            self._trigrams.pop(calendar_id, None)
+
+    def match(self, calendar_id: str, query: str) -> set:
+        """
+        IDs of the events whose title contains `query` (accent/case-insensitive).
+        """
+        normalized = normalize_text(query)
+        with self._lock:
+            titles = self._titles.get(calendar_id, {})
+            return {
+                event_id
+                for event_id in self._candidates(calendar_id, normalized)
+                if normalized in titles[event_id]
+            }
+
+    def _candidates(self, calendar_id, normalized):
+        """
+        The events that may contain `normalized`: those sharing all of its
+        trigrams, or every event for queries too short to have one.
+        """
+        query_trigrams = _trigrams(normalized)
+        if not query_trigrams:
+            return set(self._titles.get(calendar_id, {}))
+        postings = sorted(
+            (
+                self._trigrams[calendar_id].get(trigram, set())
+                for trigram in query_trigrams
+            ),
+            key=len,
+        )
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                break
+        return candidates
+
+    def suggest(
+        self, calendar_id: str, query: str, limit: int = 3, min_score: float = 0.3
+    ) -> list:
+        """
+        Fuzzy matches as (event_id, title, score), best first.
+        """
+        normalized = normalize_text(query)
+        query_trigrams = _trigrams(normalized)
+        query_tokens = set(normalized.split())
+        if not query_trigrams:
+            return []
+        with self._lock:
+            titles = self._titles.get(calendar_id, {})
+            counts = self._trigram_counts.get(calendar_id, {})
+            shared = Counter()
+            for trigram in query_trigrams:
+                shared.update(self._trigrams[calendar_id].get(trigram, ()))
+            token_hits = Counter()
+            for token in query_tokens:
+                token_hits.update(self._tokens[calendar_id].get(token, ()))
+            # The score is at most 0.8 * dice + 0.2 and dice is at most
+            # 2 * shared / (query + shared): skip candidates that cannot reach min_score
+            dice_needed = max(0.0, (min_score - 0.2) / 0.8)
+            needed = dice_needed * len(query_trigrams) / (2 - dice_needed)
+            scored = []
+            for event_id, count in shared.items():
+                if count < needed:
+                    continue
+                # Dice coefficient on trigrams, plus a bonus for whole-word hits
+                score = 2 * count / (len(query_trigrams) + (counts[event_id] or 1))
+                score = 0.8 * score + 0.2 * token_hits[event_id] / max(
+                    1, len(query_tokens)
+                )
+                if score >= min_score:
+                    scored.append((event_id, titles[event_id], round(score, 4)))
+        scored.sort(key=lambda item: item[2], reverse=True)
+        return scored[:limit]
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(titles) for titles in self._titles.values())
@@ -0,0 +1,56 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BlockingExecutor:
+    """
+    Runs blocking calls (LLM, Google Calendar, Evolution API) off the event loop.
+
+    - mode "threaded": calls run on a bounded thread pool and the event loop
+      keeps accepting webhooks while they are in flight.
+    - mode "inline": calls run directly on the event loop (old behaviour,
+      useful for debugging).
+
+    `limit()` bounds how many messages are processed concurrently.
+    """
+
+    def __init__(self, mode="threaded", max_workers=8, max_concurrency=32):
+        if mode not in ("threaded", "inline"):
+            raise ValueError(f"Unknown execution mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self._pool = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="blocking")
+            if mode == "threaded"
+            else None
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Executes `func(*args, **kwargs)` and returns its result.
+        The caller's context variables are propagated to the worker thread.
+        """
+        if self._pool is None:
+            return func(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, func, *args, **kwargs)
+        return await loop.run_in_executor(self._pool, call)
+
+    def limit(self):
+        """
+        Async context manager bounding the number of in-flight messages.
+        """
+        return self._semaphore
+
+    def in_flight(self) -> int:
+        return self.max_concurrency - self._semaphore._value
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -26,6 +26,74 @@ def load_config():
         "AUTHENTICATION_API_KEY": os.getenv("AUTHENTICATION_API_KEY"),
         "INSTANCE_NAME": os.getenv("INSTANCE_NAME", "wpp-tablet"),
         "DEFAULT_CALENDAR_NAME": os.getenv("DEFAULT_CALENDAR_NAME", "wpp-llm"),
+        # Evolution API client: timeouts in seconds, pooled keep-alive
+        # connections and attempts per message on 429/5xx
+        "EVOLUTION_TIMEOUT": os.getenv("EVOLUTION_TIMEOUT", "10"),
+        "EVOLUTION_CONNECT_TIMEOUT": os.getenv("EVOLUTION_CONNECT_TIMEOUT", "5"),
+        "EVOLUTION_MAX_CONNECTIONS": os.getenv("EVOLUTION_MAX_CONNECTIONS", "20"),
+        "EVOLUTION_MAX_ATTEMPTS": os.getenv("EVOLUTION_MAX_ATTEMPTS", "3"),
+        "EVOLUTION_BACKOFF": os.getenv("EVOLUTION_BACKOFF", "0.5"),
+        # Outbound replies: tokens per second and burst per chat and overall
+        "OUTBOUND_RATE_PER_CHAT": os.getenv("OUTBOUND_RATE_PER_CHAT", "1"),
+        "OUTBOUND_BURST_PER_CHAT": os.getenv("OUTBOUND_BURST_PER_CHAT", "3"),
+        "OUTBOUND_GLOBAL_RATE": os.getenv("OUTBOUND_GLOBAL_RATE", "20"),
+        "OUTBOUND_GLOBAL_BURST": os.getenv("OUTBOUND_GLOBAL_BURST", "40"),
+        # "threaded" runs LLM/Calendar/Evolution calls on a thread pool,
+        # "inline" runs them on the event loop.
+        "EXECUTION_MODE": os.getenv("EXECUTION_MODE", "threaded"),
+        "BLOCKING_POOL_SIZE": os.getenv("BLOCKING_POOL_SIZE", "8"),
+        "MAX_CONCURRENT_REQUESTS": os.getenv("MAX_CONCURRENT_REQUESTS", "32"),
+        "PIPELINE_WORKERS": os.getenv("PIPELINE_WORKERS", "4"),
+        "PIPELINE_MAX_QUEUE": os.getenv("PIPELINE_MAX_QUEUE", "1000"),
+        # "memory" processes messages in the web process, "redis" hands them
+        # to worker.py replicas through a durable queue.
+        "QUEUE_BACKEND": os.getenv("QUEUE_BACKEND", "memory"),
+        "REDIS_URL": os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+        "QUEUE_VISIBILITY_TIMEOUT": os.getenv("QUEUE_VISIBILITY_TIMEOUT", "300"),
+        "QUEUE_MAX_ATTEMPTS": os.getenv("QUEUE_MAX_ATTEMPTS", "5"),
+        "DEDUP_BACKEND": os.getenv("DEDUP_BACKEND", "memory"),
+        "DEDUP_TTL": os.getenv("DEDUP_TTL", "3600"),
+        "DEDUP_MAX_SIZE": os.getenv("DEDUP_MAX_SIZE", "10000"),
+        # Resolve formulaic messages locally before calling the LLM
+        "FAST_PATH_ENABLED": os.getenv("FAST_PATH_ENABLED", "true"),
+        "LLM_CACHE_ENABLED": os.getenv("LLM_CACHE_ENABLED", "true"),
+        "LLM_CACHE_BACKEND": os.getenv("LLM_CACHE_BACKEND", "memory"),
+        "LLM_CACHE_TTL": os.getenv("LLM_CACHE_TTL", "3600"),
+        "LLM_CACHE_MAX_SIZE": os.getenv("LLM_CACHE_MAX_SIZE", "1024"),
+        # Simple messages go to the fast model; complex or invalid outputs
+        # escalate to the strong one (empty string disables escalation).
+        "LLM_FAST_MODEL": os.getenv("LLM_FAST_MODEL", "gemini-2.0-flash-lite"),
+        "LLM_STRONG_MODEL": os.getenv("LLM_STRONG_MODEL", "gemini-2.0-flash"),
+        "LLM_TEMPERATURE": os.getenv("LLM_TEMPERATURE", "0.7"),
+        "LLM_TIMEOUT": os.getenv("LLM_TIMEOUT", "30"),
+        # Fire a hedged request past this latency percentile (0 disables)
+        "LLM_HEDGE_PERCENTILE": os.getenv("LLM_HEDGE_PERCENTILE", "0"),
+        # "compact" (per-intent few-shot) or "full" (original prompt), for A/B
+        "PROMPT_MODE": os.getenv("PROMPT_MODE", "compact"),
+        # Stream the LLM output and start calendar lookups before it ends
+        "LLM_STREAMING": os.getenv("LLM_STREAMING", "false"),
+        "LOOKUP_POOL_SIZE": os.getenv("LOOKUP_POOL_SIZE", "8"),
+        # Look up the default calendar while the LLM parses the message
+        "PREFETCH_ENABLED": os.getenv("PREFETCH_ENABLED", "false"),
+        # Seconds between calendarList syncs of the calendar name -> ID cache
+        "CALENDAR_DIRECTORY_TTL": os.getenv("CALENDAR_DIRECTORY_TTL", "300"),
+        # Calendar API requests per second (overall and per WhatsApp user),
+        # bursts, and attempts on rate-limit/5xx errors
+        "GOOGLE_API_RATE": os.getenv("GOOGLE_API_RATE", "10"),
+        "GOOGLE_API_BURST": os.getenv("GOOGLE_API_BURST", "20"),
+        "GOOGLE_API_USER_RATE": os.getenv("GOOGLE_API_USER_RATE", "5"),
+        "GOOGLE_API_USER_BURST": os.getenv("GOOGLE_API_USER_BURST", "10"),
+        "GOOGLE_API_MAX_ATTEMPTS": os.getenv("GOOGLE_API_MAX_ATTEMPTS", "5"),
+        # SQLite mirror of the calendar events (":memory:" or a file path)
+        # and the days before/after now it mirrors
+        "EVENT_MIRROR_ENABLED": os.getenv("EVENT_MIRROR_ENABLED", "true"),
+        "EVENT_MIRROR_PATH": os.getenv("EVENT_MIRROR_PATH", ":memory:"),
+        "EVENT_MIRROR_PAST_DAYS": os.getenv("EVENT_MIRROR_PAST_DAYS", "30"),
+        "EVENT_MIRROR_FUTURE_DAYS": os.getenv("EVENT_MIRROR_FUTURE_DAYS", "400"),
+        # Listings are split into messages of at most this many characters;
+        # "mais" resumes a listing within the cursor TTL (seconds)
+        "AGENDA_CHUNK_CHARS": os.getenv("AGENDA_CHUNK_CHARS", "3000"),
+        "AGENDA_CURSOR_TTL": os.getenv("AGENDA_CURSOR_TTL", "600"),
     }
     # Check required vars
     missing = [k for k, v in config.items() if v is None]
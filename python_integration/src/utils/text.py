@@ -0,0 +1,16 @@
+import unicodedata
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normaliza o texto removendo acentos e convertendo para minúsculas.
+    """
+    # Se o texto não for uma string, retorne uma string vazia para evitar erros
+    if not isinstance(text, str):
+        return ""
+
+    # Normaliza a string para a forma NFKD, que separa os caracteres de seus acentos
+    normalized = unicodedata.normalize("NFKD", text)
+
+    # Filtra e decodifica a string para remover os acentos
+    return "".join([c for c in normalized if not unicodedata.combining(c)]).lower()
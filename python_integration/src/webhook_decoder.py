@@ -0,0 +1,91 @@
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    import json
+
+    _loads = json.loads
+
+
+# Evolution sends the event name as "messages.upsert" (or "MESSAGES_UPSERT")
+ACCEPTED_EVENTS = frozenset({"messages.upsert"})
+
+# Raw-bytes checks run before the payload is parsed. Quotes inside JSON
+# strings are escaped, so these cannot match inside a message text.
+_EVENT_RE = re.compile(rb'"event"\s*:\s*"([^"]*)"')
+_FROM_ME_RE = re.compile(rb'"fromMe"\s*:\s*true')
+
+
+@dataclass(frozen=True)
+class IncomingMessage:
+    """A text message received from WhatsApp that should be processed."""
+
+    message_id: Optional[str]
+    remote_jid: str
+    text: str
+    event: str
+
+
+class WebhookDecoder:
+    """
+    Fast-path decoder for Evolution API webhooks.
+
+    Irrelevant traffic (presence, status updates, messages sent by the bot
+    itself) is rejected from the raw bytes before any JSON parsing. Only
+    the remaining payloads are parsed, with orjson when available.
+    """
+
+    def __init__(self, accepted_events=ACCEPTED_EVENTS):
+        self.accepted_events = frozenset(accepted_events)
+        self.counters = {
+            "accepted": 0,
+            "ignored_event": 0,
+            "from_me": 0,
+            "no_text": 0,
+            "invalid": 0,
+        }
+
+    def decode(self, body: bytes) -> Optional[IncomingMessage]:
+        """
+        Returns the message carried by `body`, or None if it should be ignored.
+        """
+        match = _EVENT_RE.search(body)
+        event = match.group(1).decode().lower().replace("_", ".") if match else ""
+        if event not in self.accepted_events:
+            self.counters["ignored_event"] += 1
+            return None
+        if _FROM_ME_RE.search(body):
+            self.counters["from_me"] += 1
+            return None
+
+        try:
+            data = _loads(body)["data"]
+            key = data["key"]
+            remote_jid = key["remoteJid"]
+            message = data.get("message") or {}
+        except (ValueError, KeyError, TypeError):
+            self.counters["invalid"] += 1
+            return None
+
+        text = message.get("conversation") or (
+            message.get("extendedTextMessage") or {}
+        ).get("text")
+        if not remote_jid or not text:
+            self.counters["no_text"] += 1
+            return None
+
+        self.counters["accepted"] += 1
+        return IncomingMessage(
+            message_id=key.get("id"),
+            remote_jid=remote_jid,
+            text=text,
+            event=event,
+        )
+
+    def metrics(self) -> dict:
+        return dict(self.counters)
@@ -0,0 +1,97 @@
+"""
+Worker entry point for QUEUE_BACKEND=redis.
+
+Consumes jobs from the durable queue filled by the webhook in main.py and
+runs them through the same parse -> execute -> reply pipeline. Start as many
+replicas as needed:
+
+    QUEUE_BACKEND=redis python python_integration/src/worker.py
+
+Within a replica, messages of the same chat keep their order (ChatScheduler);
+jobs of one chat may still be picked up by different replicas.
+"""
+
+import asyncio
+from typing import Optional
+
+
+async def _heartbeat(job_queue, executor, job_id: str, interval: float):
+    # Keeps the lease of a running job alive so it is not redelivered to
+    # another worker while this one is still on it.
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await executor.run(job_queue.touch, job_id)
+        except Exception as e:
+            print(f"Failed to extend lease of job {job_id}: {e}")
+
+
+async def run_worker(
+    job_queue,
+    pipeline,
+    executor,
+    reserve_timeout: float = 1.0,
+    heartbeat_interval: Optional[float] = None,
+):
+    """
+    Feeds reserved jobs into `pipeline`, acking them on success and
+    scheduling a retry on failure. Works with any queue exposing
+    reserve/ack/nack/touch (RedisJobQueue or InMemoryJobQueue).
+
+    While a job is leased its visibility timeout is renewed every
+    `heartbeat_interval` seconds (a third of the timeout by default).
+    """
+    if heartbeat_interval is None:
+        heartbeat_interval = job_queue.visibility_timeout / 3
+
+    # Never lease more jobs than the pipeline can work on, so leases do not
+    # expire while jobs wait in the local queue.
+    capacity = asyncio.Semaphore(pipeline.workers * 2)
+
+    while True:
+        await capacity.acquire()
+        reserved = await executor.run(job_queue.reserve, reserve_timeout)
+        if reserved is None:
+            capacity.release()
+            continue
+
+        job_id, payload = reserved
+        heartbeat = asyncio.create_task(
+            _heartbeat(job_queue, executor, job_id, heartbeat_interval)
+        )
+
+        async def on_done(job, error, job_id=job_id, heartbeat=heartbeat):
+            heartbeat.cancel()
+            try:
+                if error is None:
+                    await executor.run(job_queue.ack, job_id)
+                else:
+                    await executor.run(job_queue.nack, job_id)
+            finally:
+                capacity.release()
+
+        if not pipeline.submit(payload, on_done=on_done):
+            heartbeat.cancel()
+            await executor.run(job_queue.nack, job_id)
+            capacity.release()
+
+
+async def serve():
+    import main
+
+    if main.job_queue is None:
+        raise SystemExit("O worker requer QUEUE_BACKEND=redis.")
+
+    await main.pipeline.start()
+    print("Worker aguardando mensagens na fila...")
+    try:
+        await run_worker(main.job_queue, main.pipeline, main.executor)
+    finally:
+        await main.pipeline.stop()
+        await main.dispatcher.stop()
+        main.executor.shutdown()
+        main.evo.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
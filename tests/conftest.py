@@ -0,0 +1,13 @@
+import os
+import sys
+
+# utils.config.load_config fails without these; no test talks to the services
+for name in ("LLM_API_KEY", "MY_NUMBER", "AUTHENTICATION_API_KEY"):
+    os.environ.setdefault(name, "test")
+
+# The service modules import each other by bare name (e.g. `from utils.text
+# import ...`), as they do when run from python_integration/src
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "python_integration", "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
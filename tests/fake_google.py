@@ -0,0 +1,152 @@
+"""
+Local stand-in for the Calendar API batch endpoint (multipart/mixed).
+"""
+
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httplib2
+from googleapiclient.discovery import build
+from googleapiclient.http import BatchHttpRequest
+
+from google_api.google_api import CalendarDirectory, GoogleCalendar, RequestExecutor
+
+_PART_RE = re.compile(
+    r"Content-ID: <(?P<cid>.+?)>.*?(?P<method>[A-Z]+) (?P<path>/\S+)", re.DOTALL
+)
+
+
+class FakeCalendarServer:
+    """
+    Answers batched event calls. `statuses[event_id]` lists the statuses to
+    return on successive calls for that event (the last one repeats);
+    events not listed succeed. `batch_statuses` fails whole batch requests
+    in turn before they are read. `batches` keeps the event IDs of each
+    batch and `posts` counts the batch requests received. Single PATCH
+    calls are answered with their body and kept in `patches`.
+    """
+
+    def __init__(self, statuses=None, error_body=None, batch_statuses=()):
+        self.statuses = {key: list(value) for key, value in (statuses or {}).items()}
+        self.batch_statuses = list(batch_statuses)
+        self.posts = 0
+        self.patches = []
+        self._lock = threading.Lock()
+        self.error_body = error_body or (
+            lambda status: {"error": {"code": status, "message": "fake"}}
+        )
+        self.batches = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+                with server._lock:
+                    server.posts += 1
+                    status = (
+                        server.batch_statuses.pop(0) if server.batch_statuses else None
+                    )
+                if status is not None:
+                    payload = json.dumps(server.error_body(status)).encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                with server._lock:
+                    payload = server.handle_batch(self.headers, body)
+                self.send_multipart(payload)
+
+            def do_PATCH(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server._lock:
+                    server.patches.append((self.path, body))
+                payload = json.dumps(
+                    dict(body, id=self.path.split("?")[0].split("/")[-1])
+                )
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload.encode())
+
+            def send_multipart(self, payload):
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/mixed; boundary=BB")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload.encode())
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_port}"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def _status(self, event_id):
+        queued = self.statuses.get(event_id)
+        if not queued:
+            return 200
+        return queued.pop(0) if len(queued) > 1 else queued[0]
+
+    def handle_batch(self, headers, body):
+        boundary = re.search(r'boundary="?([^";]+)', headers["Content-Type"]).group(1)
+        parts = [part for part in body.split("--" + boundary) if "Content-ID" in part]
+        responses = []
+        event_ids = []
+        for part in parts:
+            match = _PART_RE.search(part)
+            event_id = match.group("path").split("?")[0].rstrip("/").split("/")[-1]
+            event_ids.append(event_id)
+            status = self._status(event_id)
+            if status < 300:
+                payload = (
+                    json.dumps({"id": event_id})
+                    if match.group("method") != "DELETE"
+                    else ""
+                )
+            else:
+                payload = json.dumps(self.error_body(status))
+            responses.append(
+                "--BB\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{match.group('cid')}>\r\n\r\n"
+                f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n\r\n{payload}\r\n"
+            )
+        self.batches.append(event_ids)
+        return "".join(responses) + "--BB--\r\n"
+
+    def calendar(self, **executor_options):
+        """
+        A GoogleCalendar wired to this server, without OAuth.
+        """
+        service = build(
+            "calendar",
+            "v3",
+            http=httplib2.Http(),
+            static_discovery=True,
+            client_options={"api_endpoint": f"{self.url}/calendar/v3/"},
+        )
+        batch_uri = f"{self.url}/batch/calendar/v3"
+        service.new_batch_http_request = lambda callback=None: BatchHttpRequest(
+            callback=callback, batch_uri=batch_uri
+        )
+        client = GoogleCalendar.__new__(GoogleCalendar)
+        client.service = service
+        # No throttling unless a test asks for it; one Http per thread, as
+        # GoogleCalendar sets up with its credentials
+        options = dict(
+            rate=1000, burst=1000, backoff_base=0, http_factory=httplib2.Http
+        )
+        options.update(executor_options)
+        client.requests = RequestExecutor(**options)
+        client.directory = CalendarDirectory(service, requests=client.requests)
+        return client
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
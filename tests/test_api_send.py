@@ -0,0 +1,39 @@
+import httpx
+import pytest
+from api_send import EvolutionAPI
+
+
+def client(statuses):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        status = statuses[min(len(calls), len(statuses)) - 1]
+        return httpx.Response(status, json={"status": status})
+
+    api = EvolutionAPI(
+        max_attempts=3, backoff=0, transport=httpx.MockTransport(handler)
+    )
+    return api, calls
+
+
+def test_retries_server_errors_then_returns_the_body():
+    api, calls = client([503, 201])
+    try:
+        assert api.send_message("5511999999999", "oi") == {"status": 201}
+    finally:
+        api.close()
+    assert len(calls) == 2
+    assert api.metrics()["failures"] == 0
+
+
+@pytest.mark.parametrize("statuses, attempts", [([503], 3), ([400], 1)])
+def test_error_status_after_the_retries_is_raised(statuses, attempts):
+    api, calls = client(statuses)
+    try:
+        with pytest.raises(httpx.HTTPStatusError):
+            api.send_message("5511999999999", "oi")
+    finally:
+        api.close()
+    assert len(calls) == attempts
+    assert api.metrics()["failures"] == 1
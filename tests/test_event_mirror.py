@@ -0,0 +1,175 @@
+import datetime
+import threading
+
+import httplib2
+from event_mirror import EventMirror
+from googleapiclient.errors import HttpError
+from lookups import CalendarLookups
+
+
+def event(event_id, summary, days_ahead=1, status="confirmed"):
+    start = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        days=days_ahead
+    )
+    return {
+        "id": event_id,
+        "status": status,
+        "summary": summary,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": (start + datetime.timedelta(hours=1)).isoformat()},
+    }
+
+
+class FakeEvents:
+    def __init__(self, client):
+        self.client = client
+
+    def list(self, **kwargs):
+        return kwargs
+
+
+class FakeCalendarClient:
+    """
+    `service.events().list(...)` returns its arguments and `execute` answers
+    them: the full `listing`, or the `changes` queued for a sync token.
+    """
+
+    def __init__(self, events=()):
+        self.listing = list(events)
+        self.changes = []
+        self.requests = []
+        self.fallbacks = []
+        self.api_events = []
+        self.sync_errors = []
+        self.gate = {}
+        self.waiting = threading.Event()
+        self.service = self
+
+    def events(self):
+        return FakeEvents(self)
+
+    def execute(self, request):
+        self.requests.append(request)
+        gate = self.gate.get(request["calendarId"])
+        if gate is not None:
+            self.waiting.set()
+            gate.wait(5)
+        if "syncToken" in request:
+            if self.sync_errors:
+                raise self.sync_errors.pop(0)
+            items, self.changes = self.changes, []
+        else:
+            items = self.listing
+        return {"items": items, "nextSyncToken": f"token-{len(self.requests)}"}
+
+    def get_all_events(self, *args):
+        self.fallbacks.append(("get_all_events", args))
+        return list(self.api_events)
+
+    def iter_events(self, *args):
+        self.fallbacks.append(("iter_events", args))
+        return iter([])
+
+    def search_events(self, *args):
+        self.fallbacks.append(("search_events", args))
+        return []
+
+
+def titles(events):
+    return [e["summary"] for e in events]
+
+
+def test_first_sync_is_bounded_and_later_ones_use_the_sync_token():
+    client = FakeCalendarClient([event("1", "Dentista")])
+    mirror = EventMirror(client, past_days=10, future_days=100)
+
+    assert titles(mirror.get_all_events("cal")) == ["Dentista"]
+    client.changes = [event("2", "Reunião", 2), event("1", "", status="cancelled")]
+    assert titles(mirror.get_all_events("cal")) == ["Reunião"]
+
+    full, incremental = client.requests
+    now = datetime.datetime.now(datetime.timezone.utc)
+    time_min = datetime.datetime.fromisoformat(full["timeMin"])
+    time_max = datetime.datetime.fromisoformat(full["timeMax"])
+    assert abs((now - time_min).days - 10) <= 1
+    assert abs((time_max - now).days - 100) <= 1
+    assert incremental["syncToken"] == "token-1"
+    assert "timeMin" not in incremental and "timeMax" not in incremental
+
+
+def test_every_read_pulls_the_changes_made_elsewhere():
+    client = FakeCalendarClient([event("1", "Dentista"), event("2", "Academia")])
+    mirror = EventMirror(client)
+
+    assert titles(mirror.get_all_events("cal")) == ["Dentista", "Academia"]
+    # Deleted outside the bot right before a "delete all"
+    client.changes = [event("2", "", status="cancelled")]
+
+    assert titles(mirror.iter_events("cal", fields="id,summary")) == ["Dentista"]
+    assert mirror.get_all_events("cal", summary="academia") == []
+    assert len(client.requests) == 3
+    assert mirror.metrics()["incremental_syncs"] == 2
+
+
+def test_expired_sync_token_resyncs_everything():
+    client = FakeCalendarClient([event("1", "Dentista")])
+    mirror = EventMirror(client)
+    mirror.get_all_events("cal")
+
+    client.sync_errors = [HttpError(httplib2.Response({"status": 410}), b"")]
+    client.listing = [event("2", "Academia")]
+
+    assert titles(mirror.get_all_events("cal")) == ["Academia"]
+    assert mirror.metrics()["full_syncs"] == 2
+
+
+def test_windows_outside_the_mirror_and_searches_go_to_the_api():
+    client = FakeCalendarClient([event("1", "Dentista")])
+    mirror = EventMirror(client, future_days=60)
+    far = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=90)
+
+    assert mirror.get_all_events("cal", end_date=far.isoformat()) == []
+    mirror.search_events("cal", "dentista")
+    list(mirror.iter_events("cal", q="dentista", fields="id,summary"))
+
+    assert [name for name, _ in client.fallbacks] == [
+        "get_all_events",
+        "search_events",
+        "iter_events",
+    ]
+    assert client.fallbacks[2][1][3:5] == ("dentista", "id,summary")
+    assert titles(mirror.iter_events("cal")) == ["Dentista"]
+
+
+def test_slow_sync_does_not_block_other_calendars():
+    client = FakeCalendarClient([event("1", "Dentista")])
+    mirror = EventMirror(client)
+    client.gate["slow"] = threading.Event()
+
+    slow = threading.Thread(target=mirror.get_all_events, args=("slow",))
+    slow.start()
+    try:
+        assert client.waiting.wait(5)
+        assert titles(mirror.get_all_events("fast")) == ["Dentista"]
+        assert mirror.metrics()["calendars"] == 1
+    finally:
+        client.gate["slow"].set()
+        slow.join(5)
+    assert mirror.metrics()["calendars"] == 2
+
+
+def test_lookups_do_not_trust_the_index_after_a_fallback():
+    client = FakeCalendarClient([event("1", "Dentista")])
+    client.get_calendar_id_by_name = lambda name: "cal"
+    mirror = EventMirror(client)
+    mirror.get_all_events("cal")
+    assert mirror.match_titles("cal", "dentista") == {"1"}
+
+    # The sync fails, so the events come from the API with a newer title
+    client.sync_errors = [HttpError(httplib2.Response({"status": 500}), b"")]
+    client.api_events = [event("1", "Academia")]
+    lookups = CalendarLookups(client, event_source=mirror)
+    lookups.start_upcoming_events("Primary")
+
+    assert titles(lookups.matching_events("Primary", "academia")) == ["Academia"]
+    assert mirror.match_titles("cal", "dentista") is None
@@ -0,0 +1,58 @@
+import datetime
+
+import pytest
+
+from llm_integration.fast_parser import FastIntentParser
+
+NOW = datetime.datetime(2026, 10, 14, 9, 0)
+
+
+@pytest.fixture
+def parser():
+    return FastIntentParser("Primary")
+
+
+@pytest.mark.parametrize(
+    "message, name",
+    [
+        ("crie um calendário para viagens", "viagens"),
+        ("crie um calendário de Trabalho", "Trabalho"),
+        ("criar calendário chamado Família", "Família"),
+        ("crie um novo calendário com o nome de Estudos", "Estudos"),
+    ],
+)
+def test_create_calendar_strips_the_preposition(parser, message, name):
+    assert parser.parse(message, NOW) == {
+        "action": "create",
+        "target": "calendar",
+        "calendar_name": name,
+    }
+
+
+@pytest.mark.parametrize(
+    "message, summary, offset",
+    [
+        ("adie a Reunião em uma semana", "Reunião", "+1 week"),
+        ("adie o evento dentista em 2 dias", "dentista", "+2 days"),
+        ("antecipe a entrega em três dias", "entrega", "-3 days"),
+    ],
+)
+def test_shift_single_event(parser, message, summary, offset):
+    action = parser.parse(message, NOW)
+
+    assert action["event_summary_or_id"] == summary
+    assert action["update_data"] == {"start_date_offset": offset}
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "adie todos os eventos em uma semana",
+        "adie os eventos em 2 dias",
+        "adie todas as reuniões em uma semana",
+        "adie tudo em um mês",
+        "antecipe cada aula em um dia",
+    ],
+)
+def test_shift_of_several_events_falls_back_to_the_llm(parser, message):
+    assert parser.parse(message, NOW) is None
@@ -0,0 +1,235 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httplib2
+import pytest
+from fake_google import FakeCalendarServer
+from googleapiclient.errors import HttpError
+
+from google_api.google_api import calendar_user
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(**kwargs):
+        servers.append(FakeCalendarServer(**kwargs))
+        return servers[-1]
+
+    yield start
+    for fake in servers:
+        fake.close()
+
+
+def test_delete_events_splits_into_batches_of_50(server):
+    fake = server()
+    client = fake.calendar()
+    event_ids = [f"e{i}" for i in range(120)]
+
+    result = client.delete_events("cal", event_ids)
+
+    assert [len(batch) for batch in fake.batches] == [50, 50, 20]
+    assert sorted(result["succeeded"]) == sorted(event_ids)
+    assert result["failed"] == {}
+    assert result["attempts"] == 1
+
+
+def test_delete_events_treats_404_and_410_as_deleted(server):
+    fake = server(statuses={"e1": [404], "e2": [410], "e3": [400]})
+    client = fake.calendar()
+
+    result = client.delete_events("cal", ["e1", "e2", "e3", "e4"])
+
+    assert set(result["succeeded"]) == {"e1", "e2", "e4"}
+    assert list(result["failed"]) == ["e3"]
+    # Neither "already gone" nor a 400 is retried
+    assert fake.batches == [["e1", "e2", "e3", "e4"]]
+
+
+def test_execute_batch_retries_only_the_retryable_items(server):
+    fake = server(statuses={"e1": [429, 200], "e2": [503, 503, 200], "e3": [400]})
+    client = fake.calendar()
+
+    result = client.delete_events("cal", ["e1", "e2", "e3", "e4"], max_attempts=3)
+
+    assert fake.batches == [["e1", "e2", "e3", "e4"], ["e1", "e2"], ["e2"]]
+    assert set(result["succeeded"]) == {"e1", "e2", "e4"}
+    assert list(result["failed"]) == ["e3"]
+    assert result["attempts"] == 3
+
+
+def test_execute_batch_gives_up_after_max_attempts(server):
+    fake = server(statuses={"e1": [503]})
+    client = fake.calendar()
+
+    result = client.delete_events("cal", ["e1", "e2"], max_attempts=2)
+
+    assert fake.batches == [["e1", "e2"], ["e1"]]
+    assert list(result["failed"]) == ["e1"]
+    assert result["attempts"] == 2
+
+
+def test_failed_batch_is_retried_by_execute_batch_only(server):
+    fake = server(batch_statuses=[503, 503])
+    client = fake.calendar(max_attempts=5)
+
+    result = client.delete_events("cal", ["e1", "e2"], max_attempts=3)
+
+    # Three attempts in total, not three times the executor's five
+    assert fake.posts == 3
+    assert set(result["succeeded"]) == {"e1", "e2"}
+    assert result["attempts"] == 3
+
+
+def rate_limited_body(errors_reason, info_reason=None):
+    error = {
+        "code": 403,
+        "message": "Rate Limit Exceeded",
+        "errors": [{"domain": "usageLimits", "reason": errors_reason}],
+    }
+    if info_reason:
+        error["details"] = [
+            {
+                "@type": "type.googleapis.com/google.rpc.ErrorInfo",
+                "reason": info_reason,
+                "domain": "googleapis.com",
+            }
+        ]
+    return {"error": error}
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        rate_limited_body("rateLimitExceeded"),
+        rate_limited_body("rateLimitExceeded", "RATE_LIMIT_EXCEEDED"),
+        rate_limited_body("userRateLimitExceeded", "OTHER_REASON"),
+    ],
+)
+def test_403_rate_limit_is_retried_in_both_payload_shapes(server, body):
+    fake = server(statuses={"e1": [403, 200]}, error_body=lambda status: body)
+    client = fake.calendar()
+
+    result = client.delete_events("cal", ["e1"])
+
+    assert fake.batches == [["e1"], ["e1"]]
+    assert set(result["succeeded"]) == {"e1"}
+
+
+def test_other_403_is_not_retried(server):
+    body = rate_limited_body("forbidden", "ACCESS_DENIED")
+    fake = server(statuses={"e1": [403, 200]}, error_body=lambda status: body)
+    client = fake.calendar()
+
+    result = client.delete_events("cal", ["e1"])
+
+    assert fake.batches == [["e1"]]
+    assert list(result["failed"]) == ["e1"]
+
+
+def test_concurrent_calls_use_one_http_per_thread(server):
+    fake = server()
+    client = fake.calendar()
+    used = []
+    factory = client.requests.http_factory
+
+    def http_factory():
+        used.append(threading.get_ident())
+        return factory()
+
+    client.requests.http_factory = http_factory
+    event_ids = [[f"t{thread}-{i}" for i in range(60)] for thread in range(8)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(
+            pool.map(lambda ids: client.delete_events("cal", ids), event_ids)
+        )
+
+    for ids, result in zip(event_ids, results):
+        assert sorted(result["succeeded"]) == sorted(ids)
+        assert result["failed"] == {}
+    assert len(fake.batches) == 16
+    # Created once per worker thread, never shared between two of them
+    assert len(used) == len(set(used)) >= 2
+
+
+def test_insert_events_does_not_retry_server_errors(server):
+    fake = server(statuses={"events": [503, 200]})
+    client = fake.calendar()
+
+    result = client.insert_events("cal", {"a": {"summary": "A"}})
+
+    assert fake.batches == [["events"]]
+    assert list(result["failed"]) == ["a"]
+
+
+@pytest.mark.parametrize("status, posts", [(503, 1), (429, 2)])
+def test_failed_insert_batch_is_resent_only_on_rate_limit(server, status, posts):
+    fake = server(batch_statuses=[status])
+    client = fake.calendar()
+
+    result = client.insert_events("cal", {"a": {"summary": "A"}})
+
+    assert fake.posts == posts
+    assert bool(result["succeeded"]) == (status == 429)
+
+
+def test_batches_fit_the_user_bucket(server):
+    fake = server()
+    client = fake.calendar(user_rate=1000, user_burst=10)
+    token = calendar_user.set("5511999999999")
+    try:
+        result = client.delete_events("cal", [f"e{i}" for i in range(25)])
+    finally:
+        calendar_user.reset(token)
+
+    assert [len(batch) for batch in fake.batches] == [10, 10, 5]
+    assert len(result["succeeded"]) == 25
+
+
+def test_update_event_sends_one_patch(server):
+    fake = server()
+    client = fake.calendar()
+
+    updated = client.update_event(
+        "cal",
+        "e1",
+        {
+            "summary": "Plantão",
+            "start_date": "2026-10-14",
+            "start_time": "22:00:00",
+            "end_date": "2026-10-14",
+            "end_time": "02:00:00",
+            "recurrence_details": {"rule": "weekly", "count": 3},
+        },
+    )
+
+    ((path, body),) = fake.patches
+    assert path.startswith("/calendar/v3/calendars/cal/events/e1")
+    assert body == {
+        "summary": "Plantão",
+        "start": {"dateTime": "2026-10-14T22:00:00-03:00"},
+        "end": {"dateTime": "2026-10-15T02:00:00-03:00"},
+        "recurrence": ["RRULE:FREQ=WEEKLY;COUNT=3"],
+    }
+    assert updated["id"] == "e1"
+    assert fake.posts == 0
+
+
+def test_only_calendar_scoped_404s_invalidate_the_directory(server, monkeypatch):
+    client = server().calendar()
+    invalidated = []
+    monkeypatch.setattr(client.directory, "invalidate", invalidated.append)
+
+    def not_found(request, **kwargs):
+        raise HttpError(httplib2.Response({"status": 404}), b"")
+
+    monkeypatch.setattr(client, "execute", not_found)
+
+    assert client.delete_event("cal", "gone") is False
+    assert client.patch_event("cal", "gone", {"summary": "x"}) is None
+    assert invalidated == []
+
+    assert client.get_all_events("cal") is None
+    assert invalidated == ["cal"]
@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import pytest
+from job_queue import InMemoryJobQueue, RedisJobQueue
+
+
+@pytest.fixture(params=["memory", "redis"])
+def make_queue(request):
+    def make(**kwargs):
+        options = dict(visibility_timeout=0.2, max_attempts=2, backoff_base=0)
+        options.update(kwargs)
+        if request.param == "memory":
+            return InMemoryJobQueue(**options)
+        fakeredis = pytest.importorskip("fakeredis")
+        client = fakeredis.FakeRedis(decode_responses=True)
+        return RedisJobQueue(client, poll_interval=0.01, **options)
+
+    return make
+
+
+def test_acked_job_is_not_delivered_again(make_queue):
+    queue = make_queue()
+    queue.enqueue({"n": 1})
+
+    job_id, payload = queue.reserve(timeout=0.1)
+    queue.ack(job_id)
+
+    assert payload == {"n": 1}
+    assert queue.reserve(timeout=0.3) is None
+
+
+def test_job_is_redelivered_after_visibility_timeout(make_queue):
+    queue = make_queue()
+    queue.enqueue({"n": 1})
+
+    first = queue.reserve(timeout=0.1)
+    # Leased: invisible to other consumers until the lease expires
+    assert queue.reserve(timeout=0.05) is None
+    time.sleep(0.25)
+    second = queue.reserve(timeout=0.1)
+
+    assert second == first
+    assert queue.metrics()["inflight"] == 1
+
+
+def test_nacked_job_is_retried_then_buried(make_queue):
+    queue = make_queue(max_attempts=2)
+    queue.enqueue({"n": 1})
+
+    job_id, _ = queue.reserve(timeout=0.1)
+    queue.nack(job_id)
+    retried = queue.reserve(timeout=0.2)
+    assert retried is not None and retried[0] == job_id
+    queue.nack(job_id)
+
+    assert queue.reserve(timeout=0.1) is None
+    metrics = queue.metrics()
+    assert metrics["dead"] == 1
+    assert metrics["ready"] == metrics["inflight"] == metrics["delayed"] == 0
+
+
+def test_expired_leases_count_as_attempts(make_queue):
+    queue = make_queue(max_attempts=2)
+    queue.enqueue({"n": 1})
+
+    # Two consumers crash without acking: the third delivery is buried
+    assert queue.reserve(timeout=0.1) is not None
+    time.sleep(0.25)
+    assert queue.reserve(timeout=0.1) is not None
+    time.sleep(0.25)
+
+    assert queue.reserve(timeout=0.1) is None
+    assert queue.metrics()["dead"] == 1
+
+
+class _ThreadExecutor:
+    async def run(self, fn, *args):
+        return await asyncio.to_thread(fn, *args)
+
+
+class _SlowPipeline:
+    workers = 1
+
+    def __init__(self, duration):
+        self.duration = duration
+        self.done = asyncio.Event()
+        self.submitted = 0
+
+    def submit(self, payload, on_done=None):
+        self.submitted += 1
+
+        async def run():
+            await asyncio.sleep(self.duration)
+            await on_done(payload, None)
+            self.done.set()
+
+        asyncio.get_running_loop().create_task(run())
+        return True
+
+
+def test_worker_keeps_the_lease_of_a_long_job(make_queue):
+    worker = pytest.importorskip("worker")
+    queue = make_queue()
+    queue.enqueue({"n": 1})
+    pipeline = _SlowPipeline(duration=0.6)
+
+    async def scenario():
+        task = asyncio.create_task(
+            worker.run_worker(queue, pipeline, _ThreadExecutor(), reserve_timeout=0.05)
+        )
+        await asyncio.wait_for(pipeline.done.wait(), timeout=5)
+        await asyncio.sleep(0.3)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert pipeline.submitted == 1
+    assert queue.reserve(timeout=0.3) is None
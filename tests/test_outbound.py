@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+from outbound import OutboundDispatcher
+
+
+def make_dispatcher(send, **kwargs):
+    options = dict(
+        per_recipient_rate=100,
+        global_rate=100,
+        max_chars=10,
+    )
+    options.update(kwargs)
+    return OutboundDispatcher(send, **options)
+
+
+def test_merges_replies_up_to_max_chars():
+    sent = []
+
+    async def send(number, text):
+        sent.append((number, text))
+        return {"text": text}
+
+    async def run():
+        dispatcher = make_dispatcher(send)
+        futures = [
+            dispatcher.submit("a", text) for text in ("aaaa", "bbbb", "c" * 12, "dd")
+        ]
+        results = await asyncio.gather(*futures)
+        await dispatcher.stop()
+        return results, dispatcher.metrics()
+
+    results, metrics = asyncio.run(run())
+
+    assert sent == [("a", "aaaa\n\nbbbb"), ("a", "c" * 12), ("a", "dd")]
+    assert results[0] == results[1] == {"text": "aaaa\n\nbbbb"}
+    assert metrics["coalesced"] == 1
+    assert metrics["sent"] == 3
+
+
+def test_send_error_reaches_the_caller():
+    async def send(number, text):
+        raise RuntimeError("evolution down")
+
+    async def run():
+        dispatcher = make_dispatcher(send)
+        try:
+            await dispatcher.submit("a", "oi")
+        finally:
+            await dispatcher.stop()
+        return dispatcher
+
+    with pytest.raises(RuntimeError, match="evolution down"):
+        asyncio.run(run())
+
+
+def test_recipients_are_sent_separately():
+    sent = []
+
+    async def send(number, text):
+        sent.append((number, text))
+
+    async def run():
+        dispatcher = make_dispatcher(send)
+        await asyncio.gather(dispatcher.submit("a", "1"), dispatcher.submit("b", "2"))
+        await dispatcher.stop()
+
+    asyncio.run(run())
+
+    assert sorted(sent) == [("a", "1"), ("b", "2")]
+
+
+def test_lone_reply_is_sent_without_waiting():
+    sent = []
+
+    async def send(number, text):
+        sent.append(text)
+
+    async def run():
+        dispatcher = make_dispatcher(send)
+        dispatcher.submit("a", "oi")
+        # No timer in the way: the drainer sends on its first turns of the loop
+        for _ in range(3):
+            await asyncio.sleep(0)
+        await dispatcher.stop()
+
+    asyncio.run(run())
+
+    assert sent == ["oi"]
+
+
+def test_replies_queued_during_a_send_are_merged():
+    sent = []
+    release = None
+
+    async def send(number, text):
+        sent.append(text)
+        if len(sent) == 1:
+            await release.wait()
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        dispatcher = make_dispatcher(send)
+        first = dispatcher.submit("a", "1")
+        await asyncio.sleep(0.01)
+        rest = [dispatcher.submit("a", "2"), dispatcher.submit("a", "3")]
+        release.set()
+        await asyncio.gather(first, *rest)
+        await dispatcher.stop()
+        return dispatcher.metrics()
+
+    metrics = asyncio.run(run())
+
+    assert sent == ["1", "2\n\n3"]
+    assert metrics["coalesced"] == 1
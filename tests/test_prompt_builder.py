@@ -0,0 +1,37 @@
+import pytest
+
+from llm_integration.prompt_builder import PromptBuilder, classify_intents
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "reunião toda segunda às 10h",
+        "academia todo dia às 7h",
+        "aula de inglês todas as quartas",
+        "remédio cada 8 horas",
+    ],
+)
+def test_recurring_messages_are_classified(message):
+    assert "recurring" in classify_intents(message)
+
+
+def test_single_event_is_not_recurring():
+    assert "recurring" not in classify_intents("marque dentista amanhã às 15h")
+
+
+def test_compact_prompt_has_recurrence_rules_only_when_recurring():
+    builder = PromptBuilder(None, "Primary")
+
+    recurring = builder.build("academia todo dia às 7h", "2026-10-14").to_string()
+    single = builder.build("marque dentista amanhã às 15h", "2026-10-14").to_string()
+
+    assert "recurrence_details" in recurring
+    assert "recurrence_details" not in single
+
+
+def test_full_prompt_asks_for_dry_run(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    chatbot = pytest.importorskip("llm_integration.chatbot")
+
+    assert "dry_run" in chatbot.PROMPT_TEMPLATE
@@ -0,0 +1,41 @@
+import pytest
+from dateutil.relativedelta import relativedelta
+from reschedule import parse_offset, plan_reschedule
+
+
+@pytest.mark.parametrize(
+    "offset, expected",
+    [
+        ("+7 days", relativedelta(days=7)),
+        ("-2 weeks", relativedelta(weeks=-2)),
+        ("+1 Month", relativedelta(months=1)),
+        ("+3 hours", relativedelta(hours=3)),
+        ("+2 days later", relativedelta(days=2)),
+        ("2 semanas depois", relativedelta(weeks=2)),
+        ("+1 mês", relativedelta(months=1)),
+        ("3 meses", relativedelta(months=3)),
+        ("1 dia antes", relativedelta(days=-1)),
+        ("+2 anos", relativedelta(years=2)),
+    ],
+)
+def test_parse_offset(offset, expected):
+    assert parse_offset(offset) == expected
+
+
+@pytest.mark.parametrize("offset", [None, "", "amanhã", "+2 fortnights", "+2 diarias"])
+def test_parse_offset_rejects_unknown_offsets(offset):
+    assert parse_offset(offset) is None
+
+
+def test_plan_reschedule_applies_a_trailing_text_offset():
+    event = {
+        "id": "1",
+        "summary": "Dentista",
+        "start": {"dateTime": "2026-10-14T10:00:00-03:00"},
+        "end": {"dateTime": "2026-10-14T11:00:00-03:00"},
+    }
+
+    (change,) = plan_reschedule([event], {"start_date_offset": "2 semanas depois"})
+
+    assert change.patch["start"]["dateTime"] == "2026-10-28T10:00:00-03:00"
+    assert change.patch["end"]["dateTime"] == "2026-10-28T11:00:00-03:00"
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from llm_integration.router import ModelRouter, ModelTier
+
+VALID = {"action": "list", "target": "event"}
+
+
+class FakeChain:
+    """
+    Stands in for `llm | parser`: returns `responses` in order (the last one
+    repeats), sleeping `delays[i]` seconds on the i-th call.
+    """
+
+    def __init__(self, responses, delays=()):
+        self.responses = list(responses)
+        self.delays = list(delays)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            index = self.calls
+            self.calls += 1
+        delay = self.delays[index] if index < len(self.delays) else 0
+        response = self.responses[min(index, len(self.responses) - 1)]
+        return delay, response
+
+    def invoke(self, prompt_value):
+        delay, response = self._next()
+        time.sleep(delay)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def ainvoke(self, prompt_value):
+        delay, response = self._next()
+        await asyncio.sleep(delay)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def validator(response):
+    if response.get("action") not in ("create", "delete", "list", "update"):
+        raise ValueError(f"ação inválida: {response}")
+
+
+def warmed_tier(name, chain, latency=0.01, samples=20):
+    tier = ModelTier(name, chain)
+    for _ in range(samples):
+        tier.observe(latency)
+    return tier
+
+
+def test_route_sends_complex_and_long_messages_to_the_strong_model():
+    router = ModelRouter([ModelTier("fast", None), ModelTier("strong", None)])
+
+    assert router.route("mostre meus eventos") == 0
+    assert router.route("reunião toda segunda às 10h") == 1
+    assert router.route("x" * 200) == 1
+
+
+def test_route_ignores_accents_and_case():
+    router = ModelRouter([ModelTier("fast", None), ModelTier("strong", None)])
+
+    assert router.route("adie a reunião até o fim do mês") == 1
+    assert router.route("Reunião TODA segunda") == 1
+
+
+def test_invalid_output_escalates_to_the_next_model():
+    fast = FakeChain([{"action": "explode"}])
+    strong = FakeChain([VALID])
+    router = ModelRouter(
+        [ModelTier("fast", fast), ModelTier("strong", strong)], validator=validator
+    )
+
+    assert router.invoke("mostre meus eventos", None) == VALID
+    assert asyncio.run(router.ainvoke("mostre meus eventos", None)) == VALID
+
+    metrics = router.metrics()
+    assert metrics["escalations"] == 2
+    assert metrics["tiers"]["fast"]["invalid"] == 2
+    assert strong.calls == 2
+
+
+def test_failure_of_the_last_model_is_raised():
+    router = ModelRouter([ModelTier("fast", FakeChain([RuntimeError("quota")]))])
+
+    with pytest.raises(RuntimeError, match="quota"):
+        router.invoke("oi", None)
+
+
+def test_slow_call_is_hedged_and_the_duplicate_wins():
+    chain = FakeChain([VALID], delays=[1.0, 0])
+    tier = warmed_tier("fast", chain)
+    router = ModelRouter([tier], hedge_percentile=0.9)
+
+    started = time.perf_counter()
+    assert router.invoke("oi", None) == VALID
+
+    assert time.perf_counter() - started < 0.5
+    assert chain.calls == 2
+    assert tier.hedges == 1 and tier.hedge_wins == 1
+
+
+def test_slow_async_call_is_hedged_and_the_duplicate_wins():
+    chain = FakeChain([VALID], delays=[1.0, 0])
+    tier = warmed_tier("fast", chain)
+    router = ModelRouter([tier], hedge_percentile=0.9)
+
+    started = time.perf_counter()
+    assert asyncio.run(router.ainvoke("oi", None)) == VALID
+
+    assert time.perf_counter() - started < 0.5
+    assert tier.hedges == 1 and tier.hedge_wins == 1
+
+
+def test_no_hedge_without_enough_latency_samples():
+    chain = FakeChain([VALID], delays=[0.05])
+    tier = warmed_tier("fast", chain, samples=5)
+    router = ModelRouter([tier], hedge_percentile=0.9)
+
+    assert router.invoke("oi", None) == VALID
+    assert chain.calls == 1 and tier.hedges == 0
+
+
+def test_chatbot_escalates_with_fake_chat_models(monkeypatch):
+    fake_models = pytest.importorskip("langchain_core.language_models.fake_chat_models")
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    chatbot = pytest.importorskip("llm_integration.chatbot")
+
+    fast = fake_models.FakeListChatModel(responses=["isto não é JSON"])
+    strong = fake_models.FakeListChatModel(
+        responses=['{"action": "list", "target": "calendar"}']
+    )
+    bot = chatbot.GeminiChatbot(
+        use_fast_path=False, llms=[("fast", fast), ("strong", strong)]
+    )
+
+    assert bot.ask_question("quais são meus calendários?") == {
+        "action": "list",
+        "target": "calendar",
+    }
+    routing = bot.get_stats()["routing"]
+    assert routing["escalations"] == 1
+    assert routing["tiers"]["fast"]["failures"] == 1
@@ -0,0 +1,108 @@
+import random
+
+import pytest
+from title_index import TitleIndex
+from utils.text import normalize_text
+
+WORDS = [
+    "Reunião",
+    "Almoço",
+    "Dentista",
+    "Academia",
+    "Aula",
+    "Inglês",
+    "Cliente",
+    "Projeto",
+    "Médico",
+    "Café",
+    "Entrega",
+    "Revisão",
+    "Planejamento",
+    "Viagem",
+    "Aniversário",
+    "Consulta",
+    "Treino",
+    "Sprint",
+    "Pagamento",
+    "Jantar",
+]
+
+
+def linear_match(titles, query):
+    """
+    The scan TitleIndex replaced: normalize every title on every lookup.
+    """
+    term = normalize_text(query)
+    return {i for i, title in titles.items() if term in normalize_text(title)}
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = random.Random(42)
+    titles = {
+        str(i): f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}" for i in range(20_000)
+    }
+    index = TitleIndex()
+    for event_id, title in titles.items():
+        index.add("cal", event_id, title)
+    return titles, index
+
+
+@pytest.mark.parametrize(
+    "query", ["dentista 1234", "reuniao cliente", "MÉDICO", "viagem 99", "ca", "7", ""]
+)
+def test_match_agrees_with_the_linear_scan(corpus, query):
+    titles, index = corpus
+    assert index.match("cal", query) == linear_match(titles, query)
+
+
+@pytest.mark.parametrize("query", ["dentista 1234", "reuniao cliente", "viagem 99"])
+def test_match_only_checks_a_few_candidates(corpus, query):
+    titles, index = corpus
+    candidates = index._candidates("cal", normalize_text(query))
+
+    # The linear scan normalizes and checks all 20k titles
+    assert candidates >= linear_match(titles, query)
+    assert len(candidates) < len(titles) / 100
+
+
+def test_match_is_accent_and_case_insensitive():
+    index = TitleIndex()
+    index.add("cal", "1", "Reunião com Cliente")
+    index.add("cal", "2", "Almoço")
+
+    assert index.match("cal", "REUNIAO") == {"1"}
+    assert index.match("cal", "almoco") == {"2"}
+    assert index.match("outro", "almoco") == set()
+
+
+def test_add_replaces_remove_and_clear_forget_titles():
+    index = TitleIndex()
+    index.add("cal", "1", "Dentista")
+    index.add("cal", "1", "Academia")
+    index.add("cal", "2", "Dentista às 10h")
+
+    assert index.match("cal", "dentista") == {"2"}
+    assert index.match("cal", "academia") == {"1"}
+
+    index.remove("cal", "2")
+    assert index.match("cal", "dentista") == set()
+    assert len(index) == 1
+
+    index.clear("cal")
+    assert index.match("cal", "academia") == set()
+    assert len(index) == 0
+
+
+def test_suggest_ranks_fuzzy_matches():
+    index = TitleIndex()
+    index.add("cal", "1", "Reunião com cliente")
+    index.add("cal", "2", "Reunião de projeto")
+    index.add("cal", "3", "Dentista")
+
+    suggestions = index.suggest("cal", "reuniao clinte")
+
+    assert [event_id for event_id, _, _ in suggestions][:2] == ["1", "2"]
+    assert suggestions[0][1] == "reuniao com cliente"
+    assert "3" not in {event_id for event_id, _, _ in suggestions}
+    assert index.suggest("cal", "xy") == []